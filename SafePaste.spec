@@ -5,14 +5,21 @@ import os
 
 block_cipher = None
 
+sys.path.insert(0, SPECPATH)
+from safepaste.pii_detector import PROFILES
+
+# The spaCy model of every detection profile, so any profile works in the frozen app
+spacy_models = sorted({profile.model_name for profile in PROFILES.values()})
+
 # Collect data files
 datas = []
 datas += collect_data_files('customtkinter')
 datas += collect_data_files('presidio_analyzer')
 datas += copy_metadata('presidio_analyzer')
 datas += copy_metadata('presidio_anonymizer')
-datas += collect_data_files('en_core_web_lg')
-datas += copy_metadata('en_core_web_lg')
+for model in spacy_models:
+    datas += collect_data_files(model)
+    datas += copy_metadata(model)
 datas += copy_metadata('spacy')
 
 # Hidden imports
@@ -22,8 +29,7 @@ hiddenimports = [
     'pystray', 
     'PIL', 
     'spacy', 
-    'en_core_web_lg'
-]
+] + spacy_models
 
 a = Analysis(
     ['main.py'],
@@ -0,0 +1,110 @@
+"""
+Seeded synthetic corpora for the benchmarks.
+
+The same (kind, size, density, seed) always produces the same text, so runs
+on different machines or releases measure identical inputs.
+"""
+import random
+from typing import Callable, Dict, List
+
+KINDS = ("prose", "code", "csv", "logs")
+
+FIRST_NAMES = ["Alice", "Bruno", "Chen", "Dana", "Emeka", "Fatima", "Goran", "Hana", "Ivan", "Julia"]
+LAST_NAMES = ["Smith", "Okafor", "Larsen", "Nakamura", "Silva", "Novak", "Haddad", "Kowalski", "Reyes", "Moreau"]
+WORDS = ("the of and to in is that for it as was with be by on not this are or from at which but have an "
+         "report system review update meeting project budget quarter release server customer team data").split()
+IDENTIFIERS = ["value", "result", "config", "items", "buffer", "handler", "index", "count", "payload", "client"]
+
+
+def _person(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def _email(rng: random.Random) -> str:
+    return f"{rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}{rng.randrange(100)}@example.com"
+
+
+def _phone(rng: random.Random) -> str:
+    return f"555-{rng.randrange(100, 1000)}-{rng.randrange(1000, 10000)}"
+
+
+def _card(rng: random.Random) -> str:
+    digits = [4] + [rng.randrange(10) for _ in range(14)]
+    # Luhn check digit, so the pattern tier accepts it.
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2 == 0:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    digits.append((10 - total % 10) % 10)
+    return "".join(map(str, digits))
+
+
+PII: List[Callable[[random.Random], str]] = [_person, _email, _phone, _card]
+
+
+def _pii_or_word(rng: random.Random, density: float, plain: Callable[[random.Random], str]) -> str:
+    return rng.choice(PII)(rng) if rng.random() < density else plain(rng)
+
+
+def _prose_line(rng: random.Random, density: float) -> str:
+    words = [_pii_or_word(rng, density, lambda r: r.choice(WORDS)) for _ in range(rng.randrange(8, 20))]
+    return words[0].capitalize() + " " + " ".join(words[1:]) + "."
+
+
+def _code_line(rng: random.Random, density: float) -> str:
+    name = rng.choice(IDENTIFIERS)
+    if rng.random() < density:
+        return f'    {name} = "{rng.choice(PII)(rng)}"  # owner: {_person(rng)}'
+    return f"    {name} = {rng.choice(IDENTIFIERS)}[{rng.randrange(64)}] + {rng.randrange(1000)}"
+
+
+def _csv_line(rng: random.Random, density: float) -> str:
+    fields = [str(rng.randrange(100000)), rng.choice(WORDS), f"{rng.random() * 1000:.2f}"]
+    if rng.random() < density:
+        fields += [_person(rng), _email(rng), _phone(rng)]
+    else:
+        fields += ["n/a", "n/a", "n/a"]
+    return ",".join(fields)
+
+
+def _log_line(rng: random.Random, density: float) -> str:
+    level = rng.choice(["INFO", "INFO", "INFO", "WARN", "ERROR"])
+    stamp = f"2024-05-{rng.randrange(1, 29):02d}T{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}Z"
+    detail = f"user={_email(rng)}" if rng.random() < density else f"req={rng.getrandbits(64):016x}"
+    return f"{stamp} {level} {rng.choice(IDENTIFIERS)}: {rng.choice(WORDS)} {rng.choice(WORDS)} {detail}"
+
+
+_LINES: Dict[str, Callable[[random.Random, float], str]] = {
+    "prose": _prose_line,
+    "code": _code_line,
+    "csv": _csv_line,
+    "logs": _log_line,
+}
+
+
+def generate(kind: str, size: int, density: float = 0.02, seed: int = 0) -> str:
+    """
+    Generate `size` characters of synthetic text.
+
+    Args:
+        kind (str): One of KINDS.
+        size (int): Length of the result in characters.
+        density (float): Probability that a word, line or field carries PII.
+        seed (int): Random seed.
+
+    Returns:
+        str: The text, cut at exactly `size` characters.
+    """
+    if kind not in _LINES:
+        raise ValueError(f"Unknown corpus kind: {kind}")
+    rng = random.Random(f"{kind}:{size}:{density}:{seed}")
+    line = _LINES[kind]
+    lines = []
+    length = 0
+    while length < size:
+        lines.append(line(rng, density))
+        length += len(lines[-1]) + 1
+    return "\n".join(lines)[:size]
@@ -0,0 +1,235 @@
+"""
+Benchmarks for the detect -> pseudonymize -> rehydrate pipeline and the Vault.
+
+Usage (from the repository root):
+    py -m benchmarks.run --stub-nlp --output baseline.json
+    py -m benchmarks.run --stub-nlp --compare baseline.json
+
+--stub-nlp swaps the spaCy analyzer for a regex stub, so the pattern tier,
+cache, pseudonymizer and vault are measured without a model (and offline).
+Compare mode exits with status 1 if any metric regressed past --threshold.
+"""
+import re
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+import tracemalloc
+from typing import Callable, Dict, List
+from unittest.mock import patch
+from presidio_analyzer import RecognizerResult
+from benchmarks.corpus import FIRST_NAMES, KINDS, LAST_NAMES, generate
+from safepaste.pii_detector import DEFAULT_PROFILE, PROFILES, PiiDetector
+from safepaste.pseudonymizer import Pseudonymizer
+from safepaste.vault import Vault
+
+SIZES = {
+    "100B": 100,
+    "1KB": 1024,
+    "10KB": 10 * 1024,
+    "100KB": 100 * 1024,
+    "1MB": 1024 * 1024,
+    "10MB": 10 * 1024 * 1024,
+}
+# Regressions smaller than this (in ms) are treated as timer noise.
+NOISE_FLOOR_MS = 0.25
+VAULT_ENTRIES = 10000
+
+
+class StubAnalyzer:
+    """Regex stand-in for the spaCy analyzer: finds the corpus' own names."""
+    PATTERN = re.compile(rf"\b(?:{'|'.join(FIRST_NAMES)}) (?:{'|'.join(LAST_NAMES)})\b")
+
+    def analyze(self, text, entities, language=None, **kwargs):
+        return [RecognizerResult("PERSON", m.start(), m.end(), 0.85) for m in self.PATTERN.finditer(text)]
+
+    def analyze_many(self, texts, entities):
+        return [self.analyze(text, entities) for text in texts]
+
+
+def make_detector(stub: bool, profile: str) -> PiiDetector:
+    """A detector with caching and incremental detection off, so every call does the full work."""
+    options = dict(cache_max_bytes=0, incremental=False, profile=profile)
+    if stub:
+        with patch("safepaste.pii_detector.build_analyzer", lambda *args: StubAnalyzer()):
+            return PiiDetector(**options)
+    return PiiDetector(**options)
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn: Callable[[], object], repeats: int, size: int = 0) -> Dict[str, float]:
+    """
+    Time `fn` over `repeats` runs, then measure its peak Python heap in one traced run.
+
+    Returns:
+        Dict[str, float]: Latency percentiles and mean in ms, throughput in MB/s
+        (if `size` is given) and peak traced memory in MB.
+    """
+    fn()  # warm-up
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = {
+        "p50_ms": percentile(times, 0.50),
+        "p95_ms": percentile(times, 0.95),
+        "p99_ms": percentile(times, 0.99),
+        "mean_ms": statistics.fmean(times),
+        "peak_mb": peak / (1024 * 1024),
+    }
+    if size:
+        stats["throughput_mb_s"] = size / (1024 * 1024) / (stats["p50_ms"] / 1000) if stats["p50_ms"] else 0.0
+    return stats
+
+
+def repeats_for(size: int, repeats: int) -> int:
+    """Fewer repeats for large inputs, keeping each case to roughly the same total work."""
+    return max(3, min(repeats, (2 * 1024 * 1024) // max(size, 1)))
+
+
+def run_suite(sizes: List[str], kinds: List[str], density: float, seed: int, repeats: int,
+              stub: bool, profile: str) -> Dict[str, object]:
+    """Run every benchmark case and return the report (metadata plus per-case metrics)."""
+    detector = make_detector(stub, profile)
+    results: Dict[str, Dict[str, float]] = {}
+
+    for kind in kinds:
+        for label in sizes:
+            size = SIZES[label]
+            text = generate(kind, size, density, seed)
+            n = repeats_for(size, repeats)
+            case = f"{kind}/{label}"
+            print(f"  {case} ({n} runs)", file=sys.stderr)
+
+            results[f"detect/{case}"] = measure(lambda: detector.detect(text), n, size)
+            detected = detector.detect(text)
+            results[f"pseudonymize/{case}"] = measure(
+                lambda: Pseudonymizer(Vault()).pseudonymize(text, detected), n, size
+            )
+            pseudonymizer = Pseudonymizer(Vault())
+            scrubbed = pseudonymizer.pseudonymize(text, detected)
+            results[f"rehydrate/{case}"] = measure(lambda: pseudonymizer.rehydrate(scrubbed), n, len(scrubbed))
+
+    rng = random.Random(seed)
+    placeholders = [f"[PERSON_{i}]" for i in range(VAULT_ENTRIES)]
+    originals = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}" for _ in placeholders]
+
+    def vault_add():
+        vault = Vault()
+        for placeholder, original in zip(placeholders, originals):
+            vault.add(placeholder, original)
+
+    filled = Vault()
+    for placeholder, original in zip(placeholders, originals):
+        filled.add(placeholder, original)
+
+    def vault_get():
+        for placeholder in placeholders:
+            filled.get(placeholder)
+
+    def vault_cleanup():
+        vault = Vault(ttl_seconds=0)
+        for placeholder, original in zip(placeholders, originals):
+            vault.add(placeholder, original)
+        vault.cleanup()
+
+    results[f"vault/add/{VAULT_ENTRIES}"] = measure(vault_add, repeats)
+    results[f"vault/get/{VAULT_ENTRIES}"] = measure(vault_get, repeats)
+    results[f"vault/add+cleanup/{VAULT_ENTRIES}"] = measure(vault_cleanup, repeats)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "stub_nlp": stub,
+            "profile": profile,
+            "density": density,
+            "seed": seed,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, object], current: Dict[str, object], threshold: float) -> List[str]:
+    """
+    List the metrics of `current` that are worse than `baseline` by more than `threshold`.
+
+    Latencies are compared on p50 and p95 and ignored below NOISE_FLOOR_MS of
+    difference; peak memory is compared as well. Cases missing from either
+    report are skipped.
+    """
+    regressions = []
+    for case, metrics in current["results"].items():
+        base = baseline["results"].get(case)
+        if base is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "peak_mb"):
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None or new <= old * (1 + threshold):
+                continue
+            if metric.endswith("_ms") and new - old < NOISE_FLOOR_MS:
+                continue
+            change = (new / old - 1) * 100 if old else float("inf")
+            regressions.append(f"{case} {metric}: {old:.3f} -> {new:.3f} (+{change:.0f}%)")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="SafePaste pipeline benchmarks")
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["100B", "1KB", "10KB", "100KB", "1MB"])
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--density", type=float, default=0.02, help="share of words/lines carrying PII")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--stub-nlp", action="store_true", help="benchmark without a spaCy model")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE)
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown ratio (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    logging.disable(logging.INFO)
+    report = run_suite(args.sizes, args.kinds, args.density, args.seed, args.repeats, args.stub_nlp, args.profile)
+
+    for case, metrics in report["results"].items():
+        throughput = f"{metrics['throughput_mb_s']:9.1f} MB/s" if "throughput_mb_s" in metrics else " " * 14
+        print(f"{case:32} p50 {metrics['p50_ms']:9.3f} ms  p95 {metrics['p95_ms']:9.3f} ms  "
+              f"{throughput}  peak {metrics['peak_mb']:7.2f} MB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) against {args.compare}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.compare}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,13 @@ def build():
     # Install pyinstaller if not present
     subprocess.check_call([sys.executable, "-m", "pip", "install", "pyinstaller"])
     
+    # The spec bundles the spaCy model of every detection profile; fetch any that are missing
+    import spacy.util
+    from safepaste.pii_detector import PROFILES
+    for model in sorted({profile.model_name for profile in PROFILES.values()}):
+        if not spacy.util.is_package(model):
+            subprocess.check_call([sys.executable, "-m", "spacy", "download", model])
+    
     # Run PyInstaller
     print("Building SafePaste executable...")
     subprocess.check_call([sys.executable, "-m", "PyInstaller", "SafePaste.spec", "--clean", "--noconfirm"])
@@ -8,15 +8,23 @@ import pystray
 from PIL import Image, ImageDraw
 import customtkinter as ctk
 import pyperclip
-from typing import Optional
+from typing import List, Optional
 
 from safepaste.config import Config
 from safepaste.pii_detector import PiiDetector
 from safepaste.vault import Vault
-from safepaste.pseudonymizer import Pseudonymizer
+from safepaste.vault_store import PersistentVault
+from safepaste.pseudonymizer import PseudonymSession, Pseudonymizer, SpanMapping
 from safepaste.clipboard_monitor import ClipboardMonitor
+from safepaste.clipboard_backends import create_backend
+from safepaste.detection_queue import DetectionJob, DetectionQueue
+from safepaste.dictionary import TermDictionary
+from safepaste.review_model import ReviewQueue, ReviewRequest
 from safepaste.ui_dashboard import ReviewWindow
 from safepaste.ui_settings import SettingsWindow
+from safepaste.ui_diagnostics import DiagnosticsWindow
+from safepaste.metrics import metrics, rss_mb
+from safepaste.daemon import ScrubDaemon
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -42,92 +50,273 @@ def enforce_single_instance():
 class SafePasteApp:
     def __init__(self):
         self.config = Config()
-        self.vault = Vault(ttl_seconds=self.config.vault_ttl)
-        # Initialize detector lazily or here? 
-        # Here is fine, but it takes RAM. 
-        self.detector = PiiDetector()
-        self.pseudonymizer = Pseudonymizer(self.vault)
-        self.monitor = ClipboardMonitor(callback=self.handle_clipboard_change, interval=0.5)
+        if self.config.vault_persist:
+            # Encrypted on-disk vault: placeholders survive restarts and crashes
+            self.vault = PersistentVault(
+                path=self.config.vault_path or None,
+                ttl_seconds=self.config.vault_ttl,
+                max_entries=self.config.vault_max_entries,
+                max_bytes=self.config.vault_max_bytes,
+            )
+        else:
+            self.vault = Vault(
+                ttl_seconds=self.config.vault_ttl,
+                max_entries=self.config.vault_max_entries,
+                max_bytes=self.config.vault_max_bytes,
+            )
         
         self.icon: Optional[pystray.Icon] = None
         self.root: Optional[ctk.CTk] = None
         
         self.is_paused = False
         
+        # The NLP model takes seconds to load, so it loads in the background.
+        # Until then, clipboard events go through the pattern-only path.
+        self.detector = PiiDetector(
+            cache_max_bytes=self.config.detection_cache_max_bytes,
+            cache_ttl=self.config.detection_cache_ttl,
+            load_async=True,
+            on_ready=self._on_detector_ready,
+            profile=self.config.detection_profile,
+            backend=self.config.detector_backend,
+            processes=self.config.detector_processes,
+            worker_max_jobs=self.config.worker_max_jobs,
+            worker_max_rss_mb=self.config.worker_max_rss_mb,
+            incremental=self.config.incremental_detection,
+            deny_list=self._load_dictionary(self.config.deny_list_path),
+            allow_list=self._load_dictionary(self.config.allow_list_path),
+        )
+        self.pseudonymizer = Pseudonymizer(self.vault)
+        # Change notifications where the platform has them (XFixes, wl-paste), polling otherwise
+        self.monitor = ClipboardMonitor(
+            callback=self.handle_clipboard_change,
+            interval=0.5,
+            backend=create_backend(interval=0.5, max_interval=2.0),
+        )
+        
+        # Latest-wins queue between the monitor thread and detection
+        self.detection_queue = DetectionQueue(
+            process=self._run_detection_job,
+            workers=self.config.detection_workers,
+        )
+        
         # Track active windows to prevent duplicates
         self.window_review: Optional[ReviewWindow] = None
+        # Results for the review window: queued behind, or replacing, the one under review
+        self.review_queue = ReviewQueue(policy=self.config.review_policy, max_pending=self.config.review_max_pending)
         self.window_settings: Optional[SettingsWindow] = None
+        self.window_diagnostics: Optional[DiagnosticsWindow] = None
+        self.daemon: Optional[ScrubDaemon] = None
+
+        self._setup_metrics()
+
+    @staticmethod
+    def _load_dictionary(path: str) -> Optional[TermDictionary]:
+        """Load a compiled deny/allow list; a missing or broken file only disables that list."""
+        if not path:
+            return None
+        try:
+            dictionary = TermDictionary.load(path)
+            logger.info(f"Loaded dictionary {path} ({len(dictionary)} terms).")
+            return dictionary
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load dictionary {path}: {e}")
+            return None
+
+    def _setup_metrics(self):
+        """Enable stage timers if configured and register the gauges shown in Diagnostics."""
+        metrics.enabled = self.config.metrics_enabled
+        metrics.register_gauge("process_rss_mb", rss_mb)
+        metrics.register_gauge("detection_cache", self.detector.cache.stats)
+        metrics.register_gauge("detection_queue", self.detection_queue.stats)
+        metrics.register_gauge("vault", lambda: {"entries": len(self.vault), "bytes": self.vault.size_bytes})
+        metrics.register_gauge("detector", lambda: {
+            "profile": self.detector.profile,
+            "backend": self.detector.backend,
+            "ready": self.detector.is_ready,
+        })
+        if self.config.detector_backend == "process":
+            metrics.register_gauge("detector_workers", lambda: {
+                f"pid {w['pid']}": f"{w['jobs']} jobs, {w['rss_mb']:.0f} MB"
+                for w in self.detector.analyzer.worker_stats()
+            } if hasattr(self.detector.analyzer, "worker_stats") else {})
 
     def handle_clipboard_change(self, content: str):
         """
         Called by ClipboardMonitor thread when clipboard changes.
-        CRITICAL: Perform Heavy Detection HERE (Background Thread) to avoid freezing Main UI Thread.
-        Only schedule UI updates via root.after.
+        Only queues the content: detection runs on the detection worker, so
+        the monitor keeps watching and a burst of copies coalesces into the latest one.
         """
         if self.is_paused:
             return
+        self.detection_queue.submit(content)
+
+    def _run_detection_job(self, job: DetectionJob):
+        metrics.observe("stage.queue_wait", job.started_at - job.submitted_at)
+        with metrics.timer("stage.total"):
+            self._process_clipboard_content(job.content, job)
 
+    def _process_clipboard_content(self, content: str, job: Optional[DetectionJob] = None):
+        """
+        CRITICAL: Perform Heavy Detection HERE (Background Thread) to avoid freezing Main UI Thread.
+        Only schedule UI updates via root.after (see _deliver).
+        """
         try:
             # 1. Re-hydration
             if "[" in content and "]" in content:
                 # Try re-hydration
-                restored = self.pseudonymizer.rehydrate(content)
+                with metrics.timer("stage.rehydrate"):
+                    restored = self.pseudonymizer.rehydrate(content)
                 if restored != content:
                     logger.info("Restored sensitive data from clipboard.")
+                    metrics.incr("clipboard.restored")
                     self.monitor.update_last_content(restored)
                     
                     # Clipboard write must be careful with threads, but usually fine.
                     # Ideally, do this on main thread if pyperclip has issues, but it usually works.
                     # We will schedule it to be safe and consistent.
-                    if self.root:
-                        self.root.after(0, self._perform_clipboard_update, restored, "Restored original sensitive data.")
+                    self._deliver(job, self._perform_clipboard_update, restored, "Restored original sensitive data.")
                     return
 
             # 2. Filtering (Length check)
             if len(content) < self.config.min_text_length:
+                metrics.incr("clipboard.too_short")
                 return
 
             # 3. PII Detection (Heavy Operation)
-            # This blocks the monitor thread, not the UI thread. Perfect.
-            results = self.detector.detect(content)
+            # This blocks the detection worker, not the monitor or the UI thread.
+            if len(content) > self.config.stream_threshold:
+                self._detect_progressive(content, job)
+                return
+
+            with metrics.timer("stage.detect"):
+                results = self.detector.detect(content)
+            if job and job.cancelled:
+                return
             
             if results:
                 logger.info(f"Detected {len(results)} PII entities.")
-                scrubbed_text = self.pseudonymizer.pseudonymize(content, results)
+                metrics.incr("clipboard.scrubbed")
+                with metrics.timer("stage.pseudonymize"):
+                    scrubbed = self.pseudonymizer.pseudonymize_with_map(content, results)
                 
                 # Show Review Window (Must be on Main Thread)
-                if self.root:
-                    self.root.after(0, self.show_review_window, content, scrubbed_text)
+                self._deliver(job, self.show_review_window, content, scrubbed.text, True, scrubbed.spans)
                     
         except Exception as e:
             logger.error(f"Error in background processing: {e}", exc_info=True)
 
+    def _detect_progressive(self, content: str, job: Optional[DetectionJob] = None):
+        """
+        Detect PII in a large payload chunk by chunk.
+        The review window opens after the first chunk with findings and is
+        updated once the whole payload has been scanned.
+        """
+        results = []
+        shown = False
+        # One numbering for both passes, so the final result refreshes the
+        # open review with the same placeholders the user is already looking at.
+        session = PseudonymSession()
+        for chunk_results in self.detector.detect_stream(content, chunk_size=self.config.stream_chunk_size):
+            if job and job.cancelled:
+                # Newer clipboard content arrived: stop scanning this payload.
+                return
+            results.extend(chunk_results)
+            if results and not shown:
+                scrubbed = self.pseudonymizer.pseudonymize_with_map(content, list(results), session)
+                self._deliver(job, self.show_review_window, content, scrubbed.text, False, scrubbed.spans)
+                shown = True
+
+        if not results:
+            return
+        logger.info(f"Detected {len(results)} PII entities.")
+        scrubbed = self.pseudonymizer.pseudonymize_with_map(content, results, session)
+        self._deliver(job, self.show_review_window, content, scrubbed.text, True, scrubbed.spans)
+
+    def _deliver(self, job: Optional[DetectionJob], callback, *args):
+        """Schedule a UI update on the Main Thread, unless newer clipboard content superseded the job."""
+        if not self.root:
+            return
+        if job is None:
+            self.root.after(0, callback, *args)
+        else:
+            self.detection_queue.deliver_if_current(job, self.root.after, 0, callback, *args)
+
+    def _on_detector_ready(self, success: bool):
+        """Called by the detector warm-up thread once the model load ends."""
+        if success:
+            logger.info("NLP model ready. Full detection enabled.")
+        else:
+            logger.error("NLP model failed to load. Staying in pattern-only mode.")
+        if self.icon:
+            self.icon.title = self._tray_title()
+
+    def _tray_title(self) -> str:
+        if self.is_paused:
+            return "SafePaste - Paused"
+        if self.detector.is_ready:
+            return "SafePaste - Active"
+        if self.detector.load_error:
+            return "SafePaste - Active (patterns only, model failed to load)"
+        return "SafePaste - Active (patterns only, loading model...)"
+
     def _perform_clipboard_update(self, text: str, notify_msg: Optional[str] = None):
         """Helper to update clipboard from Main Thread."""
         pyperclip.copy(text)
         if notify_msg and self.icon:
             self.icon.notify(notify_msg, "SafePaste")
 
-    def show_review_window(self, original: str, scrubbed: str):
-        """Construct and show the review window on the Main Thread."""
-        # Check if window already exists
-        if self.window_review and self.window_review.winfo_exists():
-            # If it exists, maybe update it? Or just bring to front?
-            # For now, let's just focus it. 
-            self.window_review.lift()
-            self.window_review.focus_force()
-            return
-            
-        self.window_review = ReviewWindow(
-            original_text=original,
-            scrubbed_text=scrubbed,
-            on_copy=self.on_copy_clean,
-            on_close=lambda: setattr(self, 'window_review', None)
-        )
-        # Ensure it pops up over other windows
-        self.window_review.lift()
-        self.window_review.attributes("-topmost", True)
-        self.window_review.focus_force()
+    def show_review_window(self, original: str, scrubbed: str, complete: bool = True,
+                           spans: Optional[List[SpanMapping]] = None):
+        """Hand a detection result to the review window on the Main Thread."""
+        with metrics.timer("stage.review_window"):
+            self._show_review_window(ReviewRequest(original, scrubbed, complete, list(spans or [])))
+
+    def _show_review_window(self, request: ReviewRequest):
+        window = self._review_window()
+        if not window.visible and self.review_queue.current is not None:
+            # The window went away without a copy or cancel (e.g. it was rebuilt): start afresh.
+            logger.warning(f"Review window closed unexpectedly; discarding {self.review_queue.pending + 1} result(s).")
+            self.review_queue.clear()
+        show = self.review_queue.offer(request)
+        if show is not None:
+            self._display_review(show)
+        else:
+            window.set_pending(self.review_queue.pending)
+
+    def _display_review(self, request: ReviewRequest):
+        """
+        Show a request in the review window. A queued request may have waited
+        past its vault entries' TTL (or LRU eviction), so they are written back
+        first: copying its text must rehydrate to its own values.
+        """
+        for placeholder, original in request.mappings().items():
+            self.vault.add(placeholder, original)
+        self._review_window().show(request, self.review_queue.pending)
+
+    def _review_window(self) -> ReviewWindow:
+        """The review window, built once (hidden) and reused for every detection."""
+        if not (self.window_review and self.window_review.winfo_exists()):
+            self.window_review = ReviewWindow(
+                on_copy=self.on_copy_clean,
+                on_close=self._next_review,
+                on_toggle=self.on_entity_toggled,
+            )
+        return self.window_review
+
+    def _next_review(self):
+        """The current review was copied or cancelled: show the next queued result, if any."""
+        request = self.review_queue.advance()
+        if request is not None:
+            self._display_review(request)
+
+    def on_entity_toggled(self, placeholder: str, original: str, enabled: bool):
+        """User (un)checked an entity in the review window: keep the vault in line with the text."""
+        if enabled:
+            self.vault.add(placeholder, original)
+        elif self.vault.get(placeholder) == original:
+            # The value stays in clear text, so its placeholder no longer needs restoring.
+            self.vault.remove(placeholder)
 
     def on_copy_clean(self, text: str):
         """User clicked 'Copy Clean' in dashboard."""
@@ -137,6 +326,7 @@ class SafePasteApp:
             pyperclip.copy(text)
         except Exception as e:
             logger.error(f"Failed to copy to clipboard: {e}")
+        self._next_review()
 
     def create_tray_icon(self):
         # Create a simple icon
@@ -147,17 +337,22 @@ class SafePasteApp:
         menu = pystray.Menu(
             pystray.MenuItem('Review Dashboard', self.trigger_dashboard_from_tray, enabled=False),
             pystray.MenuItem('Settings', self.trigger_settings_from_tray),
+            pystray.MenuItem('Diagnostics', self.trigger_diagnostics_from_tray),
             pystray.MenuItem('Pause Protection', self.toggle_pause, checked=lambda item: self.is_paused),
             pystray.MenuItem('Quit', self.trigger_quit_from_tray)
         )
         
-        self.icon = pystray.Icon("SafePaste", image, "SafePaste - Active", menu)
+        self.icon = pystray.Icon("SafePaste", image, self._tray_title(), menu)
         self.icon.run()
 
     def trigger_settings_from_tray(self, icon, item):
         if self.root:
             self.root.after(0, self.show_settings_window)
 
+    def trigger_diagnostics_from_tray(self, icon, item):
+        if self.root:
+            self.root.after(0, self.show_diagnostics_window)
+
     def trigger_dashboard_from_tray(self, icon, item):
         pass # Only relevant if we store last detection
 
@@ -173,14 +368,37 @@ class SafePasteApp:
 
         self.window_settings = SettingsWindow(
             config=self.config,
-            on_close_callback=lambda: setattr(self, 'window_settings', None)
+            on_close_callback=self._on_settings_closed
         )
         self.window_settings.lift()
         self.window_settings.focus_force()
 
+    def show_diagnostics_window(self):
+        if self.window_diagnostics and self.window_diagnostics.winfo_exists():
+            self.window_diagnostics.lift()
+            self.window_diagnostics.focus_force()
+            return
+
+        self.window_diagnostics = DiagnosticsWindow(
+            snapshot=metrics.snapshot,
+            on_reset=metrics.reset,
+            on_close=lambda: setattr(self, 'window_diagnostics', None)
+        )
+        self.window_diagnostics.lift()
+        self.window_diagnostics.focus_force()
+
+    def _on_settings_closed(self):
+        self.window_settings = None
+        self.vault.ttl_seconds = self.config.vault_ttl
+        self.review_queue.policy = self.config.review_policy
+        # A new profile means a different spaCy model; it loads in the background.
+        if self.config.detection_profile != self.detector.profile:
+            self.detector.set_profile(self.config.detection_profile)
+            if self.icon:
+                self.icon.title = self._tray_title()
+
     def toggle_pause(self, icon, item):
         self.is_paused = not self.is_paused
-        state = "Paused" if self.is_paused else "Active"
         color = (128, 128, 128) if self.is_paused else (0, 128, 0)
         
         # Update Icon visuals (simple color change)
@@ -188,11 +406,18 @@ class SafePasteApp:
         d = ImageDraw.Draw(img)
         d.rectangle([16, 16, 48, 48], fill=(255, 255, 255))
         self.icon.icon = img
-        self.icon.title = f"SafePaste - {state}"
+        self.icon.title = self._tray_title()
 
     def quit_app(self):
         logger.info("Quitting application...")
         self.monitor.stop()
+        self.monitor.backend.close()
+        self.detection_queue.stop()
+        if self.daemon:
+            self.daemon.stop()
+        self.detector.close()
+        self.vault.close()
+        metrics.close()
         if self.icon:
             self.icon.stop()
         if self.root:
@@ -202,10 +427,30 @@ class SafePasteApp:
         # Initialize Tkinter Root (Hidden)
         self.root = ctk.CTk()
         self.root.withdraw() # Hide the main window
+        # Build the review window now, hidden, so a detection only has to fill it in
+        self._review_window()
         
-        # Start clipboard monitor
+        # Start detection workers, then the clipboard monitor feeding them
+        self.detection_queue.start()
         self.monitor.start()
         
+        # Expire vault entries in the background so memory stays flat in long sessions
+        self.vault.start_sweeper()
+
+        if self.config.metrics_file:
+            metrics.start_file_export(self.config.metrics_file)
+        if self.config.metrics_port:
+            metrics.serve(self.config.metrics_port)
+
+        # Let editor plugins and the CLI use this process's warm model instead of loading their own
+        if self.config.daemon_address:
+            self.daemon = ScrubDaemon(self.detector, self.vault)
+            try:
+                self.daemon.start_in_background(self.config.daemon_address)
+            except OSError as e:
+                logger.error(f"Failed to start scrub daemon: {e}")
+                self.daemon = None
+        
         # Start Tray Icon in separate thread
         tray_thread = threading.Thread(target=self.create_tray_icon, daemon=True)
         tray_thread.start()
@@ -0,0 +1,4 @@
+import sys
+from safepaste.cli import main
+
+sys.exit(main())
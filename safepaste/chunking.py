@@ -0,0 +1,28 @@
+from typing import Iterator, Tuple
+
+
+def chunk_boundaries(text: str, chunk_size: int) -> Iterator[Tuple[int, int]]:
+    """
+    Split `text` into consecutive (start, end) chunks of about `chunk_size`.
+
+    Cuts prefer a newline, then a sentence end, then any whitespace in the
+    second half of the chunk, and fall back to a hard cut.
+    """
+    start = 0
+    length = len(text)
+    while start < length:
+        end = start + chunk_size
+        if end >= length:
+            yield start, length
+            return
+        lower = start + chunk_size // 2
+        cut = text.rfind("\n", lower, end)
+        if cut == -1:
+            cut = max(text.rfind(". ", lower, end), text.rfind("! ", lower, end), text.rfind("? ", lower, end))
+            if cut != -1:
+                cut += 1
+        if cut == -1:
+            cut = max(text.rfind(" ", lower, end), text.rfind("\t", lower, end))
+        end = cut + 1 if cut != -1 else end
+        yield start, end
+        start = end
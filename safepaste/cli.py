@@ -0,0 +1,328 @@
+"""
+Headless SafePaste: the detect -> pseudonymize -> rehydrate pipeline as shell filters.
+
+    py -m safepaste scrub --mapping map.json < app.log > app.scrubbed.log
+    py -m safepaste restore --mapping map.json < answer.txt
+
+Input is processed in bounded chunks cut at line boundaries, and output is
+written as it goes, so arbitrarily large streams run in constant memory
+(apart from the mapping itself, which grows with the number of distinct
+values). This module must not import the GUI toolkits.
+"""
+import io
+import os
+import sys
+import json
+import logging
+import argparse
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+from safepaste.chunking import chunk_boundaries
+from safepaste.pseudonymizer import PseudonymSession, Pseudonymizer
+from safepaste.vault import Vault
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Mappings written by the CLI are meant to outlive the process; they do not expire.
+NO_EXPIRY = 10 ** 9
+
+
+def _text_stream(binary, mode: str) -> TextIO:
+    # surrogateescape round-trips bytes that are not valid UTF-8 unchanged.
+    if mode == "r":
+        return io.TextIOWrapper(binary, encoding="utf-8", errors="surrogateescape", newline="")
+    return io.TextIOWrapper(binary, encoding="utf-8", errors="surrogateescape", newline="", write_through=False)
+
+
+def iter_blocks(stream: TextIO, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read `stream` as blocks of about `chunk_size` characters.
+
+    Blocks end at a newline where there is one (else at whitespace, see
+    chunk_boundaries), so entities are not cut; at most two blocks are
+    buffered at a time.
+    """
+    buffer = ""
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            break
+        buffer += data
+        if len(buffer) < chunk_size:
+            continue
+        bounds = list(chunk_boundaries(buffer, chunk_size))
+        for start, end in bounds[:-1]:
+            yield buffer[start:end]
+        buffer = buffer[bounds[-1][0]:]
+    if buffer:
+        yield buffer
+
+
+def iter_lines(stream: TextIO) -> Iterator[str]:
+    """Read `stream` line by line (for --line-buffered, e.g. behind `tail -f`)."""
+    while True:
+        line = stream.readline()
+        if not line:
+            return
+        yield line
+
+
+def _open_inputs(paths: List[str]) -> Iterator[TextIO]:
+    for path in paths or ["-"]:
+        if path == "-":
+            yield _text_stream(sys.stdin.buffer, "r")
+        else:
+            with open(path, encoding="utf-8", errors="surrogateescape", newline="") as f:
+                yield f
+
+
+def _open_output(path: Optional[str]) -> TextIO:
+    if not path or path == "-":
+        return _text_stream(sys.stdout.buffer, "w")
+    return open(path, "w", encoding="utf-8", errors="surrogateescape", newline="")
+
+
+def load_mapping(path: str, vault: Vault) -> int:
+    """Add the placeholder -> original pairs of a mapping file to `vault`. Returns the count."""
+    with open(path, encoding="utf-8") as f:
+        mapping: Dict[str, str] = json.load(f)
+    for placeholder, original in mapping.items():
+        vault.add(placeholder, original)
+    return len(mapping)
+
+
+def save_mapping(path: str, vault: Vault) -> int:
+    """
+    Write the vault's placeholder -> original pairs to `path` as JSON.
+    The file holds the original sensitive values, so it is created owner-only.
+    """
+    mapping = dict(vault.items())
+    tmp = path + ".tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(mapping, f, ensure_ascii=False, indent=0)
+    os.replace(tmp, path)
+    return len(mapping)
+
+
+def _load_dictionary(path: Optional[str]):
+    if not path:
+        return None
+    from safepaste.dictionary import TermDictionary
+    return TermDictionary.load(path)
+
+
+def make_detect(patterns_only: bool, profile: str, deny_path: Optional[str] = None,
+                allow_path: Optional[str] = None) -> Callable[[str], list]:
+    """The detection function for scrub: the pattern tier alone, or the full PiiDetector."""
+    deny, allow = _load_dictionary(deny_path), _load_dictionary(allow_path)
+    if patterns_only:
+        from safepaste import prefilter
+
+        def detect(text: str) -> list:
+            results = prefilter.scan_patterns(text)
+            if deny is not None:
+                results.extend(deny.recognize(text))
+            return allow.filter_allowed(text, results) if allow is not None else results
+        return detect
+    from safepaste.pii_detector import PiiDetector
+    # Every block is new text: the result cache and incremental detection would only cost memory.
+    detector = PiiDetector(profile=profile, cache_max_bytes=0, incremental=False, deny_list=deny, allow_list=allow)
+    return detector.detect
+
+
+def scrub(blocks: Iterable[str], out: TextIO, detect: Callable[[str], list], pseudonymizer: Pseudonymizer,
+          session: PseudonymSession, flush_each: bool = False) -> int:
+    """
+    Scrub each block and write it to `out`, numbering placeholders across the whole stream.
+
+    Returns:
+        int: Number of entities replaced.
+    """
+    replaced = 0
+    for block in blocks:
+        results = detect(block)
+        replaced += len(results)
+        out.write(pseudonymizer.pseudonymize(block, results, session) if results else block)
+        if flush_each:
+            out.flush()
+    return replaced
+
+
+def restore(blocks: Iterable[str], out: TextIO, pseudonymizer: Pseudonymizer, flush_each: bool = False) -> None:
+    """Rehydrate each block and write it to `out`; placeholders split across blocks are handled."""
+    for text in pseudonymizer.rehydrate_stream(blocks):
+        out.write(text)
+        if flush_each:
+            out.flush()
+
+
+def _blocks(stream: TextIO, args) -> Iterator[str]:
+    return iter_lines(stream) if args.line_buffered else iter_blocks(stream, args.chunk_size)
+
+
+def _via_daemon(args, transform: Callable[[str], str]) -> int:
+    """Send each block through the daemon and write what comes back."""
+    out = _open_output(args.output)
+    try:
+        for stream in _open_inputs(args.inputs):
+            for block in _blocks(stream, args):
+                out.write(transform(block))
+                if args.line_buffered:
+                    out.flush()
+    finally:
+        out.flush()
+    return 0
+
+
+def cmd_scrub(args) -> int:
+    if args.daemon is not None:
+        from safepaste.daemon import DaemonClient
+        client = DaemonClient(args.daemon or None)
+        return _via_daemon(args, lambda block: client.scrub(block)["text"])
+
+    vault = Vault(ttl_seconds=NO_EXPIRY)
+    if args.mapping and os.path.exists(args.mapping) and not args.fresh:
+        # Extend an existing mapping: known values keep their placeholders, new ones continue the numbering.
+        load_mapping(args.mapping, vault)
+    session = PseudonymSession.resume(vault.items())
+    pseudonymizer = Pseudonymizer(vault)
+    detect = make_detect(args.patterns_only, args.profile, args.deny, args.allow)
+
+    out = _open_output(args.output)
+    replaced = 0
+    try:
+        for stream in _open_inputs(args.inputs):
+            replaced += scrub(_blocks(stream, args), out, detect, pseudonymizer, session, args.line_buffered)
+    finally:
+        out.flush()
+        if args.mapping:
+            save_mapping(args.mapping, vault)
+    logger.info(f"Replaced {replaced} entities.")
+    return 0
+
+
+def cmd_restore(args) -> int:
+    if args.daemon is not None:
+        from safepaste.daemon import DaemonClient
+        client = DaemonClient(args.daemon or None)
+        return _via_daemon(args, client.restore)
+    if not args.mapping:
+        raise ValueError("restore needs --mapping (or --daemon)")
+
+    vault = Vault(ttl_seconds=NO_EXPIRY)
+    load_mapping(args.mapping, vault)
+    pseudonymizer = Pseudonymizer(vault)
+
+    out = _open_output(args.output)
+    try:
+        for stream in _open_inputs(args.inputs):
+            restore(_blocks(stream, args), out, pseudonymizer, args.line_buffered)
+    finally:
+        out.flush()
+    return 0
+
+
+def cmd_serve(args) -> int:
+    import asyncio
+    from safepaste.daemon import ScrubDaemon, default_address
+    from safepaste.pii_detector import PiiDetector
+
+    # The model loads in the background; until then requests get pattern-only results.
+    detector = PiiDetector(profile=args.profile, load_async=True,
+                           deny_list=_load_dictionary(args.deny), allow_list=_load_dictionary(args.allow))
+    daemon = ScrubDaemon(detector, Vault(ttl_seconds=args.ttl), max_request_bytes=args.max_request_bytes)
+    try:
+        asyncio.run(daemon.serve_forever(args.address or default_address()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        detector.close()
+    return 0
+
+
+def cmd_compile_dict(args) -> int:
+    from safepaste.dictionary import TermDictionary, read_terms
+
+    def terms():
+        for path in args.terms:
+            yield from read_terms(path, args.entity)
+
+    dictionary = TermDictionary.build(terms(), case_sensitive=args.case_sensitive)
+    dictionary.save(args.output)
+    logger.info(f"Wrote {len(dictionary)} terms to {args.output}.")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="safepaste", description="Scrub PII from text streams and restore it later.")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log progress to stderr")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_dictionaries(sub: argparse.ArgumentParser):
+        sub.add_argument("--deny", metavar="DICT", help="compiled dictionary of terms to always scrub")
+        sub.add_argument("--allow", metavar="DICT", help="compiled dictionary of known-safe terms to leave alone")
+
+    def add_io(sub: argparse.ArgumentParser):
+        sub.add_argument("inputs", nargs="*", help="input files (default: stdin; '-' for stdin)")
+        sub.add_argument("-o", "--output", help="output file (default: stdout)")
+        sub.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="characters per processing block")
+        sub.add_argument("--line-buffered", action="store_true", help="process and flush line by line")
+        sub.add_argument("--daemon", nargs="?", const="", metavar="ADDRESS",
+                         help="use a running `safepaste serve` (and its vault) instead of loading a model")
+
+    scrub_parser = commands.add_parser("scrub", help="replace PII with placeholders")
+    add_io(scrub_parser)
+    scrub_parser.add_argument("-m", "--mapping", help="JSON file to save the placeholder mapping to (contains the PII)")
+    scrub_parser.add_argument("--fresh", action="store_true", help="overwrite the mapping file instead of extending it")
+    scrub_parser.add_argument("--patterns-only", action="store_true",
+                              help="skip the spaCy model (no PERSON detection, instant startup)")
+    scrub_parser.add_argument("--profile", default="accurate", choices=["fast", "balanced", "accurate"],
+                              help="detection profile (spaCy model size)")
+    add_dictionaries(scrub_parser)
+    scrub_parser.set_defaults(func=cmd_scrub)
+
+    restore_parser = commands.add_parser("restore", help="put the original values back")
+    add_io(restore_parser)
+    restore_parser.add_argument("-m", "--mapping", help="mapping file written by scrub")
+    restore_parser.set_defaults(func=cmd_restore)
+
+    serve_parser = commands.add_parser("serve", help="run the shared scrubbing daemon")
+    serve_parser.add_argument("address", nargs="?",
+                              help="Unix socket path or host:port (default: per-user socket, 127.0.0.1:8787 on Windows)")
+    serve_parser.add_argument("--profile", default="accurate", choices=["fast", "balanced", "accurate"],
+                              help="detection profile (spaCy model size)")
+    serve_parser.add_argument("--ttl", type=int, default=1800, help="seconds the daemon's vault keeps mappings")
+    serve_parser.add_argument("--max-request-bytes", type=int, default=1024 * 1024, help="largest accepted request body")
+    add_dictionaries(serve_parser)
+    serve_parser.set_defaults(func=cmd_serve)
+
+    dict_parser = commands.add_parser("compile-dict", help="compile term lists into a deny/allow dictionary")
+    dict_parser.add_argument("terms", nargs="+",
+                             help="term list files: one term per line, optionally followed by a tab and an entity type")
+    dict_parser.add_argument("-o", "--output", required=True, help="compiled dictionary file to write")
+    dict_parser.add_argument("--entity", default="CUSTOM_TERM", help="entity type of terms without one")
+    dict_parser.add_argument("--case-sensitive", action="store_true", help="match case exactly")
+    dict_parser.set_defaults(func=cmd_compile_dict)
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Configure logging before safepaste.pii_detector is imported, so its INFO default does not apply.
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr,
+                        format="%(levelname)s: %(message)s")
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Downstream closed early (e.g. `| head`); not an error for a filter.
+        sys.stderr.close()
+        return 0
+    except (OSError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
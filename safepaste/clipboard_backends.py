@@ -0,0 +1,368 @@
+import os
+import sys
+import time
+import shutil
+import select
+import ctypes
+import ctypes.util
+import logging
+import threading
+import subprocess
+from typing import Optional
+import pyperclip
+
+logger = logging.getLogger(__name__)
+
+
+class ClipboardBackend:
+    """
+    Source of clipboard content and change notifications for ClipboardMonitor.
+
+    wait_for_change() blocks until the clipboard may have changed (or until
+    the timeout / wake()), and read() returns the current text. A backend
+    may report spurious changes; the monitor compares content anyway.
+    """
+    def read(self) -> str:
+        """Return the current clipboard text."""
+        return pyperclip.paste()
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        """Block until the clipboard may have changed. Returns False on timeout or wake()."""
+        raise NotImplementedError
+
+    def content_checked(self, changed: bool) -> None:
+        """Feedback from the monitor after comparing content read after a wait."""
+
+    def wake(self) -> None:
+        """Interrupt a pending wait_for_change(), e.g. to stop the monitor."""
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class PollingBackend(ClipboardBackend):
+    """
+    Fallback backend that polls on an adaptive interval.
+
+    With a ChangeSignal, each tick only checks the cheap signal and content
+    is fetched only when it moved. Without one, every tick counts as a
+    possible change. The interval backs off while the clipboard is idle and
+    snaps back to `interval` after activity.
+    """
+    BACKOFF = 1.25
+
+    def __init__(self, interval: float = 0.5, max_interval: Optional[float] = None,
+                 signal: Optional["ChangeSignal"] = None):
+        """
+        Args:
+            interval (float): Shortest polling interval, used right after activity.
+            max_interval (float): Longest interval when idle (default: same as interval).
+            signal (ChangeSignal): Cheap change signal checked before fetching content.
+        """
+        self.interval = interval
+        self.max_interval = max_interval or interval
+        self.signal = signal
+        self.current_interval = interval
+        self._last_token = signal.token() if signal else None
+        self._wake = threading.Event()
+        self._next_poll: Optional[float] = None  # monotonic time of the next check
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        # A timeout shorter than the interval returns early but keeps the
+        # schedule, so callers with short timeouts do not defeat the back-off.
+        if self._next_poll is None:
+            self._next_poll = time.monotonic() + self.current_interval
+        wait = max(0.0, self._next_poll - time.monotonic())
+        timed_out = timeout is not None and timeout < wait
+        woken = self._wake.wait(timeout if timed_out else wait)
+        self._wake.clear()
+        if woken or timed_out:
+            return False
+        self._next_poll = None
+        if self.signal is None:
+            return True
+        token = self.signal.token()
+        if token == self._last_token:
+            self._back_off()
+            return False
+        self._last_token = token
+        self.current_interval = self.interval
+        return True
+
+    def content_checked(self, changed: bool) -> None:
+        if self.signal is not None:
+            return
+        if changed:
+            self.current_interval = self.interval
+        else:
+            self._back_off()
+
+    def _back_off(self) -> None:
+        self.current_interval = min(self.max_interval, self.current_interval * self.BACKOFF)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def close(self) -> None:
+        if self.signal:
+            self.signal.close()
+
+
+class FakeBackend(ClipboardBackend):
+    """In-memory clipboard for tests: set_text() plays the role of a user copy."""
+    def __init__(self, text: str = ""):
+        self._text = text
+        self._changed = False
+        self._woken = False
+        self._cond = threading.Condition()
+
+    def set_text(self, text: str) -> None:
+        with self._cond:
+            self._text = text
+            self._changed = True
+            self._cond.notify_all()
+
+    def read(self) -> str:
+        with self._cond:
+            return self._text
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        with self._cond:
+            self._cond.wait_for(lambda: self._changed or self._woken, timeout)
+            changed, self._changed, self._woken = self._changed, False, False
+            return changed
+
+    def wake(self) -> None:
+        with self._cond:
+            self._woken = True
+            self._cond.notify_all()
+
+
+class _WakePipe:
+    """Self-pipe that lets wake() interrupt a select() on another fd."""
+    def __init__(self):
+        self.read_fd, self.write_fd = os.pipe()
+
+    def wake(self) -> None:
+        os.write(self.write_fd, b"x")
+
+    def drain(self) -> None:
+        os.read(self.read_fd, 1024)
+
+    def close(self) -> None:
+        os.close(self.read_fd)
+        os.close(self.write_fd)
+
+
+class WlPasteWatchBackend(ClipboardBackend):
+    """
+    Wayland backend: `wl-paste --watch` runs a command on every clipboard
+    change; we have it print a line and block on the pipe in between.
+    """
+    def __init__(self):
+        self._proc = subprocess.Popen(
+            ["wl-paste", "--watch", "echo"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        self._wake = _WakePipe()
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        readable, _, _ = select.select([self._proc.stdout, self._wake.read_fd], [], [], timeout)
+        if self._wake.read_fd in readable:
+            self._wake.drain()
+            return False
+        if not readable:
+            return False
+        if not os.read(self._proc.stdout.fileno(), 4096):
+            raise RuntimeError("wl-paste --watch exited")
+        return True
+
+    def wake(self) -> None:
+        self._wake.wake()
+
+    def close(self) -> None:
+        self._proc.terminate()
+        self._proc.wait()
+        self._wake.close()
+
+
+class _XEvent(ctypes.Union):
+    # XEvent is a union padded to 24 longs; we only read the leading type field.
+    _fields_ = [("type", ctypes.c_int), ("pad", ctypes.c_long * 24)]
+
+
+class X11Display:
+    """Thin ctypes binding to one persistent Xlib connection with XFixes."""
+    XFixesSetSelectionOwnerNotifyMask = 1
+
+    def __init__(self, display_name: Optional[str] = None):
+        x11_path = ctypes.util.find_library("X11")
+        xfixes_path = ctypes.util.find_library("Xfixes")
+        if not x11_path or not xfixes_path:
+            raise OSError("libX11/libXfixes not found")
+        self.x11 = ctypes.CDLL(x11_path)
+        self.xfixes = ctypes.CDLL(xfixes_path)
+        self._declare()
+
+        self.display = self.x11.XOpenDisplay(display_name.encode() if display_name else None)
+        if not self.display:
+            raise OSError("Cannot open X display")
+        event_base, error_base = ctypes.c_int(), ctypes.c_int()
+        if not self.xfixes.XFixesQueryExtension(self.display, ctypes.byref(event_base), ctypes.byref(error_base)):
+            self.x11.XCloseDisplay(self.display)
+            raise OSError("XFixes extension not available")
+        self.selection_notify = event_base.value  # XFixesSelectionNotify == event_base + 0
+        self.root = self.x11.XDefaultRootWindow(self.display)
+        self.clipboard = self.x11.XInternAtom(self.display, b"CLIPBOARD", False)
+        self.fd = self.x11.XConnectionNumber(self.display)
+
+    def _declare(self):
+        x11, xfixes = self.x11, self.xfixes
+        x11.XOpenDisplay.restype = ctypes.c_void_p
+        x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+        x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        x11.XInternAtom.restype = ctypes.c_ulong
+        x11.XInternAtom.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_int]
+        x11.XConnectionNumber.argtypes = [ctypes.c_void_p]
+        x11.XPending.argtypes = [ctypes.c_void_p]
+        x11.XNextEvent.argtypes = [ctypes.c_void_p, ctypes.POINTER(_XEvent)]
+        x11.XFlush.argtypes = [ctypes.c_void_p]
+        x11.XGetSelectionOwner.restype = ctypes.c_ulong
+        x11.XGetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong]
+        xfixes.XFixesQueryExtension.argtypes = [ctypes.c_void_p, ctypes.POINTER(ctypes.c_int), ctypes.POINTER(ctypes.c_int)]
+        xfixes.XFixesSelectSelectionInput.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+
+    def watch_clipboard(self) -> None:
+        """Ask the server for an event whenever the CLIPBOARD owner changes."""
+        self.xfixes.XFixesSelectSelectionInput(
+            self.display, self.root, self.clipboard, self.XFixesSetSelectionOwnerNotifyMask
+        )
+        self.x11.XFlush(self.display)
+
+    def drain_events(self) -> int:
+        """Consume queued events; returns how many were selection notifications."""
+        count = 0
+        event = _XEvent()
+        while self.x11.XPending(self.display):
+            self.x11.XNextEvent(self.display, ctypes.byref(event))
+            if event.type == self.selection_notify:
+                count += 1
+        return count
+
+    def selection_owner(self) -> int:
+        return self.x11.XGetSelectionOwner(self.display, self.clipboard)
+
+    def close(self) -> None:
+        self.x11.XCloseDisplay(self.display)
+
+
+class XFixesBackend(ClipboardBackend):
+    """X11 backend: blocks on the X connection until XFixes reports a new CLIPBOARD owner."""
+    def __init__(self, display_name: Optional[str] = None):
+        self._x = X11Display(display_name)
+        self._x.watch_clipboard()
+        self._wake = _WakePipe()
+
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        if self._x.drain_events():
+            return True
+        readable, _, _ = select.select([self._x.fd, self._wake.read_fd], [], [], timeout)
+        if self._wake.read_fd in readable:
+            self._wake.drain()
+            return False
+        return self._x.drain_events() > 0
+
+    def wake(self) -> None:
+        self._wake.wake()
+
+    def close(self) -> None:
+        self._x.close()
+        self._wake.close()
+
+
+class ChangeSignal:
+    """
+    Cheap clipboard change indicator for PollingBackend: token() returns a
+    value that changes whenever the clipboard does, without transferring
+    the clipboard content.
+    """
+    def token(self) -> object:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the connection held by the signal."""
+
+
+class WindowsSequenceSignal(ChangeSignal):
+    """GetClipboardSequenceNumber: incremented by Windows on every clipboard change."""
+    def __init__(self):
+        self._user32 = ctypes.windll.user32
+        self._user32.GetClipboardSequenceNumber.restype = ctypes.c_uint32
+
+    def token(self) -> object:
+        return self._user32.GetClipboardSequenceNumber()
+
+
+class MacChangeCountSignal(ChangeSignal):
+    """NSPasteboard.changeCount (needs pyobjc)."""
+    def __init__(self):
+        from AppKit import NSPasteboard
+        self._pasteboard = NSPasteboard.generalPasteboard()
+
+    def token(self) -> object:
+        return self._pasteboard.changeCount()
+
+
+class X11OwnerSignal(ChangeSignal):
+    """
+    XFixes owner-change counter read without blocking, over one persistent
+    X connection (instead of one xclip process per poll).
+    """
+    def __init__(self, display_name: Optional[str] = None):
+        self._x = X11Display(display_name)
+        self._x.watch_clipboard()
+        self._count = 0
+
+    def token(self) -> object:
+        self._count += self._x.drain_events()
+        return self._count
+
+    def close(self) -> None:
+        self._x.close()
+
+
+def default_change_signal() -> Optional[ChangeSignal]:
+    """The cheapest change signal this platform offers, or None."""
+    try:
+        if sys.platform == "win32":
+            return WindowsSequenceSignal()
+        if sys.platform == "darwin":
+            return MacChangeCountSignal()
+        if os.environ.get("DISPLAY"):
+            return X11OwnerSignal()
+    except (ImportError, OSError, AttributeError) as e:
+        logger.warning(f"No clipboard change signal available: {e}")
+    return None
+
+
+def create_backend(interval: float = 0.5, max_interval: float = 2.0) -> ClipboardBackend:
+    """
+    Pick the best clipboard backend for this session: change notifications
+    on Wayland/X11, signal-gated adaptive polling everywhere else or if
+    they are unavailable.
+    """
+    if sys.platform.startswith("linux"):
+        if os.environ.get("WAYLAND_DISPLAY") and shutil.which("wl-paste"):
+            try:
+                return WlPasteWatchBackend()
+            except OSError as e:
+                logger.warning(f"wl-paste watch unavailable, falling back: {e}")
+        if os.environ.get("DISPLAY"):
+            try:
+                return XFixesBackend()
+            except OSError as e:
+                logger.warning(f"XFixes clipboard events unavailable, falling back: {e}")
+    return PollingBackend(interval, max_interval=max_interval, signal=default_change_signal())
@@ -1,7 +1,10 @@
 import time
+import hashlib
 import threading
 import logging
-import pyperclip
+from typing import Optional
+from safepaste.clipboard_backends import ClipboardBackend, PollingBackend
+from safepaste.metrics import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -9,7 +12,7 @@ class ClipboardMonitor:
     """
     Monitors the system clipboard for changes and triggers callbacks.
     """
-    def __init__(self, callback, interval: float = 0.5):
+    def __init__(self, callback, interval: float = 0.5, backend: Optional[ClipboardBackend] = None):
         """
         Initialize the ClipboardMonitor.
 
@@ -17,12 +20,16 @@ class ClipboardMonitor:
             callback (callable): Function to call when clipboard content changes.
                                  Signature: callback(new_content: str)
             interval (float): Polling interval in seconds (default: 0.5s).
+            backend (ClipboardBackend): Source of change notifications and content
+                                        (default: PollingBackend(interval)).
         """
         self.callback = callback
         self.interval = interval
+        self.backend = backend or PollingBackend(interval)
         self.running = False
         self._thread = None
-        self._last_content = ""
+        # Digest of the last seen content, so large payloads aren't held twice
+        self._last_digest = _digest("")
 
     def start(self):
         """Start the monitoring thread."""
@@ -37,35 +44,50 @@ class ClipboardMonitor:
     def stop(self):
         """Stop the monitoring thread."""
         self.running = False
+        self.backend.wake()
         if self._thread:
             self._thread.join()
         logger.info("Clipboard monitor stopped.")
 
     def _monitor_loop(self):
-        """Internal loop to poll clipboard."""
+        """Internal loop: wait for a change notification, then compare content."""
         # Initialize with current clipboard content to avoid immediate trigger
         try:
-            self._last_content = pyperclip.paste()
+            self._last_digest = _digest(self.backend.read())
         except Exception as e:
             logger.error(f"Failed to access clipboard on startup: {e}")
         
         while self.running:
-            time.sleep(self.interval)
             try:
-                current_content = pyperclip.paste()
-                if current_content != self._last_content:
-                    self._last_content = current_content
+                # Event-driven backends block here at zero CPU until a copy happens
+                if not self.backend.wait_for_change() or not self.running:
+                    continue
+                with metrics.timer("stage.clipboard_read"):
+                    current_content = self.backend.read()
+                current_digest = _digest(current_content)
+                changed = current_digest != self._last_digest
+                self.backend.content_checked(changed)
+                if changed:
+                    self._last_digest = current_digest
                     # Only trigger if content is text and not empty (optional, but good practice)
                     if isinstance(current_content, str) and current_content.strip():
                         logger.debug("Clipboard change detected.")
                         self.callback(current_content)
             except Exception as e:
                 logger.error(f"Error accessing clipboard: {e}")
+                # Don't spin if the backend keeps failing
+                time.sleep(self.interval)
 
     def update_last_content(self, content: str):
         """
-        Update local cache of clipboard content. 
+        Update the remembered clipboard content (stored as a digest).
         Call this when the app programmatically changes the clipboard 
         to prevent self-triggering loops.
         """
-        self._last_content = content
+        self._last_digest = _digest(content)
+
+
+def _digest(content) -> bytes:
+    if not isinstance(content, str):
+        content = repr(content)
+    return hashlib.blake2b(content.encode("utf-8", "surrogatepass"), digest_size=16).digest()
@@ -5,3 +5,26 @@ class Config:
     launch_on_startup: bool = True
     min_text_length: int = 10
     vault_ttl: int = 1800
+    detection_cache_max_bytes: int = 4 * 1024 * 1024
+    detection_cache_ttl: int = 1800
+    stream_threshold: int = 256 * 1024
+    stream_chunk_size: int = 64 * 1024
+    detection_profile: str = "accurate"
+    vault_max_entries: int = 10000
+    vault_max_bytes: int = 8 * 1024 * 1024
+    vault_persist: bool = False
+    vault_path: str = ""  # empty: per-user default location
+    detection_workers: int = 1
+    detector_backend: str = "inprocess"  # "process": NER runs in recycled worker processes
+    detector_processes: int = 1
+    worker_max_jobs: int = 1000
+    worker_max_rss_mb: int = 2048
+    incremental_detection: bool = True  # re-analyze only the edited part of a re-copied large text
+    metrics_enabled: bool = False  # per-stage timers and event counters; both are no-ops when off
+    metrics_file: str = ""  # if set, metrics are written there as JSON every few seconds
+    metrics_port: int = 0  # if set, metrics are served on http://127.0.0.1:<port>/metrics
+    daemon_address: str = ""  # if set, share this app's model with `safepaste scrub --daemon` clients
+    deny_list_path: str = ""  # compiled dictionary (safepaste compile-dict) of terms to always scrub
+    allow_list_path: str = ""  # compiled dictionary of known-safe terms never to scrub
+    review_policy: str = "queue"  # detection while a review is open: "queue" it after that one, or "replace" it
+    review_max_pending: int = 20  # queued results kept; the oldest are dropped (and logged) beyond that
@@ -0,0 +1,465 @@
+"""
+Local scrubbing service: one warm PiiDetector and Vault shared over a Unix
+socket or localhost HTTP, so tools do not each load their own spaCy model.
+
+Endpoints (JSON in, JSON out):
+    POST /scrub    {"text": "..."} -> {"text": scrubbed, "entities": [...]}
+    POST /restore  {"text": "..."} -> {"text": restored}
+    GET  /health                   -> {"ready": bool, "profile": str, ...}
+
+Concurrent /scrub requests are micro-batched into one detect_many() call.
+"""
+import os
+import re
+import stat
+import errno
+import sys
+import json
+import asyncio
+import logging
+import threading
+import http.client
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+from safepaste.pseudonymizer import Pseudonymizer
+from safepaste.vault import Vault
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_REQUEST_BYTES = 1024 * 1024
+DEFAULT_TCP_PORT = 8787
+MAX_HEADER_BYTES = 16 * 1024
+# Host names a TCP request may name. Anything else (e.g. a DNS-rebinding page's
+# own domain resolving to 127.0.0.1) is refused before it reaches /restore.
+DEFAULT_ALLOWED_HOSTS = ("localhost", "127.0.0.1", "::1")
+_CONTENT_LENGTH = re.compile(r"[0-9]+")
+
+
+def default_address() -> str:
+    """Per-user Unix socket where available, else a localhost TCP port (Windows)."""
+    if sys.platform == "win32":
+        return f"127.0.0.1:{DEFAULT_TCP_PORT}"
+    base = os.environ.get("XDG_RUNTIME_DIR") or os.path.expanduser("~")
+    return os.path.join(base, "safepaste.sock")
+
+
+def parse_address(address: str) -> Tuple[str, Any]:
+    """
+    Parse "unix:/path", "/path" or "host:port".
+
+    Returns:
+        Tuple[str, Any]: ("unix", path) or ("tcp", (host, port)).
+    """
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if "/" in address or os.sep in address:
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
+
+
+def _remove_stale_socket(path: str) -> None:
+    """
+    Remove the socket a previous daemon left behind at `path`.
+
+    Raises:
+        OSError: EADDRINUSE if `path` is not a socket, or a daemon still answers on it.
+    """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EADDRINUSE, f"Address in use: {path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)  # nobody listening: stale socket from a previous run
+        return
+    except OSError as e:
+        raise OSError(errno.EADDRINUSE, f"Address in use: cannot check {path}: {e}") from e
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"Address in use: another daemon is listening on {path}")
+
+
+def _host_name(host: str) -> str:
+    """Lowercased host of a Host header value (or origin authority), without the port."""
+    host = host.strip().lower()
+    if host.startswith("["):
+        return host[1:host.find("]")] if "]" in host else host
+    return host.rpartition(":")[0] if ":" in host else host
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from the event loop into batches for a blocking
+    function run on a worker thread.
+
+    A batch closes after `max_delay` seconds or `max_batch` items; items that
+    arrive while a batch is running wait for the next one, so batches grow
+    with load and a lone request only pays `max_delay`.
+    """
+    def __init__(self, process: Callable[[List[Any]], List[Any]], max_batch: int = 32, max_delay: float = 0.005):
+        self.process = process
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="daemon-batch")
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batches += 1
+            try:
+                results = await loop.run_in_executor(self._executor, self.process, [item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    async def close(self):
+        if self._runner:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+
+class ScrubDaemon:
+    """
+    asyncio HTTP server exposing a detector, pseudonymizer and vault.
+
+    Minimal HTTP/1.1 (keep-alive, Content-Length bodies) so clients can use
+    any HTTP library, over a Unix socket (owner-only) or localhost TCP.
+    """
+    def __init__(self, detector, vault: Vault, max_request_bytes: int = DEFAULT_MAX_REQUEST_BYTES,
+                 max_batch: int = 32, max_delay: float = 0.005, allowed_hosts: Sequence[str] = DEFAULT_ALLOWED_HOSTS):
+        """
+        Initialize the ScrubDaemon.
+
+        Args:
+            detector (PiiDetector): Shared detector (its detect_many() is used for batches).
+            vault (Vault): Vault receiving the placeholder mappings.
+            max_request_bytes (int): Largest accepted request body; larger ones get 413.
+            max_batch (int): Most scrub requests per detection batch.
+            max_delay (float): Seconds a batch waits for more requests.
+            allowed_hosts (Sequence[str]): Host header names accepted over TCP; other requests,
+                                           and those from a non-local browser Origin, get 403.
+        """
+        self.detector = detector
+        self.vault = vault
+        self.pseudonymizer = Pseudonymizer(vault)
+        self.max_request_bytes = max_request_bytes
+        self.allowed_hosts = frozenset(h.lower() for h in allowed_hosts)
+        self._handlers: Set[asyncio.Task] = set()
+        self.batcher = MicroBatcher(self._scrub_batch, max_batch=max_batch, max_delay=max_delay)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._unix_path: Optional[str] = None
+        self.requests = 0
+
+    def _scrub_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Runs on the batch thread: one detection pass for all texts, then pseudonymize each."""
+        output = []
+        for text, results in zip(texts, self.detector.detect_many(texts)):
+            scrubbed = self.pseudonymizer.pseudonymize_with_map(text, results)
+            output.append({
+                "text": scrubbed.text,
+                "entities": [
+                    {"entity_type": s.entity_type, "placeholder": s.placeholder, "start": s.start, "end": s.end}
+                    for s in scrubbed.spans
+                ],
+            })
+        return output
+
+    async def start(self, address: str):
+        """Start listening on `address` (see parse_address)."""
+        kind, target = parse_address(address)
+        self._loop = asyncio.get_running_loop()
+        if kind == "unix":
+            _remove_stale_socket(target)
+            old_umask = os.umask(0o177)
+            try:
+                self._server = await asyncio.start_unix_server(self._handle, path=target, limit=MAX_HEADER_BYTES)
+            finally:
+                os.umask(old_umask)
+            self._unix_path = target
+        else:
+            self._server = await asyncio.start_server(self._handle, host=target[0], port=target[1], limit=MAX_HEADER_BYTES)
+        self.batcher.start()  # only once listening, so a refused address leaves no task behind
+        logger.info(f"Scrub daemon listening on {self.address}")
+
+    @property
+    def address(self) -> str:
+        """The bound address, in the form parse_address() accepts (TCP port 0 resolved)."""
+        if self._unix_path:
+            return self._unix_path
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"{host}:{port}"
+
+    async def close(self):
+        if self._server:
+            self._server.close()
+            # Idle keep-alive connections would otherwise outlive the loop.
+            handlers = list(self._handlers)
+            for task in handlers:
+                task.cancel()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        await self.batcher.close()
+        if self._unix_path and os.path.exists(self._unix_path):
+            os.unlink(self._unix_path)
+
+    async def serve_forever(self, address: str):
+        await self.start(address)
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    def start_in_background(self, address: str) -> str:
+        """
+        Run the daemon on its own event loop thread (e.g. inside the tray app).
+
+        Returns:
+            str: The bound address.
+        """
+        started = threading.Event()
+        errors: List[BaseException] = []
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start(address))
+            except BaseException as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.close())
+            loop.close()
+
+        self._thread = threading.Thread(target=run, name="scrub-daemon", daemon=True)
+        self._thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self.address
+
+    def stop(self):
+        """Stop a daemon started with start_in_background()."""
+        if self._loop and self._thread:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._thread = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                    if request is not None and not self._unix_path:
+                        self._check_origin(request[2])
+                except HttpError as e:
+                    await self._respond(writer, e.status, {"error": str(e)}, close=True)
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                self.requests += 1
+                try:
+                    status, payload = 200, await self._dispatch(method, path, body)
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    logger.error(f"Scrub daemon request failed: {e}", exc_info=True)
+                    status, payload = 500, {"error": "internal error"}
+                close = headers.get("connection", "").lower() == "close"
+                await self._respond(writer, status, payload, close)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # CancelledError: close() is shutting the daemon down
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+            try:
+                # The socket is only released by a loop callback; let it run before close() returns.
+                await writer.wait_closed()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+
+    def _check_origin(self, headers: Dict[str, str]):
+        """TCP only: refuse requests addressed to another host name, or sent by a non-local web page."""
+        if _host_name(headers.get("host", "")) not in self.allowed_hosts:
+            raise HttpError(403, "host not allowed")
+        origin = headers.get("origin")
+        if origin is not None and _host_name(origin.partition("://")[2]) not in self.allowed_hosts:
+            raise HttpError(403, "origin not allowed")
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(431, "headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        raw_length = headers.get("content-length", "0") or "0"
+        if not _CONTENT_LENGTH.fullmatch(raw_length):
+            raise HttpError(400, "invalid Content-Length")
+        length = int(raw_length)
+        if length > self.max_request_bytes:
+            raise HttpError(413, f"request body over {self.max_request_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def _dispatch(self, method: str, path: str, body: bytes) -> Dict[str, Any]:
+        if path == "/health" and method == "GET":
+            return {
+                "ready": self.detector.is_ready,
+                "profile": self.detector.profile,
+                "vault_entries": len(self.vault),
+                "batches": self.batcher.batches,
+                "requests": self.requests,
+            }
+        if path not in ("/scrub", "/restore"):
+            raise HttpError(404, "not found")
+        if method != "POST":
+            raise HttpError(405, "use POST")
+        try:
+            text = json.loads(body)["text"]
+        except (ValueError, KeyError, TypeError):
+            raise HttpError(400, 'expected a JSON object with a "text" string')
+        if not isinstance(text, str):
+            raise HttpError(400, '"text" must be a string')
+
+        if path == "/scrub":
+            return await self.batcher.submit(text)
+        loop = asyncio.get_running_loop()
+        return {"text": await loop.run_in_executor(None, self.pseudonymizer.rehydrate, text)}
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], close: bool = False):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        reason = http.client.responses.get(status, "")
+        head = (
+            f"HTTP/1.1 {status} {reason}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class DaemonClient:
+    """Blocking client for a ScrubDaemon; keeps one connection open between calls."""
+    def __init__(self, address: Optional[str] = None, timeout: float = 30.0):
+        kind, target = parse_address(address or default_address())
+        if kind == "unix":
+            self._connect = lambda: _UnixHTTPConnection(target, timeout)
+        else:
+            self._connect = lambda: http.client.HTTPConnection(target[0], target[1], timeout=timeout)
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def _request(self, method: str, path: str, payload: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                try:
+                    self._conn.request(method, path, body=body, headers={"Content-Type": "application/json"})
+                except (BrokenPipeError, ConnectionResetError):
+                    # The daemon answers an oversized body with 413 and closes without
+                    # reading it; the response may still be waiting to be read.
+                    pass
+                response = self._conn.getresponse()
+                data = json.loads(response.read())
+                break
+            except (ConnectionError, http.client.RemoteDisconnected, http.client.CannotSendRequest):
+                # Kept-alive connection went stale; reconnect once.
+                self.close()
+                if attempt:
+                    raise
+        if response.status != 200:
+            raise RuntimeError(f"Scrub daemon error {response.status}: {data.get('error')}")
+        return data
+
+    def scrub(self, text: str) -> Dict[str, Any]:
+        """Scrub `text`. Returns {"text": scrubbed, "entities": [...]}."""
+        return self._request("POST", "/scrub", {"text": text})
+
+    def restore(self, text: str) -> str:
+        """Put the original values back into `text`."""
+        return self._request("POST", "/restore", {"text": text})["text"]
+
+    def health(self) -> Dict[str, Any]:
+        return self._request("GET", "/health")
+
+    def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
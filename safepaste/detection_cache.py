@@ -0,0 +1,115 @@
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+from presidio_analyzer import RecognizerResult
+
+logger = logging.getLogger(__name__)
+
+# (entity_type, start, end, score) - compact form of a RecognizerResult
+Span = Tuple[str, int, int, float]
+
+# Rough per-entry and per-span overheads (bytes) used for the size budget.
+_ENTRY_OVERHEAD = 200
+_SPAN_OVERHEAD = 120
+
+
+class DetectionCache:
+    """
+    Content-addressed LRU cache for detection results.
+
+    Entries are keyed by a digest of (text, language, entity set), so the
+    clipboard text itself is never kept in the cache, only the spans.
+    """
+    def __init__(self, max_bytes: int = 4 * 1024 * 1024, ttl_seconds: int = 1800):
+        """
+        Initialize the DetectionCache.
+
+        Args:
+            max_bytes (int): Approximate memory budget; 0 disables the cache.
+            ttl_seconds (int): Time-to-live for cached results in seconds.
+        """
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[float, int, Tuple[Span, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def key(text: str, language: str, entities: Iterable[str]) -> bytes:
+        """Digest of the inputs that determine a detection result."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(language.encode())
+        h.update(b"\0")
+        h.update(",".join(sorted(entities)).encode())
+        h.update(b"\0")
+        h.update(text.encode("utf-8", "surrogatepass"))
+        return h.digest()
+
+    def get(self, key: bytes) -> Optional[List[RecognizerResult]]:
+        """
+        Look up cached results.
+
+        Returns:
+            Optional[List[RecognizerResult]]: Fresh result objects, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            created, size, spans = entry
+            if time.monotonic() - created > self.ttl_seconds:
+                self._drop(key, size)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers may mutate results (e.g. sort in place), so never hand out shared objects.
+        return [RecognizerResult(entity_type, start, end, score) for entity_type, start, end, score in spans]
+
+    def put(self, key: bytes, results: List[RecognizerResult]) -> None:
+        """Store results, evicting least recently used entries past the size budget."""
+        spans = tuple((r.entity_type, r.start, r.end, r.score) for r in results)
+        size = _ENTRY_OVERHEAD + len(key) + _SPAN_OVERHEAD * len(spans)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (time.monotonic(), size, spans)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                old_key, (_, old_size, _) = next(iter(self._entries.items()))
+                self._drop(old_key, old_size)
+                self.evictions += 1
+
+    def _drop(self, key: bytes, size: int) -> None:
+        del self._entries[key]
+        self._bytes -= size
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Counters and current footprint of the cache."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
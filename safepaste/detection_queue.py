@@ -0,0 +1,148 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionJob:
+    """One clipboard payload waiting for, or going through, detection."""
+    __slots__ = ("content", "generation", "submitted_at", "started_at", "_queue")
+
+    def __init__(self, content: str, generation: int, queue: "DetectionQueue"):
+        self.content = content
+        self.generation = generation
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._queue = queue
+
+    @property
+    def cancelled(self) -> bool:
+        """True once newer clipboard content has been submitted; the job should stop early."""
+        return self.generation != self._queue.latest_generation
+
+
+class DetectionQueue:
+    """
+    Bounded, latest-wins work queue between the clipboard monitor and detection.
+
+    submit() never blocks the monitor. When the queue is full, the oldest
+    pending job is dropped (coalesced), since only the newest clipboard
+    content matters. Jobs that are running when newer content arrives see
+    `job.cancelled` and should stop early. Their results are dropped by
+    deliver_if_current().
+    """
+    def __init__(self, process: Callable[[DetectionJob], None], workers: int = 1, maxsize: int = 1):
+        """
+        Initialize the DetectionQueue.
+
+        Args:
+            process (callable): Runs detection for a job on a worker thread.
+                                Signature: process(job: DetectionJob)
+            workers (int): Number of detection worker threads.
+            maxsize (int): Pending jobs kept before the oldest is coalesced away.
+        """
+        self.process = process
+        self.workers = workers
+        self.maxsize = maxsize
+        self.latest_generation = 0
+        self._pending: Deque[DetectionJob] = deque()
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self._in_flight = 0
+        self._counters = {
+            "submitted": 0,
+            "coalesced": 0,
+            "cancelled": 0,
+            "dropped_results": 0,
+            "completed": 0,
+            "failed": 0,
+        }
+        self._max_wait = 0.0
+        self._last_wait = 0.0
+
+    def start(self):
+        """Start the worker threads."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"detection-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Detection queue started with {self.workers} worker(s).")
+
+    def stop(self):
+        """Stop the workers; pending jobs are discarded."""
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def submit(self, content: str) -> DetectionJob:
+        """Queue new clipboard content, superseding everything submitted before it."""
+        with self._cond:
+            self.latest_generation += 1
+            job = DetectionJob(content, self.latest_generation, self)
+            self._counters["submitted"] += 1
+            while len(self._pending) >= self.maxsize:
+                self._pending.popleft()
+                self._counters["coalesced"] += 1
+            self._pending.append(job)
+            self._cond.notify()
+        return job
+
+    def deliver_if_current(self, job: DetectionJob, deliver: Callable, *args) -> bool:
+        """Call deliver(*args) unless the job was superseded; stale results are dropped."""
+        if job.cancelled:
+            with self._cond:
+                self._counters["dropped_results"] += 1
+            logger.debug(f"Dropped result of superseded clipboard content (generation {job.generation}).")
+            return False
+        deliver(*args)
+        return True
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    return
+                job = self._pending.popleft()
+                job.started_at = time.monotonic()
+                self._last_wait = job.started_at - job.submitted_at
+                self._max_wait = max(self._max_wait, self._last_wait)
+                if job.cancelled:
+                    self._counters["coalesced"] += 1
+                    continue
+                self._in_flight += 1
+
+            outcome = "completed"
+            try:
+                self.process(job)
+                if job.cancelled:
+                    outcome = "cancelled"
+            except Exception as e:
+                outcome = "failed"
+                logger.error(f"Detection job failed: {e}", exc_info=True)
+            with self._cond:
+                self._in_flight -= 1
+                self._counters[outcome] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Backpressure metrics: counters, queue depth, in-flight jobs and queue wait times."""
+        with self._cond:
+            stats: Dict[str, float] = dict(self._counters)
+            stats["pending"] = len(self._pending)
+            stats["in_flight"] = self._in_flight
+            stats["last_wait_seconds"] = self._last_wait
+            stats["max_wait_seconds"] = self._max_wait
+            return stats
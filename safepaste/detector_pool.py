@@ -0,0 +1,288 @@
+import time
+import queue
+import logging
+import threading
+import multiprocessing
+from typing import Callable, List, Optional
+from presidio_analyzer import RecognizerResult
+from safepaste.metrics import rss_mb
+
+logger = logging.getLogger(__name__)
+
+
+def build_profile_analyzer(profile: str, language: str):
+    """Default worker factory: the in-process analyzer for a detection profile."""
+    from safepaste.pii_detector import PROFILES, build_analyzer
+    return build_analyzer(PROFILES[profile], language)
+
+
+def _worker_main(conn, factory: Callable, profile: str, language: str):
+    """
+    Subprocess entry point: preload the model, then serve analyze requests until told to stop.
+    Results go back as one tuple of (entity_type, start, end, score) tuples per text.
+    """
+    try:
+        analyzer = factory(profile, language)
+        analyzer.analyze(text="John Smith", entities=["PERSON"], language=language)
+    except Exception as e:
+        conn.send(("error", repr(e)))
+        return
+    conn.send(("ready", rss_mb()))
+
+    while True:
+        request = conn.recv()
+        if request is None:
+            return
+        texts, entities = request
+        try:
+            payload = [
+                tuple((r.entity_type, r.start, r.end, r.score)
+                      for r in analyzer.analyze(text=text, entities=entities, language=language))
+                for text in texts
+            ]
+            conn.send(("ok", payload, rss_mb()))
+        except Exception as e:
+            conn.send(("error", repr(e)))
+
+
+class _Worker:
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.jobs = 0
+        self.rss_mb = 0.0
+
+
+class ProcessPoolAnalyzer:
+    """
+    Runs the Presidio analyzer in subprocess workers.
+
+    Keeps spaCy inference, and the memory it fragments, out of the UI
+    process. Each worker preloads the model, takes texts over a pipe and
+    returns compact span tuples. A worker is recycled after `max_jobs`
+    requests or once its RSS passes `max_rss_mb`; its replacement loads in
+    the background while the other workers keep serving.
+    """
+    def __init__(self, profile: str, language: str = "en", workers: int = 1, max_jobs: int = 1000,
+                 max_rss_mb: float = 2048, factory: Callable = build_profile_analyzer,
+                 start_timeout: float = 300, acquire_timeout: Optional[float] = None,
+                 request_timeout: float = 60):
+        """
+        Initialize the ProcessPoolAnalyzer and wait until every worker has loaded its model.
+
+        Args:
+            profile (str): Detection profile name the workers load.
+            language (str): Language code.
+            workers (int): Number of subprocess workers.
+            max_jobs (int): Requests served before a worker is recycled.
+            max_rss_mb (float): Resident memory (MB) above which a worker is recycled.
+            factory (callable): Builds the analyzer inside a worker: factory(profile, language).
+            start_timeout (float): Seconds to wait for a worker's model to load.
+            acquire_timeout (float): Seconds a call waits for an idle worker before
+                                     raising (default: start_timeout, the longest a replacement takes).
+            request_timeout (float): Seconds a call waits for its workers' results; a worker
+                                     that has not answered by then is killed and replaced.
+        """
+        self.profile = profile
+        self.language = language
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.factory = factory
+        self.start_timeout = start_timeout
+        self.acquire_timeout = start_timeout if acquire_timeout is None else acquire_timeout
+        self.request_timeout = request_timeout
+        self.recycled = 0
+        self._size = workers
+        self._respawning = 0  # replacements being started, guarded by _workers_lock
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._closed = False
+        self._workers: List[_Worker] = []
+        self._workers_lock = threading.Lock()
+        for _ in range(workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, self.factory, self.profile, self.language),
+            name="safepaste-detector",
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(self.start_timeout):
+            self._discard(process, parent_conn)
+            raise TimeoutError("Detector worker did not start in time")
+        try:
+            status, detail = parent_conn.recv()
+        except EOFError:
+            process.join()
+            status, detail = "error", f"exited with code {process.exitcode}"
+        if status != "ready":
+            self._discard(process, parent_conn)
+            raise RuntimeError(f"Detector worker failed to load: {detail}")
+        worker = _Worker(process, parent_conn)
+        worker.rss_mb = detail
+        with self._workers_lock:
+            self._workers.append(worker)
+        logger.info(f"Detector worker {process.pid} ready ({detail:.0f} MB).")
+        return worker
+
+    def analyze(self, text: str, entities: List[str], language: Optional[str] = None, **kwargs) -> List[RecognizerResult]:
+        """AnalyzerEngine-compatible single-text call."""
+        return self.analyze_many([text], entities)[0]
+
+    def analyze_many(self, texts: List[str], entities: List[str]) -> List[List[RecognizerResult]]:
+        """
+        Analyze texts across the idle workers in parallel.
+
+        Returns:
+            List[List[RecognizerResult]]: Results in input order.
+        """
+        if not texts:
+            return []
+        if self._closed:
+            raise RuntimeError("ProcessPoolAnalyzer is closed")
+
+        # Wait for one worker, then take whichever others are idle right now.
+        workers = [self._acquire()]
+        while len(workers) < len(texts):
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+        size = -(-len(texts) // len(workers))
+        slices = [texts[i:i + size] for i in range(0, len(texts), size)]
+        workers, spare = workers[:len(slices)], workers[len(slices):]
+        for worker in spare:
+            self._idle.put(worker)
+
+        try:
+            for worker, chunk in zip(workers, slices):
+                worker.conn.send((chunk, entities))
+            output: List[List[RecognizerResult]] = []
+            error = None
+            deadline = time.monotonic() + self.request_timeout
+            for worker in workers:
+                if not worker.conn.poll(max(0.0, deadline - time.monotonic())):
+                    # Hung mid-analysis: kill it so its replacement does not wait on it.
+                    worker.process.kill()
+                    raise TimeoutError(f"Detector worker {worker.process.pid} did not reply "
+                                       f"within {self.request_timeout:.0f}s")
+                reply = worker.conn.recv()
+                worker.jobs += 1
+                if reply[0] == "ok":
+                    _, payload, worker.rss_mb = reply
+                    output.extend([RecognizerResult(*span) for span in spans] for spans in payload)
+                else:
+                    error = reply[1]
+            if error:
+                raise RuntimeError(f"Detector worker error: {error}")
+            return output
+        except (EOFError, OSError) as e:
+            # A worker died or hung mid-request; replace all of this call's workers,
+            # since the others may still have replies for it in their pipes.
+            for worker in workers:
+                worker.jobs = self.max_jobs
+            if isinstance(e, TimeoutError):
+                raise RuntimeError(str(e))
+            raise RuntimeError(f"Detector worker crashed: {e}")
+        finally:
+            for worker in workers:
+                self._release(worker)
+
+    def _acquire(self) -> _Worker:
+        """
+        Wait for an idle worker, at most acquire_timeout seconds.
+
+        A slot left empty by a failed replacement is refilled here, in the
+        calling thread, so the failure reaches the caller (which can fall
+        back to the pattern tier) instead of the call waiting forever.
+        """
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._workers_lock:
+                lost = len(self._workers) + self._respawning < self._size
+                if lost:
+                    self._respawning += 1
+            if lost:
+                try:
+                    return self._spawn()
+                finally:
+                    with self._workers_lock:
+                        self._respawning -= 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise RuntimeError(f"No detector worker available after {self.acquire_timeout:.0f}s")
+            try:
+                # Short waits, so a replacement that fails meanwhile is noticed.
+                return self._idle.get(timeout=min(remaining, 0.5))
+            except queue.Empty:
+                if self._closed:
+                    raise RuntimeError("ProcessPoolAnalyzer is closed")
+
+    def _release(self, worker: _Worker):
+        if self._closed:
+            self._stop_worker(worker)
+        elif worker.jobs >= self.max_jobs or worker.rss_mb > self.max_rss_mb or not worker.process.is_alive():
+            logger.info(f"Recycling detector worker {worker.process.pid} "
+                        f"({worker.jobs} jobs, {worker.rss_mb:.0f} MB).")
+            self.recycled += 1
+            with self._workers_lock:
+                self._respawning += 1
+            threading.Thread(target=self._replace, args=(worker,), name="detector-recycle", daemon=True).start()
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker: _Worker):
+        self._stop_worker(worker)
+        try:
+            replacement = self._spawn()
+        except Exception as e:
+            # The next call retries in its own thread (see _acquire) and gets the error.
+            logger.error(f"Failed to replace detector worker: {e}")
+            return
+        finally:
+            with self._workers_lock:
+                self._respawning -= 1
+        if self._closed:
+            self._stop_worker(replacement)
+        else:
+            self._idle.put(replacement)
+
+    @staticmethod
+    def _discard(process, conn):
+        """Kill a worker that never became ready and release its pipe and process."""
+        if process.is_alive():
+            process.kill()
+        process.join()
+        conn.close()
+
+    def _stop_worker(self, worker: _Worker):
+        with self._workers_lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+        try:
+            worker.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.conn.close()
+
+    def worker_stats(self) -> List[dict]:
+        """Per-worker pid, jobs served and last reported RSS."""
+        with self._workers_lock:
+            return [{"pid": w.process.pid, "jobs": w.jobs, "rss_mb": w.rss_mb} for w in self._workers]
+
+    def close(self):
+        """Stop all workers."""
+        self._closed = True
+        while True:
+            try:
+                self._stop_worker(self._idle.get_nowait())
+            except queue.Empty:
+                break
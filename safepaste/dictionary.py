@@ -0,0 +1,246 @@
+import re
+import json
+import struct
+import logging
+from array import array
+from bisect import bisect_right
+from collections import deque
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Tuple
+from safepaste.results import PatternResult
+
+if TYPE_CHECKING:
+    # Annotations only: the pattern tier must not pay for importing Presidio.
+    from presidio_analyzer import RecognizerResult
+
+logger = logging.getLogger(__name__)
+
+# Entity types become placeholders like [CUSTOMER_ID_1], so they follow the placeholder syntax.
+ENTITY_TYPE_PATTERN = re.compile(r"[A-Z][A-Z_]*")
+DEFAULT_ENTITY = "CUSTOM_TERM"
+# Deny-list hits are deliberate; they outrank NER guesses on the same span.
+DICTIONARY_SCORE = 1.0
+
+_MAGIC = b"SPDICT1\n"
+# Transition keys pack (state, code point) into one int: state * _ALPHABET + ord(char).
+_ALPHABET = 0x110000
+
+
+def _fold(text: str, case_sensitive: bool) -> str:
+    """Lowercase `text` without changing its length, so match offsets stay valid."""
+    if case_sensitive:
+        return text
+    folded = text.lower()
+    if len(folded) == len(text):
+        return folded
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word(c: str) -> bool:
+    return c.isalnum() or c == "_"
+
+
+class TermDictionary:
+    """
+    Aho-Corasick automaton over a large term list (deny or allow list).
+
+    Matching walks the text once, so its cost is linear in text length no
+    matter how many terms there are. Terms only match on word boundaries.
+    The automaton is compiled once with build() and saved as flat arrays;
+    load() restores it without rebuilding.
+    """
+    def __init__(self, goto: Dict[int, int], fail: array, out_len: array, out_type: array, out_link: array,
+                 entity_types: List[str], case_sensitive: bool, term_count: int):
+        self._goto = goto
+        self._fail = fail
+        self._out_len = out_len
+        self._out_type = out_type
+        self._out_link = out_link
+        self.entity_types = entity_types
+        self.case_sensitive = case_sensitive
+        self.term_count = term_count
+
+    def __len__(self) -> int:
+        return self.term_count
+
+    @classmethod
+    def build(cls, terms: Iterable[Tuple[str, str]], case_sensitive: bool = False) -> "TermDictionary":
+        """
+        Compile (term, entity_type) pairs into an automaton.
+
+        Args:
+            terms: Pairs of term and entity type; duplicate terms keep the last type.
+            case_sensitive (bool): Match case exactly (default: case-insensitive).
+
+        Returns:
+            TermDictionary: The compiled dictionary.
+        """
+        goto: Dict[int, int] = {}
+        out_len = array("i", [0])
+        out_type = array("i", [0])
+        entity_types: List[str] = []
+        type_index: Dict[str, int] = {}
+        count = 0
+
+        for term, entity_type in terms:
+            term = term.strip()
+            if not term:
+                continue
+            if not ENTITY_TYPE_PATTERN.fullmatch(entity_type):
+                raise ValueError(f"Invalid entity type {entity_type!r}: use A-Z and _")
+            if entity_type not in type_index:
+                type_index[entity_type] = len(entity_types)
+                entity_types.append(entity_type)
+            state = 0
+            for c in _fold(term, case_sensitive):
+                key = state * _ALPHABET + ord(c)
+                nxt = goto.get(key)
+                if nxt is None:
+                    nxt = len(out_len)
+                    goto[key] = nxt
+                    out_len.append(0)
+                    out_type.append(0)
+                state = nxt
+            if not out_len[state]:
+                count += 1
+            out_len[state] = len(term)
+            out_type[state] = type_index[entity_type]
+
+        states = len(out_len)
+        children: List[List[Tuple[int, int]]] = [[] for _ in range(states)]
+        for key, child in goto.items():
+            children[key // _ALPHABET].append((key % _ALPHABET, child))
+
+        # Breadth-first: failure link = longest proper suffix that is also a trie path;
+        # output link = nearest state on the failure chain that ends a term.
+        fail = array("i", [0]) * states
+        out_link = array("i", [0]) * states
+        queue = deque(child for _, child in children[0])
+        for _, child in children[0]:
+            fail[child] = 0
+        while queue:
+            state = queue.popleft()
+            for code, child in children[state]:
+                f = fail[state]
+                while f and f * _ALPHABET + code not in goto:
+                    f = fail[f]
+                target = goto.get(f * _ALPHABET + code, 0)
+                fail[child] = target if target != child else 0
+                suffix = fail[child]
+                out_link[child] = suffix if out_len[suffix] else out_link[suffix]
+                queue.append(child)
+
+        logger.info(f"Compiled dictionary: {count} terms, {states} states, {len(entity_types)} entity types.")
+        return cls(goto, fail, out_len, out_type, out_link, entity_types, case_sensitive, count)
+
+    def find(self, text: str) -> List[Tuple[int, int, str]]:
+        """
+        Find dictionary terms in `text`.
+
+        Returns:
+            List[Tuple[int, int, str]]: (start, end, entity_type) of the longest
+            term ending at each position, on word boundaries.
+        """
+        goto, fail, out_len, out_link = self._goto, self._fail, self._out_len, self._out_link
+        folded = _fold(text, self.case_sensitive)
+        length = len(text)
+        matches = []
+        state = 0
+        for i, c in enumerate(folded):
+            code = ord(c)
+            while True:
+                nxt = goto.get(state * _ALPHABET + code)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if not state:
+                    break
+                state = fail[state]
+
+            hit = state if out_len[state] else out_link[state]
+            while hit:
+                start = i + 1 - out_len[hit]
+                # Word boundary on each side, where the term itself starts/ends with a word character
+                if not (start and _is_word(text[start]) and _is_word(text[start - 1])) and \
+                        not (i + 1 < length and _is_word(text[i]) and _is_word(text[i + 1])):
+                    matches.append((start, i + 1, self.entity_types[self._out_type[hit]]))
+                    break
+                hit = out_link[hit]
+        return matches
+
+    def recognize(self, text: str) -> List[PatternResult]:
+        """Dictionary matches as PatternResults, for the pattern tier."""
+        return [PatternResult(entity_type, start, end, DICTIONARY_SCORE) for start, end, entity_type in self.find(text)]
+
+    def filter_allowed(self, text: str, results: List["RecognizerResult"]) -> List["RecognizerResult"]:
+        """
+        Drop results that fall inside an allow-list term (e.g. a product name tagged as PERSON).
+
+        Returns:
+            List[RecognizerResult]: The results not covered by an allowed term.
+        """
+        if not results:
+            return results
+        allowed = sorted((start, end) for start, end, _ in self.find(text))
+        if not allowed:
+            return results
+        starts = [start for start, _ in allowed]
+        ends = [end for _, end in allowed]
+        # Running max of ends: the widest allowed span starting at or before a point.
+        for i in range(1, len(ends)):
+            ends[i] = max(ends[i], ends[i - 1])
+        kept = []
+        for r in results:
+            i = bisect_right(starts, r.start)
+            if not (i and ends[i - 1] >= r.end):
+                kept.append(r)
+        return kept
+
+    def save(self, path: str) -> None:
+        """Write the compiled automaton to `path`."""
+        keys = array("q", self._goto.keys())
+        values = array("i", self._goto.values())
+        header = json.dumps({
+            "entity_types": self.entity_types,
+            "case_sensitive": self.case_sensitive,
+            "term_count": self.term_count,
+            "states": len(self._out_len),
+            "transitions": len(keys),
+        }).encode("utf-8")
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+            for arr in (keys, values, self._fail, self._out_len, self._out_type, self._out_link):
+                arr.tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "TermDictionary":
+        """Load an automaton written by save()."""
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"{path} is not a compiled SafePaste dictionary")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(header_len))
+            arrays = []
+            for typecode, count in (("q", header["transitions"]), ("i", header["transitions"])) + \
+                    tuple(("i", header["states"]) for _ in range(4)):
+                arr = array(typecode)
+                arr.fromfile(f, count)
+                arrays.append(arr)
+        keys, values, fail, out_len, out_type, out_link = arrays
+        return cls(dict(zip(keys, values)), fail, out_len, out_type, out_link,
+                   header["entity_types"], header["case_sensitive"], header["term_count"])
+
+
+def read_terms(path: str, default_entity: str = DEFAULT_ENTITY) -> Iterator[Tuple[str, str]]:
+    """
+    Read a term list: one term per line, optionally followed by a tab and its entity type.
+    Blank lines and lines starting with '#' are skipped.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\r\n")
+            if not line.strip() or line.startswith("#"):
+                continue
+            term, _, entity_type = line.partition("\t")
+            yield term, entity_type.strip() or default_entity
@@ -0,0 +1,105 @@
+from typing import List, Sequence, Tuple
+from presidio_analyzer import RecognizerResult
+
+# Below this size a full detection is cheap enough; the previous text is not kept.
+MIN_LENGTH = 4096
+# Characters of unchanged text re-analyzed on each side of an edit.
+CONTEXT = 256
+# Block size for prefix/suffix comparison; slices compare in C, so only the
+# last mismatching block is scanned character by character.
+_BLOCK = 4096
+
+_BOUNDARIES = ("\n", ". ", "! ", "? ")
+
+
+def common_prefix(a: str, b: str) -> int:
+    """Length of the longest common prefix of `a` and `b`."""
+    limit = min(len(a), len(b))
+    i = 0
+    while i < limit and a[i:i + _BLOCK] == b[i:i + _BLOCK]:
+        i += _BLOCK
+    i = min(i, limit)
+    end = min(i + _BLOCK, limit)
+    while i < end and a[i] == b[i]:
+        i += 1
+    return i
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    """Length of the longest common suffix of `a` and `b`, at most `limit`."""
+    la, lb = len(a), len(b)
+    i = 0
+    while i < limit and a[max(la - i - _BLOCK, la - limit):la - i] == b[max(lb - i - _BLOCK, lb - limit):lb - i]:
+        i += _BLOCK
+    i = min(i, limit)
+    end = min(i + _BLOCK, limit)
+    while i < end and a[la - i - 1] == b[lb - i - 1]:
+        i += 1
+    return i
+
+
+def _sentence_start(text: str, pos: int) -> int:
+    """Start of the sentence or line containing `pos`, looking back at most CONTEXT characters."""
+    lower = max(0, pos - CONTEXT)
+    cut = max(text.rfind(b, lower, pos) for b in _BOUNDARIES)
+    if cut == -1:
+        return lower
+    return cut + (1 if text[cut] == "\n" else 2)
+
+
+def _sentence_end(text: str, pos: int) -> int:
+    """End of the sentence or line containing `pos`, looking ahead at most CONTEXT characters."""
+    upper = min(len(text), pos + CONTEXT)
+    cuts = [c for c in (text.find(b, pos, upper) for b in _BOUNDARIES) if c != -1]
+    return min(cuts) + 1 if cuts else upper
+
+
+def affected_region(old_text: str, new_text: str, old_spans: Sequence[Tuple[str, int, int, float]]) -> Tuple[int, int, int]:
+    """
+    Where `new_text` has to be re-analyzed after an edit of `old_text`.
+
+    The changed range (between the common prefix and suffix) is widened by
+    CONTEXT characters and out to sentence boundaries, then further until no
+    previous span straddles its edges.
+
+    Returns:
+        Tuple[int, int, int]: (start, end) of the region in `new_text`, and the
+        length difference new - old; old offsets >= end - delta shift by delta.
+    """
+    prefix = common_prefix(old_text, new_text)
+    suffix = common_suffix(old_text, new_text, min(len(old_text), len(new_text)) - prefix)
+    delta = len(new_text) - len(old_text)
+
+    start = _sentence_start(new_text, max(0, prefix - CONTEXT))
+    end = _sentence_end(new_text, min(len(new_text), len(new_text) - suffix + CONTEXT))
+    # Both edges lie in unchanged text (start <= prefix, end >= len - suffix),
+    # so their offsets in the old text are start and end - delta.
+    moved = True
+    while moved:
+        moved = False
+        for _, span_start, span_end, _ in old_spans:
+            if span_start < start < span_end:
+                start, moved = span_start, True
+            if span_start < end - delta < span_end:
+                end, moved = span_end + delta, True
+    return start, end, delta
+
+
+def splice(old_spans: Sequence[Tuple[str, int, int, float]], start: int, end: int, delta: int,
+           region_results: List[RecognizerResult]) -> List[RecognizerResult]:
+    """
+    Combine the previous spans outside the region with fresh results for it.
+
+    Args:
+        old_spans: (entity_type, start, end, score) spans of the previous text.
+        start (int): Region start in the new text.
+        end (int): Region end in the new text.
+        delta (int): Length difference new - old.
+        region_results: Results for the region, already in new-text offsets.
+
+    Returns:
+        List[RecognizerResult]: Results for the whole new text.
+    """
+    before = [RecognizerResult(t, s, e, score) for t, s, e, score in old_spans if e <= start]
+    after = [RecognizerResult(t, s + delta, e + delta, score) for t, s, e, score in old_spans if s >= end - delta]
+    return before + region_results + after
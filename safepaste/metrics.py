@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import math
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Histogram buckets grow by 5% from 1 microsecond, so percentiles are accurate
+# to about 2.5% with a fixed, small memory footprint per timer.
+_BUCKET_BASE = 1e-6
+_BUCKET_GROWTH = 1.05
+_LOG_GROWTH = math.log(_BUCKET_GROWTH)
+
+
+def rss_mb() -> float:
+    """Resident memory of the current process in MB (0 if unknown)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    if sys.platform.startswith("linux"):
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+                    "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage",
+                )
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(
+            ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb
+        )
+        return counters.WorkingSetSize / (1024 * 1024)
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Histogram:
+    """Log-bucketed latency histogram (seconds in, milliseconds out)."""
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        index = int(math.log(seconds / _BUCKET_BASE) / _LOG_GROWTH) if seconds > _BUCKET_BASE else 0
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q: float) -> float:
+        """Approximate q-quantile in seconds (midpoint of the bucket it falls in)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = _BUCKET_BASE * _BUCKET_GROWTH ** (index + 0.5)
+                return min(value, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(0.50) * 1000,
+            "p95_ms": self.percentile(0.95) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _NullTimer:
+    """Shared no-op context manager returned by timer() while metrics are disabled."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_name", "_start")
+
+    def __init__(self, metrics: "Metrics", name: str):
+        self._metrics = metrics
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.observe(self._name, time.perf_counter() - self._start)
+        return False
+
+
+class Metrics:
+    """
+    In-process registry of stage timers, event counters and sampled gauges.
+
+    Disabled by default: timer() then returns a shared no-op and observe()
+    and incr() return after one attribute check, so instrumented code pays
+    next to nothing. Gauges are only sampled when a snapshot is taken.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, Callable[[], object]] = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+        self._exporter: Optional[threading.Thread] = None
+        self._exporter_stop = threading.Event()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def timer(self, name: str):
+        """Context manager that records the duration of its block under `name`."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record a duration measured elsewhere (e.g. queue wait)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(seconds)
+
+    def incr(self, name: str, amount: int = 1) -> None:
+        """Increment an event counter."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def register_gauge(self, name: str, sample: Callable[[], object]) -> None:
+        """Register a callable sampled at snapshot time (cache stats, queue depth, memory...)."""
+        self._gauges[name] = sample
+
+    def reset(self) -> None:
+        """Drop all recorded timings and counters (gauges stay registered)."""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+        self._started = time.time()
+
+    def snapshot(self) -> Dict[str, object]:
+        """Current timers (percentiles in ms), counters and gauge samples."""
+        with self._lock:
+            timers = {name: h.summary() for name, h in sorted(self._histograms.items())}
+            counters = dict(sorted(self._counters.items()))
+        gauges = {}
+        for name, sample in sorted(self._gauges.items()):
+            try:
+                gauges[name] = sample()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            "enabled": self.enabled,
+            "uptime_seconds": time.time() - self._started,
+            "timers": timers,
+            "counters": counters,
+            "gauges": gauges,
+        }
+
+    def write(self, path: str) -> None:
+        """Write a snapshot to `path` as JSON, replacing the file atomically."""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_file_export(self, path: str, interval: float = 5.0) -> None:
+        """Rewrite the metrics file every `interval` seconds on a background thread."""
+        if self._exporter and self._exporter.is_alive():
+            return
+        self._exporter_stop.clear()
+        self._exporter = threading.Thread(
+            target=self._export_loop, args=(path, interval), name="metrics-export", daemon=True
+        )
+        self._exporter.start()
+        logger.info(f"Writing metrics to {path} every {interval:g}s.")
+
+    def _export_loop(self, path: str, interval: float) -> None:
+        while not self._exporter_stop.wait(interval):
+            try:
+                self.write(path)
+            except OSError as e:
+                logger.error(f"Failed to write metrics file: {e}")
+
+    def serve(self, port: int = 0) -> int:
+        """
+        Serve snapshots as JSON on http://127.0.0.1:<port>/metrics.
+
+        Returns:
+            int: The bound port (useful with port 0).
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") not in ("", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = json.dumps(metrics.snapshot()).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        bound = self._server.server_address[1]
+        logger.info(f"Serving metrics on http://127.0.0.1:{bound}/metrics")
+        return bound
+
+    def close(self) -> None:
+        """Stop the file exporter and the HTTP endpoint."""
+        self._exporter_stop.set()
+        if self._exporter:
+            self._exporter.join()
+            self._exporter = None
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def format_snapshot(snapshot: Dict[str, object]) -> str:
+    """Human-readable rendering of a snapshot for the Diagnostics window."""
+    lines: List[str] = []
+    if not snapshot["enabled"]:
+        lines.append("Stage timers are off (set metrics_enabled in the config).")
+        lines.append("")
+    if snapshot["timers"]:
+        lines.append(f"{'Stage':28} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for name, t in snapshot["timers"].items():
+            lines.append(f"{name:28} {t['count']:7d} {t['p50_ms']:9.2f} {t['p95_ms']:9.2f} "
+                         f"{t['p99_ms']:9.2f} {t['max_ms']:9.2f}")
+        lines.append("")
+    if snapshot["counters"]:
+        lines.append("Counters")
+        for name, value in snapshot["counters"].items():
+            lines.append(f"  {name:30} {value}")
+        lines.append("")
+    for name, value in snapshot["gauges"].items():
+        if isinstance(value, dict):
+            lines.append(name)
+            for key, item in value.items():
+                lines.append(f"  {key:30} {item:.2f}" if isinstance(item, float) else f"  {key:30} {item}")
+        elif isinstance(value, float):
+            lines.append(f"{name:32} {value:.1f}")
+        else:
+            lines.append(f"{name:32} {value}")
+    return "\n".join(lines)
+
+
+# Process-wide registry; modules record into it, the app enables and exports it.
+metrics = Metrics()
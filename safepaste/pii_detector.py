@@ -1,32 +1,189 @@
 import logging
-from typing import List, Dict, Any
-from presidio_analyzer import AnalyzerEngine, RecognizerResult
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry, RecognizerResult
+from presidio_analyzer.nlp_engine import NlpEngineProvider
+from safepaste import incremental, prefilter
+from safepaste.chunking import chunk_boundaries
+from safepaste.detection_cache import DetectionCache
+from safepaste.dictionary import TermDictionary
+from safepaste.metrics import metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# We focus on the requested categories: Email, Phone, Person, API Key, Credit Card
+DEFAULT_ENTITIES = ["EMAIL_ADDRESS", "PHONE_NUMBER", "PERSON", "CREDIT_CARD", "CRYPTO", "API_KEY"]
+# Entities that still need the spaCy NER pass; the rest come from the pattern tier.
+NER_ENTITIES = ["PERSON"]
+
+@dataclass(frozen=True)
+class DetectionProfile:
+    """Which spaCy model to load and which of its pipes to drop."""
+    name: str
+    model_name: str
+    removed_pipes: Tuple[str, ...] = ()
+
+# NER only needs the tokenizer, the tagger (for context lemmas) and the entity recognizer.
+PROFILES: Dict[str, DetectionProfile] = {
+    "fast": DetectionProfile("fast", "en_core_web_sm", ("parser", "lemmatizer")),
+    "balanced": DetectionProfile("balanced", "en_core_web_md", ("parser",)),
+    "accurate": DetectionProfile("accurate", "en_core_web_lg"),
+}
+DEFAULT_PROFILE = "accurate"
+# Where the analyzer runs: in this process, or in a pool of worker processes.
+BACKENDS = ("inprocess", "process")
+
+def build_analyzer(profile: DetectionProfile, language: str = "en") -> AnalyzerEngine:
+    """
+    Build an AnalyzerEngine for `profile`.
+
+    Unused spaCy pipes are removed (not just disabled) so their weights are
+    freed, and only recognizers for NER_ENTITIES are registered; the other
+    entities are handled by the pattern tier.
+    """
+    # Note: This requires the profile's spaCy model to be downloaded, e.g.:
+    # python -m spacy download en_core_web_lg
+    provider = NlpEngineProvider(nlp_configuration={
+        "nlp_engine_name": "spacy",
+        "models": [{"lang_code": language, "model_name": profile.model_name}],
+    })
+    nlp_engine = provider.create_engine()
+    nlp = nlp_engine.nlp[language]
+    for pipe in profile.removed_pipes:
+        if pipe in nlp.pipe_names:
+            nlp.remove_pipe(pipe)
+
+    registry = RecognizerRegistry(supported_languages=[language])
+    registry.load_predefined_recognizers(languages=[language], nlp_engine=nlp_engine)
+    for recognizer in list(registry.recognizers):
+        if not set(recognizer.supported_entities) & set(NER_ENTITIES):
+            registry.remove_recognizer(recognizer.name, language=language)
+
+    return AnalyzerEngine(registry=registry, nlp_engine=nlp_engine, supported_languages=[language])
+
 class PiiDetector:
     """
     Wrapper class for Microsoft Presidio Analyzer to detect PII in text.
     """
-    def __init__(self, language: str = "en"):
+    def __init__(self, language: str = "en", cache_max_bytes: int = 4 * 1024 * 1024, cache_ttl: int = 1800,
+                 load_async: bool = False, on_ready: Optional[Callable[[bool], None]] = None,
+                 profile: str = DEFAULT_PROFILE, backend: str = "inprocess", processes: int = 1,
+                 worker_max_jobs: int = 1000, worker_max_rss_mb: int = 2048, incremental: bool = True,
+                 deny_list: Optional[TermDictionary] = None, allow_list: Optional[TermDictionary] = None):
         """
         Initialize the PII Detector with the specified language.
         
         Args:
             language (str): Language code (default: "en").
+            cache_max_bytes (int): Memory budget of the result cache; 0 disables it.
+            cache_ttl (int): Time-to-live of cached results in seconds.
+            load_async (bool): Load the NLP model on a background thread. Until it
+                               is ready, detection runs on the pattern tier only.
+            on_ready (callable): Called from the loader thread once loading ends.
+                                 Signature: on_ready(success: bool)
+            profile (str): Name of a DetectionProfile in PROFILES (default: "accurate").
+            backend (str): "inprocess", or "process" to run NER in worker processes
+                           (the pattern tier and the cache stay in this process).
+            processes (int): Number of worker processes for the "process" backend.
+            worker_max_jobs (int): Requests a worker serves before it is recycled.
+            worker_max_rss_mb (int): Worker memory (MB) above which it is recycled.
+            incremental (bool): Keep the last large text and its spans, and re-analyze
+                                only the edited region when the next text is a variant of it.
+            deny_list (TermDictionary): Terms always reported (internal names, customer IDs, ...),
+                                        as part of the pattern tier.
+            allow_list (TermDictionary): Known-safe terms; results inside one are dropped.
         """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown detection profile: {profile}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown detector backend: {backend}")
+        self.backend = backend
+        self.processes = processes
+        self.worker_max_jobs = worker_max_jobs
+        self.worker_max_rss_mb = worker_max_rss_mb
         self.language = language
+        self.profile = profile
+        self.deny_list = deny_list
+        self.allow_list = allow_list
+        self.entities = list(DEFAULT_ENTITIES)
+        if deny_list is not None:
+            self.entities += [e for e in deny_list.entity_types if e not in self.entities]
+        self.cache = DetectionCache(max_bytes=cache_max_bytes, ttl_seconds=cache_ttl)
+        self.analyzer = None
+        self.load_error: Optional[Exception] = None
+        self.on_ready = on_ready
+        self._ready = threading.Event()
+        self.incremental = incremental
+        # (text, spans) of the last complete large detection; replaced as one tuple.
+        self._previous: Optional[Tuple[str, Tuple[tuple, ...]]] = None
+
+        if load_async:
+            self._start_loader(profile)
+        else:
+            self._load_analyzer(profile)
+            if self.load_error:
+                raise self.load_error
+
+    def _start_loader(self, profile: str):
+        threading.Thread(target=self._load_analyzer, args=(profile,), name="detector-warmup", daemon=True).start()
+
+    def _load_analyzer(self, profile: str):
+        """Build the analyzer and warm it up with one throwaway analysis."""
         try:
-            # Initialize Presidio Analyzer
-            # Note: This requires the spaCy model to be downloaded:
-            # python -m spacy download en_core_web_lg
-            self.analyzer = AnalyzerEngine()
-            logger.info("Presidio Analyzer initialized successfully.")
+            analyzer = self._build(profile)
+            analyzer.analyze(text="John Smith", entities=NER_ENTITIES, language=self.language)
+            previous, self.analyzer = self.analyzer, analyzer
+            if hasattr(previous, "close"):
+                previous.close()
+            self.profile = profile
+            self.load_error = None
+            self.cache.clear()
+            self._previous = None
+            self._ready.set()
+            logger.info(f"Presidio Analyzer initialized successfully (profile: {profile}).")
         except Exception as e:
+            self.load_error = e
             logger.error(f"Failed to initialize Presidio Analyzer: {e}")
-            raise
+        if self.on_ready:
+            self.on_ready(self.is_ready)
+
+    def _build(self, profile: str):
+        if self.backend == "process":
+            from safepaste.detector_pool import ProcessPoolAnalyzer
+            return ProcessPoolAnalyzer(
+                profile, self.language, workers=self.processes,
+                max_jobs=self.worker_max_jobs, max_rss_mb=self.worker_max_rss_mb,
+            )
+        return build_analyzer(PROFILES[profile], self.language)
+
+    def close(self):
+        """Stop the worker processes of the "process" backend, if any."""
+        if hasattr(self.analyzer, "close"):
+            self.analyzer.close()
+
+    def set_profile(self, profile: str):
+        """
+        Switch to another detection profile.
+        The new model loads in the background; the current one keeps serving until it is ready.
+        """
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown detection profile: {profile}")
+        if profile == self.profile and self.is_ready:
+            return
+        logger.info(f"Switching detection profile to {profile}.")
+        self._start_loader(profile)
+
+    @property
+    def is_ready(self) -> bool:
+        """True once the NLP model is loaded; before that, detection is pattern-only."""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until the NLP model is loaded. Returns readiness."""
+        return self._ready.wait(timeout)
 
     def detect(self, text: str) -> List[RecognizerResult]:
         """
@@ -41,29 +198,234 @@ class PiiDetector:
         if not text:
             return []
 
-        try:
-            # Detect PII
-            # We focus on the requested categories: Email, Phone, Person, API Key, Credit Card
-            # Presidio's default recognizers cover: 
-            # EMAIL_ADDRESS, PHONE_NUMBER, PERSON, CREDIT_CARD
-            # We might need custom logic for API keys if defaults aren't sufficient,
-            # but for MVP we'll start with defaults.
-            
-            entities = ["EMAIL_ADDRESS", "PHONE_NUMBER", "PERSON", "CREDIT_CARD", "CRYPTO"] # CRYPTO often catches keys
-            
-            results = self.analyzer.analyze(
-                text=text,
-                entities=entities,
-                language=self.language
-            )
-            
-            logger.debug(f"Detected {len(results)} entities in text.")
-            return results
+        key = self.cache.key(text, self.language, self.entities)
+        cached = self.cache.get(key)
+        if cached is not None:
+            logger.debug(f"Detection cache hit ({len(cached)} entities).")
+            metrics.incr("detect.cache_hit")
+            self._remember(text, cached)
+            return cached
+        metrics.incr("detect.cache_miss")
 
+        try:
+            results, complete = self._detect_incremental(text) or self._detect_uncached(text)
         except Exception as e:
             logger.error(f"Error during PII detection: {e}")
             return []
 
+        if complete:
+            self.cache.put(key, results)
+            self._remember(text, results)
+        return results
+
+    def _remember(self, text: str, results: List[RecognizerResult]):
+        if self.incremental and len(text) >= incremental.MIN_LENGTH:
+            self._previous = (text, tuple((r.entity_type, r.start, r.end, r.score) for r in results))
+
+    def _detect_incremental(self, text: str) -> Optional[Tuple[List[RecognizerResult], bool]]:
+        """
+        Re-detect only the edited part of the previous text.
+
+        Returns None when there is no usable previous text, or when the edit
+        covers so much of the text that a full detection is as cheap.
+        """
+        previous = self._previous
+        if previous is None or len(text) < incremental.MIN_LENGTH:
+            return None
+        old_text, old_spans = previous
+        start, end, delta = incremental.affected_region(old_text, text, old_spans)
+        if end - start > len(text) // 2:
+            return None
+        region_results, complete = self._detect_uncached(text[start:end])
+        if not complete:
+            return None
+        logger.debug(f"Incremental detection: re-analyzed {end - start} of {len(text)} characters.")
+        metrics.incr("detect.incremental")
+        return incremental.splice(old_spans, start, end, delta, self._shift(region_results, start)), True
+
+    def _detect_uncached(self, text: str) -> Tuple[List[RecognizerResult], bool]:
+        """
+        Run the pattern tier and, where needed, the NER tier.
+
+        Returns:
+            Tuple[List[RecognizerResult], bool]: The entities, and False if NER
+            was needed but skipped because the model is still loading.
+        """
+        # Tier 1: compiled patterns (microseconds). Most copies stop here.
+        with metrics.timer("detect.patterns"):
+            results = self._scan_patterns(text)
+
+            # Tier 2: spaCy NER, only on the sentence windows where the
+            # capitalized-token heuristic says a name might be.
+            windows = prefilter.person_windows(text)
+        if windows and not self.is_ready:
+            logger.debug("NLP model not ready yet; pattern-only detection.")
+            metrics.incr("detect.pattern_only")
+            return self._filter_allowed(text, results), False
+        if windows:
+            try:
+                with metrics.timer("detect.ner"):
+                    results.extend(self._analyze_windows(text, windows))
+            except Exception as e:
+                # E.g. no detector worker could be started: keep the pattern matches, uncached.
+                logger.error(f"NER failed, pattern-only detection: {e}")
+                metrics.incr("detect.ner_failed")
+                return self._filter_allowed(text, results), False
+        results = self._filter_allowed(text, results)
+
+        logger.debug(f"Detected {len(results)} entities in text ({len(windows)} NER windows).")
+        return results, True
+
+    def detect_many(self, texts: Iterable[str], batch_size: int = 32, n_process: int = 1) -> List[List[RecognizerResult]]:
+        """
+        Detect PII in a batch of texts.
+
+        Cache hits and texts without name candidates never reach the NLP
+        engine; the remaining sentence windows of all texts are streamed
+        through spaCy's `nlp.pipe` together.
+
+        Args:
+            texts (Iterable[str]): The texts to analyze.
+            batch_size (int): Number of windows per spaCy batch.
+            n_process (int): Number of spaCy processes.
+
+        Returns:
+            List[List[RecognizerResult]]: Detected entities, in input order.
+        """
+        texts = list(texts)
+        output: List[Optional[List[RecognizerResult]]] = [None] * len(texts)
+        keys = {}  # text index -> cache key, for texts that missed the cache
+        pending_windows = []  # (text index, window start, window text)
+        scanned = []  # indices of texts detected in this call (not cache hits)
+        ready = self.is_ready
+
+        for i, text in enumerate(texts):
+            if not text:
+                output[i] = []
+                continue
+            key = self.cache.key(text, self.language, self.entities)
+            cached = self.cache.get(key)
+            if cached is not None:
+                output[i] = cached
+                continue
+            keys[i] = key
+            output[i] = self._scan_patterns(text)
+            scanned.append(i)
+            windows = prefilter.person_windows(text)
+            if windows and not ready:
+                # Pattern-only until the model is loaded; don't cache partial results.
+                del keys[i]
+                continue
+            for start, end in windows:
+                pending_windows.append((i, start, text[start:end]))
+
+        try:
+            with metrics.timer("detect.ner_batch"):
+                window_results = self._run_ner([w for _, _, w in pending_windows], batch_size, n_process)
+        except Exception as e:
+            # Pattern matches still count; nothing is cached, so the next call retries NER.
+            logger.error(f"Error during batch PII detection: {e}")
+            metrics.incr("detect.ner_failed")
+            for i in scanned:
+                output[i] = self._filter_allowed(texts[i], output[i])
+            return output
+
+        for (i, offset, _), results in zip(pending_windows, window_results):
+            output[i].extend(self._shift(results, offset))
+
+        for i in scanned:
+            output[i] = self._filter_allowed(texts[i], output[i])
+
+        for i, key in keys.items():
+            self.cache.put(key, output[i])
+
+        logger.debug(f"Batch detection: {len(texts)} texts, {len(pending_windows)} NER windows.")
+        return output
+
+    def detect_stream(self, text: str, chunk_size: int = 64 * 1024, overlap: int = 256) -> Iterator[List[RecognizerResult]]:
+        """
+        Detect PII in a large text chunk by chunk.
+
+        The text is cut at line or sentence boundaries near `chunk_size`.
+        Each chunk is analyzed together with `overlap` characters of context
+        on both sides, and a span is reported only by the chunk its start
+        falls in, so entities on a seam are found once and never truncated.
+        Peak analyzer memory is bounded by the chunk size, not the text size.
+
+        Args:
+            text (str): The text to analyze.
+            chunk_size (int): Target chunk length in characters.
+            overlap (int): Context characters added on each side of a chunk.
+
+        Yields:
+            List[RecognizerResult]: The entities of each chunk, with offsets into `text`.
+        """
+        key = self.cache.key(text, self.language, self.entities)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        # Windows bypass detect(): only the whole text is cached and remembered
+        # for incremental detection, and only if every window got its NER pass.
+        all_results = []
+        complete = True
+        for start, end in chunk_boundaries(text, chunk_size):
+            window_start = max(0, start - overlap)
+            window_end = min(len(text), end + overlap)
+            try:
+                window_results, window_complete = self._detect_uncached(text[window_start:window_end])
+            except Exception as e:
+                logger.error(f"Error during PII detection: {e}")
+                window_results, window_complete = [], False
+            complete = complete and window_complete
+            chunk_results = [r for r in self._shift(window_results, window_start) if start <= r.start < end]
+            all_results.extend(chunk_results)
+            yield chunk_results
+
+        if complete:
+            self.cache.put(key, all_results)
+            self._remember(text, all_results)
+
+    def _scan_patterns(self, text: str) -> List[RecognizerResult]:
+        """The pattern tier: compiled regexes plus the deny-list dictionary, as RecognizerResults to merge with NER."""
+        matches = prefilter.scan_patterns(text)
+        if self.deny_list is not None:
+            matches.extend(self.deny_list.recognize(text))
+        return [RecognizerResult(m.entity_type, m.start, m.end, m.score) for m in matches]
+
+    def _filter_allowed(self, text: str, results: List[RecognizerResult]) -> List[RecognizerResult]:
+        if self.allow_list is None:
+            return results
+        return self.allow_list.filter_allowed(text, results)
+
+    def _analyze_windows(self, text: str, windows: List[Tuple[int, int]]) -> List[RecognizerResult]:
+        """Run the analyzer on each window and map results back to `text` offsets."""
+        window_results = self._run_ner([text[start:end] for start, end in windows])
+        results = []
+        for (start, _), window in zip(windows, window_results):
+            results.extend(self._shift(window, start))
+        return results
+
+    def _run_ner(self, texts: List[str], batch_size: int = 32, n_process: int = 1) -> List[List[RecognizerResult]]:
+        """Run the NER entities over `texts`, batching through `nlp.pipe` when there are several."""
+        if hasattr(self.analyzer, "analyze_many"):
+            # Worker pool: texts are spread over the workers, each with its own model.
+            return self.analyzer.analyze_many(texts, NER_ENTITIES)
+        if len(texts) <= 1:
+            return [self.analyzer.analyze(text=t, entities=NER_ENTITIES, language=self.language) for t in texts]
+        batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
+        return batch_analyzer.analyze_iterator(
+            texts, language=self.language, batch_size=batch_size, n_process=n_process, entities=NER_ENTITIES
+        )
+
+    @staticmethod
+    def _shift(results: List[RecognizerResult], offset: int) -> List[RecognizerResult]:
+        for result in results:
+            result.start += offset
+            result.end += offset
+        return results
+
 if __name__ == "__main__":
     # Quick test
     detector = PiiDetector()
@@ -0,0 +1,234 @@
+import re
+import hashlib
+import logging
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Callable, List, Tuple
+from safepaste.results import PatternResult
+from safepaste.secret_scanner import SECRET_ENTITY, scan_secrets
+
+logger = logging.getLogger(__name__)
+
+# Entities that the pattern tier resolves on its own, without the NLP engine.
+PATTERN_ENTITIES = ["EMAIL_ADDRESS", "PHONE_NUMBER", "CREDIT_CARD", "CRYPTO", SECRET_ENTITY]
+
+EMAIL_PATTERN = re.compile(
+    r"(?<![\w.+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}(?![\w-])"
+)
+PHONE_PATTERN = re.compile(
+    r"(?<![\w+])(?<!\d[ \t.-])(?:"
+    # International: country code, then groups of 1-4 digits (e.g. +33 1 23 45 67 89)
+    r"\+\d{1,3}(?:[ \t.-]?(?:\(\d{1,4}\)|\d{1,4})){2,6}"
+    # National: area code, exchange, line; three groups of four are IDs and dates, not phones
+    r"|(?!\d{4}[ \t.-]?\d{4}[ \t.-]?\d{4}(?!\d))(?:\(\d{2,4}\)|\d{2,4})[ \t.-]?\d{3,4}[ \t.-]?\d{3,4}"
+    r")(?![\w-]|[ \t.-]\d)"
+)
+CREDIT_CARD_PATTERN = re.compile(r"(?<![\w-])\d(?:[ -]?\d){12,18}(?![\w-])")
+CRYPTO_PATTERN = re.compile(r"(?<!\w)(?:bc1[a-z0-9]{25,59}|[13][a-km-zA-HJ-NP-Z1-9]{25,34})(?!\w)")
+
+SENTENCE_BOUNDARY = re.compile(r"[.!?]+(?=\s)|\n")
+# Words of two or more letters in any script that do not start with an ASCII lowercase
+# letter; might_contain_name() checks the first one is upper case (str.isupper), which
+# a regex cannot do for non-ASCII letters. Covers José, Müller, McDonald and JOHN.
+CAPITALIZED_TOKEN = re.compile(r"\b[^\W\d_a-z][^\W\d_]+(?:['\u2019-][^\W\d_]+)*\b")
+
+# Capitalized words that commonly start sentences or show up in code and logs
+# but are not names. A sentence made only of these does not need NER.
+COMMON_CAPITALIZED = frozenset("""
+A About After All Also An And Any Are Args As At Be Because Before But By Call Can Contact Could Dear
+Debug Did Do Does Each Email Error Example Exception False For From Friday Get Hello Her Here Hi His
+How However I If In Info Is It Its January February March April May June July August September
+October November December Monday Name Next No None Not Note Null Of On Once Or Our Phone Please
+Raises Return Returns Saturday See Set She Should Since So Some Sunday Thanks Thank That The Their
+Then There These They This Those Thursday To True Tuesday Use Warning Was We Wednesday Were What
+When Where Which While Who Why Will With Would Yes You Your
+""".split())
+
+# All-caps words that are acronyms or keywords in code, queries and logs. All-caps
+# words only count as name candidates in pairs (JOHN DOE), and never with these.
+KNOWN_ACRONYMS = frozenset("""
+API ASAP ASCII AWS BY CEO CFO CPU CSS CSV CTO DELETE DNS EOF EU FAQ FATAL FIXME FYI GET GPU GROUP HEAD
+HTML HTTP HTTPS ID INNER INSERT INTO IP JOIN JSON LEFT LIMIT NOTE OK ORDER OUTER PATCH PDF PID POST PUT
+RAM README RIGHT SELECT SQL SSH SSL TCP TLS TODO TRACE TTY UDP UK UPDATE URI URL USA UTC UTF UUID
+VALUES WARN XML YAML
+""".split())
+
+_BASE58_ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+_BECH32_CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+
+
+def luhn_valid(number: str) -> bool:
+    """Return True if the digits in `number` pass the Luhn checksum."""
+    digits = [int(c) for c in number if c.isdigit()]
+    if len(digits) < 13:
+        return False
+    total = 0
+    for i, d in enumerate(reversed(digits)):
+        if i % 2 == 1:
+            d *= 2
+            if d > 9:
+                d -= 9
+        total += d
+    return total % 10 == 0
+
+
+def _base58check_valid(address: str) -> bool:
+    value = 0
+    for c in address:
+        value = value * 58 + _BASE58_ALPHABET.index(c)
+    raw = value.to_bytes(25, "big") if value.bit_length() <= 200 else b""
+    if len(raw) != 25:
+        return False
+    checksum = hashlib.sha256(hashlib.sha256(raw[:-4]).digest()).digest()[:4]
+    return raw[-4:] == checksum
+
+
+def _bech32_valid(address: str) -> bool:
+    hrp, _, data = address.rpartition("1")
+    if not hrp or len(data) < 6 or any(c not in _BECH32_CHARSET for c in data):
+        return False
+    values = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp]
+    values += [_BECH32_CHARSET.index(c) for c in data]
+    generator = [0x3B6A57B2, 0x26508E6D, 0x1EA119FA, 0x3D4233DD, 0x2A1462B3]
+    chk = 1
+    for v in values:
+        top = chk >> 25
+        chk = (chk & 0x1FFFFFF) << 5 ^ v
+        for i in range(5):
+            if (top >> i) & 1:
+                chk ^= generator[i]
+    # 1 for bech32 (segwit v0), 0x2bc830a3 for bech32m (taproot)
+    return chk in (1, 0x2BC830A3)
+
+
+def crypto_valid(address: str) -> bool:
+    """Validate a Bitcoin address checksum (base58check or bech32/bech32m)."""
+    if address.startswith("bc1"):
+        return _bech32_valid(address)
+    return _base58check_valid(address)
+
+
+def scan_patterns(text: str) -> List[PatternResult]:
+    """
+    Run the compiled pattern tier over `text`.
+
+    Args:
+        text (str): The text to scan.
+
+    Returns:
+        List[PatternResult]: Email, phone, credit card, crypto and API key matches.
+            Checksummed matches win over API keys and phone numbers on the same characters.
+    """
+    results = [PatternResult("EMAIL_ADDRESS", m.start(), m.end(), 1.0) for m in EMAIL_PATTERN.finditer(text)]
+
+    cards = [m for m in CREDIT_CARD_PATTERN.finditer(text) if luhn_valid(m.group())]
+    results.extend(PatternResult("CREDIT_CARD", m.start(), m.end(), 1.0) for m in cards)
+
+    results.extend(
+        PatternResult("CRYPTO", m.start(), m.end(), 1.0)
+        for m in CRYPTO_PATTERN.finditer(text) if crypto_valid(m.group())
+    )
+
+    # The secret scan is the most heuristic pass; if it fails, the other matches still count.
+    try:
+        secrets = scan_secrets(text)
+    except Exception as e:
+        logger.error(f"Secret scan failed: {e}", exc_info=True)
+        secrets = []
+    # Address-shaped tokens are for the checksum to judge, not the entropy heuristic.
+    overlaps = _overlap_check(results)
+    results.extend(
+        r for r in secrets
+        if not overlaps(r.start, r.end) and not (r.score < 1.0 and CRYPTO_PATTERN.fullmatch(text, r.start, r.end))
+    )
+
+    overlaps = _overlap_check(results)
+    for m in PHONE_PATTERN.finditer(text):
+        digit_count = sum(c.isdigit() for c in m.group())
+        if not 7 <= digit_count <= 15:
+            continue
+        if overlaps(m.start(), m.end()):
+            continue
+        results.append(PatternResult("PHONE_NUMBER", m.start(), m.end(), 0.5))
+
+    return results
+
+
+def _overlap_check(results: List[PatternResult]) -> Callable[[int, int], bool]:
+    """
+    Overlap test against the spans of `results`: sorted starts plus a running
+    max of their ends, so each candidate span is checked with one bisect.
+    """
+    taken = sorted((r.start, r.end) for r in results)
+    taken_starts = [start for start, _ in taken]
+    taken_max_end = list(accumulate((end for _, end in taken), max))
+
+    def overlaps(start: int, end: int) -> bool:
+        i = bisect_left(taken_starts, end)
+        return bool(i) and taken_max_end[i - 1] > start
+    return overlaps
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """Split `text` into (start, end) sentence spans at punctuation and newlines."""
+    spans = []
+    start = 0
+    for m in SENTENCE_BOUNDARY.finditer(text):
+        _append_stripped(spans, text, start, m.end())
+        start = m.end()
+    _append_stripped(spans, text, start, len(text))
+    return spans
+
+
+def _append_stripped(spans: List[Tuple[int, int]], text: str, start: int, end: int) -> None:
+    while start < end and text[start].isspace():
+        start += 1
+    if start < end:
+        spans.append((start, end))
+
+
+def might_contain_name(sentence: str) -> bool:
+    """
+    Capitalized-token heuristic: True if the sentence may hold a PERSON.
+
+    A title-case word that is not a common one is enough. All-caps words are
+    mostly acronyms and keywords (HTTP, SELECT, TODO), so they only count as
+    two or more in a row (JOHN DOE).
+    """
+    caps_end = -1  # end of the previous all-caps candidate, if it is still adjacent
+    for m in CAPITALIZED_TOKEN.finditer(sentence):
+        token = m.group()
+        if not token[0].isupper():
+            continue
+        if not token.isupper():
+            if token not in COMMON_CAPITALIZED:
+                return True
+            caps_end = -1
+            continue
+        if token in KNOWN_ACRONYMS or token.capitalize() in COMMON_CAPITALIZED:
+            caps_end = -1
+            continue
+        if caps_end >= 0 and not sentence[caps_end:m.start()].strip(" \t"):
+            return True
+        caps_end = m.end()
+    return False
+
+
+def person_windows(text: str) -> List[Tuple[int, int]]:
+    """
+    Find the sentence windows of `text` that are worth sending to NER.
+
+    Adjacent candidate sentences are merged into a single window.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) offsets into `text`, in order.
+    """
+    windows: List[Tuple[int, int]] = []
+    for start, end in sentence_spans(text):
+        if not might_contain_name(text[start:end]):
+            continue
+        if windows and not text[windows[-1][1]:start].strip():
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    return windows
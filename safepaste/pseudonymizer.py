@@ -1,82 +1,216 @@
 import logging
 import re
-from typing import List, Dict
-from presidio_analyzer import RecognizerResult
-from safepaste.vault import Vault
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
+from safepaste.vault import PLACEHOLDER_PATTERN, Vault
+
+if TYPE_CHECKING:
+    # Annotations only: rehydration (e.g. `safepaste restore`) should not pay for importing Presidio.
+    from presidio_analyzer import RecognizerResult
 
 logger = logging.getLogger(__name__)
 
+# Longest tail a streaming rehydration holds back while waiting for a placeholder's "]"
+MAX_PENDING_PLACEHOLDER = 128
+
+@dataclass
+class SpanMapping:
+    """Where one replaced entity sits in the original and in the scrubbed text."""
+    entity_type: str
+    placeholder: str
+    start: int
+    end: int
+    scrubbed_start: int
+    scrubbed_end: int
+
+@dataclass
+class PseudonymizedText:
+    """Scrubbed text plus the span map from original to scrubbed offsets."""
+    text: str
+    spans: List[SpanMapping] = field(default_factory=list)
+
+@dataclass
+class PseudonymSession:
+    """
+    Placeholder numbering shared across several pseudonymize calls, e.g. the
+    chunks of one stream: the same value keeps the same placeholder and
+    numbers keep counting up instead of restarting at 1 in every chunk.
+    """
+    counters: Dict[str, int] = field(default_factory=dict) # entity_type -> count
+    placeholders: Dict[str, str] = field(default_factory=dict) # original -> placeholder
+
+    @classmethod
+    def resume(cls, pairs: Iterable[Tuple[str, str]]) -> "PseudonymSession":
+        """
+        Continue the numbering of existing (placeholder, original) pairs, e.g.
+        a saved mapping, so new values never reuse a placeholder already taken.
+        """
+        session = cls()
+        for placeholder, original in pairs:
+            session.placeholders.setdefault(original, placeholder)
+            match = PLACEHOLDER_PATTERN.fullmatch(placeholder)
+            if match:
+                number = int(placeholder[placeholder.rindex("_") + 1:-1])
+                entity_type = match.group(1)
+                session.counters[entity_type] = max(session.counters.get(entity_type, 0), number)
+        return session
+
+def resolve_overlaps(results: List["RecognizerResult"]) -> List["RecognizerResult"]:
+    """
+    Drop overlapping results with a sorted sweep.
+
+    When two spans overlap, the one with the higher score wins, then the
+    longer one (e.g. EMAIL_ADDRESS over a PERSON inside it).
+
+    Returns:
+        List[RecognizerResult]: Non-overlapping results, sorted by start.
+    """
+    kept: List["RecognizerResult"] = []
+    for result in sorted(results, key=lambda r: (r.start, -(r.end - r.start))):
+        if result.end <= result.start:
+            continue
+        if kept and result.start < kept[-1].end:
+            last = kept[-1]
+            # Kept spans never overlap each other, so only the last one can collide.
+            if (result.score, result.end - result.start) > (last.score, last.end - last.start):
+                kept[-1] = result
+            continue
+        kept.append(result)
+    return kept
+
 class Pseudonymizer:
     """
     Handles replacement of PII with placeholders and re-hydration.
+
+    Safe for concurrent callers: per-call state lives in local variables and
+    the cached rehydration pattern is swapped as one immutable tuple.
     """
     def __init__(self, vault: Vault):
         self.vault = vault
-        self._counters: Dict[str, int] = {} # entity_type -> count
-        self._current_session_map: Dict[str, str] = {} # original -> placeholder (for consistency within one text)
+        self._rehydration_pattern: Tuple[int, Optional[Pattern[str]]] = (-1, None) # (vault index version, pattern)
 
-    def pseudonymize(self, text: str, results: List[RecognizerResult]) -> str:
+    def pseudonymize(self, text: str, results: List["RecognizerResult"], session: Optional[PseudonymSession] = None) -> str:
         """
         Replace detected PII in text with placeholders.
         """
+        return self.pseudonymize_with_map(text, results, session).text
+
+    def pseudonymize_with_map(self, text: str, results: List["RecognizerResult"],
+                              session: Optional[PseudonymSession] = None) -> PseudonymizedText:
+        """
+        Replace detected PII in text with placeholders in a single pass.
+
+        Overlapping results are resolved first; the output is then assembled
+        with one join, so the cost is linear in text length plus entity count.
+
+        Args:
+            text (str): The original text.
+            results (List[RecognizerResult]): Detected entities.
+            session (PseudonymSession): Numbering to continue, for texts that are parts of
+                                        one larger document. Not safe to share between threads.
+
+        Returns:
+            PseudonymizedText: The scrubbed text and its span map.
+        """
         if not results:
-            return text
+            return PseudonymizedText(text)
+
+        # Resolved results are sorted by start index, so numbers are assigned Left-to-Right
+        resolved = resolve_overlaps(results)
 
-        # Sort results by start index (ascending) to assign numbers Left-to-Right
-        results.sort(key=lambda x: x.start)
+        if session is None:
+            session = PseudonymSession()
+        counters = session.counters
+        session_map = session.placeholders # original -> placeholder (for consistency within one text)
 
-        self._counters = {}
-        self._current_session_map = {}
-        
-        # temporary list to store replacements to be made
-        # (start, end, placeholder)
-        replacements = []
+        parts: List[str] = []
+        spans: List[SpanMapping] = []
+        cursor = 0
+        scrubbed_length = 0
 
-        for result in results:
+        for result in resolved:
             entity_type = result.entity_type
             start = result.start
             end = result.end
             original_value = text[start:end]
             
             # Check if we already have a placeholder for this specific value in this session
-            if original_value in self._current_session_map:
-                placeholder = self._current_session_map[original_value]
+            if original_value in session_map:
+                placeholder = session_map[original_value]
             else:
-                # Generate new placeholder
-                count = self._counters.get(entity_type, 0) + 1
-                self._counters[entity_type] = count
+                # Generate new placeholder; the vault keeps numbers unique across calls and callers
+                count = self.vault.next_number(entity_type, counters.get(entity_type, 0))
+                counters[entity_type] = count
                 placeholder = f"[{entity_type}_{count}]"
                 
                 # Store in session map and vault
-                self._current_session_map[original_value] = placeholder
+                session_map[original_value] = placeholder
                 self.vault.add(placeholder, original_value)
-            
-            replacements.append((start, end, placeholder))
-        
-        # Apply replacements in reverse order (Right-to-Left) to avoid index shifting
-        replacements.sort(key=lambda x: x[0], reverse=True)
-        
-        new_text = text
-        for start, end, placeholder in replacements:
-            new_text = new_text[:start] + placeholder + new_text[end:]
-            
-        logger.info(f"Pseudonymized text. {len(results)} entities replaced.")
-        return new_text
+
+            parts.append(text[cursor:start])
+            scrubbed_length += start - cursor
+            spans.append(SpanMapping(entity_type, placeholder, start, end, scrubbed_length, scrubbed_length + len(placeholder)))
+            parts.append(placeholder)
+            scrubbed_length += len(placeholder)
+            cursor = end
+
+        parts.append(text[cursor:])
+
+        logger.info(f"Pseudonymized text. {len(resolved)} entities replaced.")
+        return PseudonymizedText("".join(parts), spans)
 
     def rehydrate(self, text: str) -> str:
         """
         Restore original values from placeholders.
+
+        Only placeholders of the kinds the vault actually holds are matched,
+        so ordinary brackets (markdown links, lists, code) cost nothing
+        beyond the single regex scan.
         """
-        # Find all patterns looking like [TYPE_NUM]
-        # Regex to find placeholders
-        pattern = r"\[([A-Z_]+)_\d+\]"
-        
+        pattern = self._placeholder_pattern()
+        if pattern is None:
+            return text
+
         def replace_match(match):
             placeholder = match.group(0)
             original = self.vault.get(placeholder)
             return original if original else placeholder
             
-        return re.sub(pattern, replace_match, text)
+        return pattern.sub(replace_match, text)
+
+    def rehydrate_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Rehydrate text that arrives in chunks.
+        A placeholder split across two chunks is held back until it is complete.
+        """
+        pending = ""
+        for chunk in chunks:
+            buffer = pending + chunk
+            cut = buffer.rfind("[")
+            if cut == -1 or "]" in buffer[cut:] or len(buffer) - cut > MAX_PENDING_PLACEHOLDER:
+                cut = len(buffer)
+            pending = buffer[cut:]
+            if cut:
+                yield self.rehydrate(buffer[:cut])
+        if pending:
+            yield self.rehydrate(pending)
+
+    def _placeholder_pattern(self) -> Optional[Pattern[str]]:
+        """Regex matching exactly the placeholder kinds in the vault, rebuilt when they change."""
+        version, pattern = self._rehydration_pattern
+        if version == self.vault.index_version:
+            return pattern
+
+        version = self.vault.index_version
+        alternatives = []
+        for key in sorted(self.vault.placeholder_keys(), key=len, reverse=True):
+            if key.endswith("_") and PLACEHOLDER_PATTERN.fullmatch(key + "1]"):
+                alternatives.append(re.escape(key) + r"\d+\]")
+            else:
+                alternatives.append(re.escape(key))
+        pattern = re.compile("|".join(alternatives)) if alternatives else None
+        self._rehydration_pattern = (version, pattern)
+        return pattern
 
 # Helper function to get entity type mapping if we want custom names (e.g. PERSON -> PERSON)
 # For now we use Presidio entity types directly.
@@ -0,0 +1,18 @@
+"""
+Result type of the pattern tier.
+
+Field for field a Presidio RecognizerResult, but defined here so that the
+pattern-only paths (`safepaste scrub --patterns-only`, the prefilter and
+secret scanner) do not import Presidio, and spaCy with it. PiiDetector turns
+these into RecognizerResults where they are merged with the analyzer output.
+"""
+from dataclasses import dataclass
+
+
+@dataclass
+class PatternResult:
+    """One pattern-tier match: an entity type, its span and a confidence score."""
+    entity_type: str
+    start: int
+    end: int
+    score: float
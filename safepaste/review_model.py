@@ -0,0 +1,315 @@
+"""
+Non-UI side of the review window.
+
+The text is handed to the Tk textboxes in chunks, with the entity highlights
+of each chunk as ready-made Tk indices. Tk text indices are "line.column";
+they are tracked chunk by chunk, so preparing a chunk costs O(chunk) no
+matter how large the whole text is.
+
+ReviewModel lets the user switch individual entities between placeholder and
+original value. It works from the span map of the one detection pass, so a
+toggle never runs detection again, and it returns the textbox edits needed.
+
+ReviewQueue decides what happens to results that arrive while the (single,
+reused) review window is busy with an earlier one.
+"""
+import logging
+import re
+from bisect import bisect_left
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from safepaste.pseudonymizer import SpanMapping
+
+# The first chunk fills the visible part of the window; the rest follows in idle callbacks.
+FIRST_CHUNK_CHARS = 16 * 1024
+CHUNK_CHARS = 64 * 1024
+
+# What a new result does while another one is under review: wait behind it, or take its place.
+REVIEW_POLICIES = ("queue", "replace")
+
+_NEWLINE = re.compile("\n")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TextChunk:
+    """A piece of text to append, and the (start, end) Tk indices of the spans it completes."""
+    text: str
+    tags: List[Tuple[str, str]] = field(default_factory=list)
+
+
+def iter_chunks(text: str, spans: Sequence[Tuple[int, int]], first_size: int = FIRST_CHUNK_CHARS,
+                size: int = CHUNK_CHARS) -> Iterator[TextChunk]:
+    """
+    Split `text` into chunks for appending to a Tk text widget.
+
+    A span is tagged with the chunk that contains its end, so it is never
+    highlighted half-way.
+
+    Args:
+        text (str): The text to load.
+        spans: Sorted, non-overlapping (start, end) offsets to highlight.
+        first_size (int): Length of the first chunk.
+        size (int): Length of the following chunks.
+
+    Yields:
+        TextChunk: The chunks, in order.
+    """
+    pos = 0
+    line, column = 1, 0  # Tk index of `pos`
+    i = 0
+    open_start = None  # Tk index of a span that started in an earlier chunk
+    while pos < len(text):
+        end = min(len(text), pos + (first_size if pos == 0 else size))
+        chunk = text[pos:end]
+        newlines = [pos + m.start() for m in _NEWLINE.finditer(chunk)]
+
+        def index(offset: int) -> str:
+            k = bisect_left(newlines, offset)
+            if k:
+                return f"{line + k}.{offset - newlines[k - 1] - 1}"
+            return f"{line}.{column + offset - pos}"
+
+        tags = []
+        while i < len(spans) and spans[i][0] < end:
+            start, stop = spans[i]
+            if open_start is None:
+                open_start = index(start)
+            if stop > end:
+                break
+            tags.append((open_start, index(stop)))
+            open_start = None
+            i += 1
+        yield TextChunk(chunk, tags)
+
+        if newlines:
+            line += len(newlines)
+            column = end - newlines[-1] - 1
+        else:
+            column += end - pos
+        pos = end
+
+
+class _FenwickTree:
+    """Prefix sums over a list of integers with O(log n) point updates."""
+    def __init__(self, values: Sequence[int]):
+        self._tree = [0] + list(values)
+        n = len(self._tree)
+        for i in range(1, n):
+            parent = i + (i & -i)
+            if parent < n:
+                self._tree[parent] += self._tree[i]
+
+    def add(self, i: int, delta: int) -> None:
+        i += 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, i: int) -> int:
+        """Sum of the first `i` values."""
+        total = 0
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+
+@dataclass
+class ReviewEntity:
+    """One distinct detected value; all its occurrences share one placeholder and one checkbox."""
+    placeholder: str
+    entity_type: str
+    value: str
+    occurrences: List[int] = field(default_factory=list)  # indices into ReviewModel.spans
+    enabled: bool = True
+
+
+@dataclass
+class TextEdit:
+    """Replace scrubbed[start:end] with `text`. Edits are returned in the order they must be applied."""
+    start: int
+    end: int
+    text: str
+    highlight: bool
+
+
+class ReviewModel:
+    """
+    The scrubbed text as the original plus a set of enabled replacements.
+
+    Each span's scrubbed offset is its original offset plus the length change
+    of the enabled spans before it, kept in a Fenwick tree, so toggling an
+    entity costs O(k log n) for its k occurrences instead of rebuilding the text.
+    """
+    def __init__(self, original: str, spans: Sequence[SpanMapping],
+                 on_toggle: Optional[Callable[[str, str, bool], None]] = None):
+        """
+        Args:
+            original (str): The original text.
+            spans (Sequence[SpanMapping]): Span map of pseudonymize_with_map, sorted by start.
+            on_toggle (callable): Called after an entity is switched, to keep the vault in line.
+                                  Signature: on_toggle(placeholder: str, original_value: str, enabled: bool)
+        """
+        self.original = original
+        self.spans = list(spans)
+        self.on_toggle = on_toggle
+        self._enabled = [True] * len(self.spans)
+        self._growth = [len(s.placeholder) - (s.end - s.start) for s in self.spans]
+        self._offsets = _FenwickTree(self._growth)
+        self.entities: Dict[str, ReviewEntity] = {}  # placeholder -> entity, in order of first occurrence
+        for i, span in enumerate(self.spans):
+            entity = self.entities.get(span.placeholder)
+            if entity is None:
+                entity = self.entities[span.placeholder] = ReviewEntity(
+                    span.placeholder, span.entity_type, original[span.start:span.end])
+            entity.occurrences.append(i)
+
+    def scrubbed_start(self, i: int) -> int:
+        """Current offset of span `i` in the scrubbed text."""
+        return self.spans[i].start + self._offsets.prefix(i)
+
+    def set_enabled(self, placeholder: str, enabled: bool) -> List[TextEdit]:
+        """
+        Switch all occurrences of an entity between placeholder and original value.
+
+        Returns:
+            List[TextEdit]: Edits that turn the previous scrubbed text into the
+            new one, to be applied in order (empty if nothing changed).
+        """
+        entity = self.entities[placeholder]
+        if entity.enabled == enabled:
+            return []
+        edits = []
+        value = entity.value
+        for i in entity.occurrences:
+            start = self.scrubbed_start(i)
+            old_length = len(value) if enabled else len(placeholder)
+            edits.append(TextEdit(start, start + old_length, placeholder if enabled else value, enabled))
+            self._enabled[i] = enabled
+            self._offsets.add(i, self._growth[i] if enabled else -self._growth[i])
+        entity.enabled = enabled
+        if self.on_toggle:
+            self.on_toggle(placeholder, entity.value, enabled)
+        return edits
+
+    def carry_selection(self, previous: "ReviewModel") -> List[str]:
+        """
+        Switch off the entities the user switched off in `previous`, a model of
+        the same text (e.g. before a progressive scan refreshed it).
+
+        Returns:
+            List[str]: Placeholders that were switched off.
+        """
+        switched_off = {entity.value for entity in previous.entities.values() if not entity.enabled}
+        carried = [placeholder for placeholder, entity in self.entities.items() if entity.value in switched_off]
+        for placeholder in carried:
+            self.set_enabled(placeholder, False)
+        return carried
+
+    def scrubbed_text(self) -> str:
+        """The scrubbed text with the current selection, in one pass."""
+        parts = []
+        cursor = 0
+        for span, enabled in zip(self.spans, self._enabled):
+            if enabled:
+                parts.append(self.original[cursor:span.start])
+                parts.append(span.placeholder)
+                cursor = span.end
+        parts.append(self.original[cursor:])
+        return "".join(parts)
+
+    def scrubbed_spans(self) -> List[Tuple[int, int]]:
+        """(start, end) of each enabled placeholder in the scrubbed text, for highlighting."""
+        result = []
+        shift = 0
+        for span, enabled, growth in zip(self.spans, self._enabled, self._growth):
+            if enabled:
+                result.append((span.start + shift, span.start + shift + len(span.placeholder)))
+                shift += growth
+        return result
+
+
+@dataclass
+class ReviewRequest:
+    """One detection result for the review window."""
+    original: str
+    scrubbed: str
+    complete: bool = True
+    spans: List[SpanMapping] = field(default_factory=list)
+
+    def mappings(self) -> Dict[str, str]:
+        """Placeholder -> original value of every span, to put back into the vault."""
+        return {span.placeholder: self.original[span.start:span.end] for span in self.spans}
+
+
+class ReviewQueue:
+    """
+    Results for the review window, which shows one at a time.
+
+    A result for the text already under review (e.g. the final pass of a
+    progressive scan) refreshes it in place. Any other result is handled by
+    the policy: "queue" shows it after the current review is done, "replace"
+    shows it at once and drops the current one. Drops are logged.
+    """
+    def __init__(self, policy: str = "queue", max_pending: int = 20):
+        """
+        Args:
+            policy (str): One of REVIEW_POLICIES.
+            max_pending (int): Most results waiting with the "queue" policy; the oldest are dropped beyond that.
+        """
+        self.policy = policy
+        self.max_pending = max_pending
+        self.current: Optional[ReviewRequest] = None
+        self._pending: deque = deque()
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @policy.setter
+    def policy(self, value: str):
+        if value not in REVIEW_POLICIES:
+            raise ValueError(f"Unknown review policy {value!r}; expected one of {REVIEW_POLICIES}")
+        self._policy = value
+
+    @property
+    def pending(self) -> int:
+        """Number of results waiting behind the current one."""
+        return len(self._pending)
+
+    def offer(self, request: ReviewRequest) -> Optional[ReviewRequest]:
+        """
+        Add a new result.
+
+        Returns:
+            Optional[ReviewRequest]: The request the window should show now,
+            or None if it keeps showing the current one.
+        """
+        if self.current is None or self.current.original == request.original:
+            self.current = request
+            return request
+        for i, queued in enumerate(self._pending):
+            if queued.original == request.original:
+                self._pending[i] = request
+                return None
+        if self.policy == "replace":
+            logger.info("New detection replaced the result under review.")
+            self.current = request
+            return request
+        self._pending.append(request)
+        while len(self._pending) > self.max_pending:
+            self._pending.popleft()
+            logger.warning(f"Review queue full ({self.max_pending}): dropped the oldest pending result.")
+        return None
+
+    def advance(self) -> Optional[ReviewRequest]:
+        """The current review is done. Returns the next request to show, or None if there is none."""
+        self.current = self._pending.popleft() if self._pending else None
+        return self.current
+
+    def clear(self) -> None:
+        self.current = None
+        self._pending.clear()
@@ -0,0 +1,195 @@
+"""
+Secret detection for the pattern tier: API keys, tokens and private keys.
+
+Three passes, all over compiled regexes:
+  1. Known provider formats (AWS, GitHub, Slack, Stripe, Google, OpenAI/Anthropic,
+     npm, GitLab, JWTs, PEM private keys), each found by its literal prefix.
+  2. Values assigned to secret-looking names (`api_key = ...`, `"password": ...`).
+  3. Generic long tokens that mix upper case, lower case and digits like random keys do.
+Candidates from passes 2 and 3 are kept only if their Shannon entropy is high
+enough; the entropies of all candidates are computed together with NumPy.
+"""
+import re
+import math
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from typing import List, Sequence
+from safepaste.results import PatternResult
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy comes with spaCy
+    np = None
+
+SECRET_ENTITY = "API_KEY"
+
+# One pattern per provider rather than one alternation: each starts with a
+# literal prefix, so the regex engine finds candidates with a fast substring
+# search. An alternation would try its branches at every "s", "e", "r"... of
+# ordinary text and runs about 1.5x slower.
+PROVIDER_PATTERNS = [re.compile(p) for p in (
+    r"AKIA[0-9A-Z]{16}", r"ASIA[0-9A-Z]{16}",                        # AWS access key IDs
+    r"gh[pousr]_[A-Za-z0-9]{36,255}", r"github_pat_[A-Za-z0-9_]{60,255}",  # GitHub
+    r"glpat-[A-Za-z0-9_-]{20,}",                                      # GitLab
+    r"xox[abposr]-[A-Za-z0-9-]{10,}",                                 # Slack tokens
+    r"https://hooks\.slack\.com/services/[A-Za-z0-9_/]{20,}",        # Slack webhooks
+    r"sk_live_[A-Za-z0-9]{16,}", r"rk_live_[A-Za-z0-9]{16,}",        # Stripe
+    r"sk_test_[A-Za-z0-9]{16,}", r"rk_test_[A-Za-z0-9]{16,}",
+    r"sk-[A-Za-z0-9_-]{20,}",                                         # OpenAI, Anthropic
+    r"AIza[0-9A-Za-z_-]{35}",                                         # Google API keys
+    r"npm_[A-Za-z0-9]{36}",                                           # npm
+    r"eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}",  # JWTs
+    # PEM private keys; without an END line (truncated copy), up to the last whole base64 line.
+    r"-----BEGIN [A-Z0-9 ]*PRIVATE KEY-----(?:[\s\S]*?-----END [A-Z0-9 ]*PRIVATE KEY-----"
+    r"|(?:\r?\n[A-Za-z0-9+/=]+(?![^\r\n]))*)",
+)]
+# Secret-looking names followed by an assigned value, one pattern per name for
+# the same reason. Matched against the lowercased text, since IGNORECASE
+# patterns cannot use the substring search.
+ASSIGNMENT_PATTERNS = [
+    re.compile(name + r"[\w-]*[\"']?[ \t]*[:=][ \t]*[\"']?([a-z0-9+/=_.~!@#%^&*-]{8,})")
+    for name in ("api", "secret", "token", "passw", "pwd", "auth", "credential", "access")
+]
+# Long base64/base62 tokens. The preceding character is consumed rather than
+# checked with a lookbehind, which is about 1.5x faster; a token at the very
+# start of the text is picked up by GENERIC_AT_START.
+GENERIC_PATTERN = re.compile(r"[^A-Za-z0-9+/=_-]([A-Za-z0-9+/_-]{20,}={0,2})(?![A-Za-z0-9+/=_-])")
+GENERIC_AT_START = re.compile(r"([A-Za-z0-9+/_-]{20,}={0,2})(?![A-Za-z0-9+/=_-])")
+_TOKEN_CHAR = re.compile(r"[A-Za-z0-9_-]")
+_WORD_CHAR = re.compile(r"[a-z0-9]")
+_DIGIT = re.compile(r"[0-9]")
+_CLASS_RUN = re.compile(r"[a-z]+|[A-Z]+|[0-9]+")
+# Assigned values in code are mostly identifiers and expressions; secrets have a digit or symbol.
+_SECRET_VALUE_HINT = re.compile(r"[0-9+/=~!@#%^&*]")
+
+# Share of adjacent characters that switch between upper case, lower case and
+# digits: about 0.6 in random tokens, under 0.35 in identifiers like parseConfig2024.
+MIN_CLASS_SWITCHES = 0.45
+# Bits per character. Random base62 tokens of 32+ characters score about 4.5
+# and above; a token of n characters cannot exceed log2(n), so shorter ones
+# need GENERIC_ENTROPY_RATIO of that maximum instead.
+GENERIC_MIN_ENTROPY = 4.0
+GENERIC_ENTROPY_RATIO = 0.85
+# Assigned values are already suspicious by their name, so a lower bar applies.
+ASSIGNMENT_MIN_ENTROPY = 3.0
+PROVIDER_SCORE = 1.0
+ASSIGNMENT_SCORE = 0.8
+GENERIC_SCORE = 0.6
+
+# Below this many candidates the NumPy setup costs more than it saves.
+_NUMPY_MIN_TOKENS = 16
+# Candidates per NumPy batch: bounds the (batch x 128) count matrix to a few MB.
+_NUMPY_BATCH = 8192
+
+
+def _entropy_python(token: str) -> float:
+    length = len(token)
+    return -sum(n / length * math.log2(n / length) for n in Counter(token).values())
+
+
+def shannon_entropy(tokens: Sequence[str]) -> List[float]:
+    """
+    Shannon entropy (bits per character) of each token.
+
+    With NumPy, the character counts of all ASCII tokens are taken in one
+    bincount per batch instead of a Counter per token. The rare non-ASCII
+    token (e.g. an assigned value holding U+212A, which lowercases to "k")
+    gets a Counter.
+    """
+    if np is None or len(tokens) < _NUMPY_MIN_TOKENS:
+        return [_entropy_python(t) for t in tokens]
+    if not all(t.isascii() for t in tokens):
+        ascii_tokens = [t for t in tokens if t.isascii()]
+        ascii_entropies = iter(shannon_entropy(ascii_tokens))
+        return [next(ascii_entropies) if t.isascii() else _entropy_python(t) for t in tokens]
+    lengths = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+    codes = np.frombuffer("".join(tokens).encode("ascii"), dtype=np.uint8).astype(np.int64)
+    offsets = np.concatenate(([0], np.cumsum(lengths)))
+    entropies = np.empty(len(tokens))
+    for first in range(0, len(tokens), _NUMPY_BATCH):
+        last = min(first + _NUMPY_BATCH, len(tokens))
+        batch_lengths = lengths[first:last]
+        rows = np.repeat(np.arange(last - first), batch_lengths)
+        counts = np.bincount(rows * 128 + codes[offsets[first]:offsets[last]], minlength=(last - first) * 128)
+        p = counts.reshape(last - first, 128) / batch_lengths[:, None]
+        logs = np.log2(p, out=np.zeros_like(p), where=p > 0)
+        entropies[first:last] = -(p * logs).sum(axis=1)
+    return entropies.tolist()
+
+
+def _random_looking(token: str) -> bool:
+    """
+    True if `token` mixes upper case, lower case and digits the way random keys do.
+    Words and hex digests lack a class; identifiers switch classes too rarely.
+    """
+    if token == token.lower() or token == token.upper() or not _DIGIT.search(token):
+        return False
+    runs = len(_CLASS_RUN.findall(token))
+    return runs - 1 >= MIN_CLASS_SWITCHES * (len(token) - 1)
+
+
+def _lowercase(text: str) -> str:
+    """Lowercase `text` keeping offsets valid: U+0130 is the only character whose lowercase is longer."""
+    return text.replace("\u0130", "I").lower()
+
+
+def scan_secrets(text: str) -> List[PatternResult]:
+    """
+    Find API keys, tokens and private keys in `text`.
+
+    Args:
+        text (str): The text to scan.
+
+    Returns:
+        List[PatternResult]: Non-overlapping API_KEY results; provider
+            formats score highest, entropy-only matches lowest.
+    """
+    results = []
+    taken = []  # (start, end) spans already reported, in scan order
+
+    for pattern in PROVIDER_PATTERNS:
+        for m in pattern.finditer(text):
+            start = m.start()
+            # Left boundary checked here rather than with a lookbehind, which would stop the substring search.
+            if start and _TOKEN_CHAR.match(text, start - 1):
+                continue
+            results.append(PatternResult(SECRET_ENTITY, start, m.end(), PROVIDER_SCORE))
+            taken.append((start, m.end()))
+
+    lowered = _lowercase(text)
+    candidates = [
+        (m.start(1), m.end(1), ASSIGNMENT_MIN_ENTROPY, ASSIGNMENT_SCORE)
+        for pattern in ASSIGNMENT_PATTERNS
+        for m in pattern.finditer(lowered)
+        # The name may end an identifier (DB_PASSWORD) but not sit inside a word (retokenize, author).
+        if not (m.start() and _WORD_CHAR.match(lowered, m.start() - 1)) and _SECRET_VALUE_HINT.search(m.group(1))
+    ]
+    assigned = {start for start, _, _, _ in candidates}
+    generic = list(GENERIC_PATTERN.finditer(text))
+    first = GENERIC_AT_START.match(text)
+    if first:
+        generic.insert(0, first)
+    candidates.extend(
+        (m.start(1), m.end(1), min(GENERIC_MIN_ENTROPY, GENERIC_ENTROPY_RATIO * math.log2(m.end(1) - m.start(1))),
+         GENERIC_SCORE)
+        for m in generic
+        if m.start(1) not in assigned and _random_looking(m.group(1))
+    )
+    if not candidates:
+        results.sort(key=lambda r: r.start)
+        return results
+
+    taken.sort()
+    taken_starts = [s for s, _ in taken]
+    taken_max_end = list(accumulate((e for _, e in taken), max))
+    entropies = shannon_entropy([text[start:end] for start, end, _, _ in candidates])
+    for (start, end, threshold, score), entropy in zip(candidates, entropies):
+        if entropy < threshold:
+            continue
+        i = bisect_left(taken_starts, end)
+        if i and taken_max_end[i - 1] > start:
+            continue
+        results.append(PatternResult(SECRET_ENTITY, start, end, score))
+    results.sort(key=lambda r: r.start)
+    return results
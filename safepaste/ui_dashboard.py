@@ -1,83 +1,321 @@
 import customtkinter as ctk
 import pyperclip
-from typing import Callable
+from typing import Callable, Dict, Iterator, List, Optional
+from safepaste.review_model import ReviewEntity, ReviewModel, ReviewRequest, TextChunk, iter_chunks
+
+HIGHLIGHT_TAG = "entity"
+# Original-text highlight of entities the user switched off.
+DISABLED_TAG = "entity_off"
+# Sidebar checkboxes created per idle callback.
+SIDEBAR_ROWS_PER_STEP = 50
+
+def _tk_index(offset: int) -> str:
+    return f"1.0 + {offset} chars"
+
+class _ChunkLoader:
+    """Appends chunks to a textbox, one per call, and highlights their spans."""
+    def __init__(self, textbox: ctk.CTkTextbox, chunks: Iterator[TextChunk]):
+        self.textbox = textbox
+        self.chunks = chunks
+
+    def step(self) -> bool:
+        """Insert the next chunk. Returns False once everything is loaded."""
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        self.textbox.configure(state="normal")
+        self.textbox.insert("end", chunk.text)
+        for start, end in chunk.tags:
+            self.textbox.tag_add(HIGHLIGHT_TAG, start, end)
+        self.textbox.configure(state="disabled")
+        return True
+
+class _SidebarLoader:
+    """Adds the entity checkboxes to the sidebar, a batch per call."""
+    def __init__(self, window: "ReviewWindow", entities: Iterator[ReviewEntity]):
+        self.window = window
+        self.entities = entities
+
+    def step(self) -> bool:
+        """Add the next batch of rows. Returns False once every entity has one."""
+        for added, entity in enumerate(self.entities, 1):
+            self.window._add_entity_row(entity)
+            if added == SIDEBAR_ROWS_PER_STEP:
+                return True
+        return False
 
 class ReviewWindow(ctk.CTkToplevel):
-    def __init__(self, original_text: str, scrubbed_text: str, on_copy: Callable, on_close: Callable):
+    """
+    The review window. It is built once, hidden, and reused: show() loads a
+    result into it and hide() puts it away, so no widgets are created per detection.
+    """
+    def __init__(self, on_copy: Callable, on_close: Callable, on_toggle: Optional[Callable[[str, str, bool], None]] = None):
         super().__init__()
-        
-        self.original_text = original_text
-        self.scrubbed_text = scrubbed_text
+        self.withdraw()
+
+        self.original_text = ""
+        self.scrubbed_text = ""
+        self.complete = True
+        self.pending = 0
         self.on_copy_callback = on_copy
         self.on_close_callback = on_close
-        
+        self.on_toggle_callback = on_toggle
+        # Entity toggles edit the scrubbed text from the span map; detection never runs again.
+        self.model = ReviewModel("", [], on_toggle)
+        # Texts are inserted chunk by chunk in idle callbacks, so opening the
+        # window takes the same time for a line as for megabytes.
+        self._loaders: List = []
+        self._load_job = None
+        self._checkboxes: Dict[str, ctk.CTkCheckBox] = {}
+        # Set once the user types into the scrubbed text: the span map no longer
+        # matches it, so the checkboxes are switched off and copy takes the text as edited.
+        self.hand_edited = False
+
         self.title("SafePaste - Review PII Detection")
-        self.geometry("800x600")
-        
+        self.geometry("1050x600")
+
         # Make window modal-like (keep on top)
         self.attributes("-topmost", True)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
-        
+
         self.setup_ui()
-        
+
     def setup_ui(self):
         self.grid_columnconfigure(0, weight=1)
         self.grid_columnconfigure(1, weight=1)
         self.grid_rowconfigure(1, weight=1)
-        
+
         # Header
         self.label_header = ctk.CTkLabel(self, text="PII Detected! Review Redactions", font=("Arial", 20, "bold"))
-        self.label_header.grid(row=0, column=0, columnspan=2, pady=20)
-        
+        self.label_header.grid(row=0, column=0, columnspan=3, pady=20)
+
         # Panels
         self.frame_original = ctk.CTkFrame(self)
         self.frame_original.grid(row=1, column=0, padx=10, pady=10, sticky="nsew")
-        
+
         self.label_original = ctk.CTkLabel(self.frame_original, text="Original Text", font=("Arial", 14, "bold"))
         self.label_original.pack(pady=5)
-        
+
         self.text_original = ctk.CTkTextbox(self.frame_original, wrap="word")
         self.text_original.pack(expand=True, fill="both", padx=5, pady=5)
-        self.text_original.insert("0.0", self.original_text)
+        self.text_original.tag_config(HIGHLIGHT_TAG, background="#7a2e2e")
+        self.text_original.tag_config(DISABLED_TAG, background="#4a4a4a")
         self.text_original.configure(state="disabled") # Read-only
-        
+
         self.frame_scrubbed = ctk.CTkFrame(self)
         self.frame_scrubbed.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
-        
+
         self.label_scrubbed = ctk.CTkLabel(self.frame_scrubbed, text="Scrubbed Text", font=("Arial", 14, "bold"))
         self.label_scrubbed.pack(pady=5)
-        
+
         self.text_scrubbed = ctk.CTkTextbox(self.frame_scrubbed, wrap="word")
         self.text_scrubbed.pack(expand=True, fill="both", padx=5, pady=5)
-        self.text_scrubbed.insert("0.0", self.scrubbed_text) # Editable if user wants manual tweaks? PRD says toggle.
-        
+        self.text_scrubbed.tag_config(HIGHLIGHT_TAG, background="#2e5a2e")
+        # Editable for manual tweaks once loaded; read-only while chunks are still being inserted.
+        self.text_scrubbed.configure(state="disabled")
+        self.text_scrubbed.bind("<KeyRelease>", lambda e: self._check_hand_edit())
+
         # PRD Requirement: List detected items with checkboxes.
-        # For MVP, we'll keep it simple: just show text. 
-        # Future: Add sidebar with checkboxes to toggle replacements in scrubbing logic.
-        
+        # Unchecking an item keeps its original value in the copied text.
+        self.frame_entities = ctk.CTkScrollableFrame(self, width=220, label_text="Detected")
+        self.frame_entities.grid(row=1, column=2, padx=10, pady=10, sticky="nsew")
+
         # Buttons
         self.frame_buttons = ctk.CTkFrame(self, fg_color="transparent")
-        self.frame_buttons.grid(row=2, column=0, columnspan=2, pady=20)
-        
+        self.frame_buttons.grid(row=2, column=0, columnspan=3, pady=20)
+
         self.btn_cancel = ctk.CTkButton(self.frame_buttons, text="Cancel (Esc)", command=self.on_close, fg_color="gray")
         self.btn_cancel.pack(side="left", padx=20)
-        
+
         self.btn_copy = ctk.CTkButton(self.frame_buttons, text="Copy Clean Text", command=self.on_copy, fg_color="green")
         self.btn_copy.pack(side="left", padx=20)
-        
+
+        # Results that arrived during this review and will be shown after it
+        self.label_pending = ctk.CTkLabel(self, text="", text_color="orange")
+        self.label_pending.grid(row=3, column=0, columnspan=3, pady=(0, 10))
+
         self.bind("<Escape>", lambda e: self.on_close())
         self.bind("<Return>", lambda e: self.on_copy())
 
+    @property
+    def visible(self) -> bool:
+        return self.state() != "withdrawn"
+
+    def show(self, request: ReviewRequest, pending: int = 0):
+        """
+        Load a result and bring the window up. A result for the text already
+        shown (e.g. a progressive scan finishing) refreshes it without raising the window again.
+        """
+        refresh = self.visible and request.original == self.original_text
+        previous = self.model
+        self.original_text = request.original
+        self.scrubbed_text = request.scrubbed
+        self.complete = request.complete
+        self.pending = pending
+        self.model = ReviewModel(request.original, request.spans, self.on_toggle_callback)
+        # Entities the user already unchecked stay unchecked (and out of the vault) after a refresh.
+        if refresh and self.model.carry_selection(previous):
+            self.scrubbed_text = self.model.scrubbed_text()
+        self._start_loading()
+        if not refresh:
+            self.deiconify()
+            # Ensure it pops up over other windows
+            self.lift()
+            self.attributes("-topmost", True)
+            self.focus_force()
+
+    def set_pending(self, pending: int):
+        """Update the number of results queued behind this one."""
+        self.pending = pending
+        self._apply_state()
+
+    def hide(self):
+        """Withdraw the window and drop its content, so no PII stays in hidden widgets."""
+        self._cancel_loading()
+        self._loaders = []
+        self.withdraw()
+        self.original_text = self.scrubbed_text = ""
+        self.model = ReviewModel("", [], self.on_toggle_callback)
+        for textbox in (self.text_original, self.text_scrubbed):
+            textbox.configure(state="normal")
+            textbox.delete("0.0", "end")
+            textbox.configure(state="disabled")
+        for checkbox in self._checkboxes.values():
+            checkbox.destroy()
+        self._checkboxes = {}
+
+    def _start_loading(self):
+        """
+        (Re)load both textboxes and the sidebar: the first chunk now, so the
+        visible part shows at once, and the rest from idle callbacks that keep
+        the UI responsive. Highlights come from the span map; the text is never re-scanned.
+        """
+        self._cancel_loading()
+        self.hand_edited = False
+        for textbox in (self.text_original, self.text_scrubbed):
+            textbox.configure(state="normal")
+            textbox.delete("0.0", "end")
+        for checkbox in self._checkboxes.values():
+            checkbox.destroy()
+        self._checkboxes = {}
+        self._loaders = [
+            _ChunkLoader(self.text_original, iter_chunks(self.original_text, [(s.start, s.end) for s in self.model.spans])),
+            _ChunkLoader(self.text_scrubbed, iter_chunks(self.scrubbed_text, self.model.scrubbed_spans())),
+            _SidebarLoader(self, iter(list(self.model.entities.values()))),
+        ]
+        self._load_step()
+
+    def _load_step(self):
+        self._load_job = None
+        pending = [loader for loader in self._loaders if loader.step()]
+        self._loaders = pending
+        if pending:
+            self._load_job = self.after_idle(self._load_step)
+        else:
+            for entity in self.model.entities.values():
+                if not entity.enabled:
+                    self._tag_original(entity.placeholder, False)
+            # Loaded text is the model's text; from here on the flag means a hand edit.
+            self.text_scrubbed.edit_modified(False)
+        self._apply_state()
+
+    def _cancel_loading(self):
+        if self._load_job is not None:
+            self.after_cancel(self._load_job)
+            self._load_job = None
+
+    @property
+    def loading(self) -> bool:
+        return bool(self._loaders)
+
+    def _add_entity_row(self, entity: ReviewEntity):
+        value = entity.value if len(entity.value) <= 40 else entity.value[:37] + "..."
+        count = len(entity.occurrences)
+        label = f"{entity.placeholder}  {value}" + (f"  (x{count})" if count > 1 else "")
+        checkbox = ctk.CTkCheckBox(self.frame_entities, text=label,
+                                   command=lambda placeholder=entity.placeholder: self.on_toggle(placeholder))
+        if entity.enabled:
+            checkbox.select()
+        checkbox.configure(state="disabled")  # enabled by _apply_state once the result is complete and loaded
+        checkbox.pack(anchor="w", padx=5, pady=2)
+        self._checkboxes[entity.placeholder] = checkbox
+
+    def on_toggle(self, placeholder: str):
+        """Switch one entity between placeholder and original value, editing only its occurrences."""
+        checkbox = self._checkboxes[placeholder]
+        enabled = bool(checkbox.get())
+        if self._check_hand_edit():
+            # The offsets no longer match the text: undo the click instead of editing the wrong place.
+            if enabled:
+                checkbox.deselect()
+            else:
+                checkbox.select()
+            return
+        edits = self.model.set_enabled(placeholder, enabled)
+        if not edits:
+            return
+        for edit in edits:
+            self.text_scrubbed.delete(_tk_index(edit.start), _tk_index(edit.end))
+            self.text_scrubbed.insert(_tk_index(edit.start), edit.text, HIGHLIGHT_TAG if edit.highlight else ())
+        self.text_scrubbed.edit_modified(False)
+
+        self._tag_original(placeholder, enabled)
+
+    def _check_hand_edit(self) -> bool:
+        """Notice a manual edit of the scrubbed text (Tk's modified flag is only reset by us)."""
+        if not self.hand_edited and not self.loading and self.text_scrubbed.edit_modified():
+            self.hand_edited = True
+            self._apply_state()
+        return self.hand_edited
+
+    def _tag_original(self, placeholder: str, enabled: bool):
+        """Highlight an entity's occurrences in the original text as redacted or kept."""
+        shown, hidden = (HIGHLIGHT_TAG, DISABLED_TAG) if enabled else (DISABLED_TAG, HIGHLIGHT_TAG)
+        for i in self.model.entities[placeholder].occurrences:
+            span = self.model.spans[i]
+            self.text_original.tag_remove(hidden, _tk_index(span.start), _tk_index(span.end))
+            self.text_original.tag_add(shown, _tk_index(span.start), _tk_index(span.end))
+
+    def _apply_state(self):
+        # While a large paste is still being scanned, later parts may hold
+        # unredacted PII, so copying is only allowed once the scan is complete.
+        # Copy and the checkboxes also wait until everything is loaded; the
+        # checkboxes wait for the complete result too, which rebuilds the model.
+        if not self.complete:
+            self.label_header.configure(text="PII Detected! Still scanning...")
+            self.btn_copy.configure(state="disabled")
+        elif self.loading:
+            self.label_header.configure(text="PII Detected! Loading text...")
+            self.btn_copy.configure(state="disabled")
+        elif self.hand_edited:
+            self.label_header.configure(text="PII Detected! Edited by hand (checkboxes off)")
+            self.btn_copy.configure(state="normal")
+        else:
+            self.label_header.configure(text="PII Detected! Review Redactions")
+            self.btn_copy.configure(state="normal")
+        self.label_pending.configure(text=f"{self.pending} more detection(s) waiting" if self.pending else "")
+        ready = self.complete and not self.loading
+        self.text_scrubbed.configure(state="normal" if ready else "disabled")
+        checkbox_state = "normal" if ready and not self.hand_edited else "disabled"
+        for checkbox in self._checkboxes.values():
+            checkbox.configure(state=checkbox_state)
+
     def on_copy(self):
-        # Allow user to edit scrubbed text before copying? 
-        # Ideally yes. So detected text should be from the textbox.
-        final_text = self.text_scrubbed.get("0.0", "end").strip()
+        if not self.complete or self.loading:
+            return
+        # The model holds the scrubbed text with the user's checkbox choices applied,
+        # unless the user edited the text by hand.
+        if self._check_hand_edit():
+            final_text = self.text_scrubbed.get("1.0", "end-1c")
+        else:
+            final_text = self.model.scrubbed_text() if self.model.spans else self.scrubbed_text
         pyperclip.copy(final_text)
+        # Hidden first: the callback may show the next pending result right away.
+        self.hide()
         if self.on_copy_callback:
             self.on_copy_callback(final_text)
-        self.destroy()
 
     def on_close(self):
+        self.hide()
         if self.on_close_callback:
             self.on_close_callback()
-        self.destroy()
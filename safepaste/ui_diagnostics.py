@@ -0,0 +1,58 @@
+import customtkinter as ctk
+from typing import Callable, Dict
+from safepaste.metrics import format_snapshot
+
+class DiagnosticsWindow(ctk.CTkToplevel):
+    """Live view of the metrics registry: stage latencies, counters, cache/queue stats and memory."""
+    REFRESH_MS = 1000
+
+    def __init__(self, snapshot: Callable[[], Dict], on_reset: Callable, on_close: Callable):
+        super().__init__()
+        self.snapshot = snapshot
+        self.on_reset_callback = on_reset
+        self.on_close_callback = on_close
+
+        self.title("SafePaste - Diagnostics")
+        self.geometry("640x520")
+
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
+        self.setup_ui()
+        self.refresh()
+
+    def setup_ui(self):
+        self.label_title = ctk.CTkLabel(self, text="Diagnostics", font=("Arial", 20, "bold"))
+        self.label_title.pack(pady=10)
+
+        self.text_metrics = ctk.CTkTextbox(self, wrap="none", font=("Courier", 12))
+        self.text_metrics.pack(expand=True, fill="both", padx=10, pady=5)
+
+        self.frame_buttons = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame_buttons.pack(pady=10)
+
+        self.btn_reset = ctk.CTkButton(self.frame_buttons, text="Reset", command=self.on_reset, fg_color="gray")
+        self.btn_reset.pack(side="left", padx=20)
+
+        self.btn_close = ctk.CTkButton(self.frame_buttons, text="Close", command=self.on_close)
+        self.btn_close.pack(side="left", padx=20)
+
+        self.bind("<Escape>", lambda e: self.on_close())
+
+    def refresh(self):
+        """Redraw the snapshot and schedule the next refresh."""
+        self.text_metrics.configure(state="normal")
+        self.text_metrics.delete("0.0", "end")
+        self.text_metrics.insert("0.0", format_snapshot(self.snapshot()))
+        self.text_metrics.configure(state="disabled")
+        self._refresh_job = self.after(self.REFRESH_MS, self.refresh)
+
+    def on_reset(self):
+        self.on_reset_callback()
+        self.after_cancel(self._refresh_job)
+        self.refresh()
+
+    def on_close(self):
+        self.after_cancel(self._refresh_job)
+        if self.on_close_callback:
+            self.on_close_callback()
+        self.destroy()
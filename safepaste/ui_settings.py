@@ -1,5 +1,7 @@
 import customtkinter as ctk
 from safepaste.config import Config
+from safepaste.pii_detector import PROFILES
+from safepaste.review_model import REVIEW_POLICIES
 
 class SettingsWindow(ctk.CTkToplevel):
     def __init__(self, config: Config, on_close_callback=None):
@@ -8,7 +10,7 @@ class SettingsWindow(ctk.CTkToplevel):
         self.on_close_callback = on_close_callback
         
         self.title("SafePaste - Settings")
-        self.geometry("400x300")
+        self.geometry("400x410")
         
         self.attributes("-topmost", True)
         self.protocol("WM_DELETE_WINDOW", self.on_close)
@@ -50,6 +52,28 @@ class SettingsWindow(ctk.CTkToplevel):
         self.entry_ttl.insert(0, str(self.config.vault_ttl))
         self.entry_ttl.bind("<FocusOut>", self.save_settings_event)
         
+        # Detection profile (spaCy model size)
+        self.frame_profile = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame_profile.pack(pady=10, padx=20, fill="x")
+        
+        self.label_profile = ctk.CTkLabel(self.frame_profile, text="Detection Profile:")
+        self.label_profile.pack(side="left")
+        
+        self.var_profile = ctk.StringVar(value=self.config.detection_profile)
+        self.menu_profile = ctk.CTkOptionMenu(self.frame_profile, values=list(PROFILES), variable=self.var_profile, width=100, command=lambda _: self.save_settings())
+        self.menu_profile.pack(side="right")
+
+        # What a detection does while another one is under review
+        self.frame_review = ctk.CTkFrame(self, fg_color="transparent")
+        self.frame_review.pack(pady=10, padx=20, fill="x")
+
+        self.label_review = ctk.CTkLabel(self.frame_review, text="New Detection During Review:")
+        self.label_review.pack(side="left")
+
+        self.var_review = ctk.StringVar(value=self.config.review_policy)
+        self.menu_review = ctk.CTkOptionMenu(self.frame_review, values=list(REVIEW_POLICIES), variable=self.var_review, width=100, command=lambda _: self.save_settings())
+        self.menu_review.pack(side="right")
+        
         self.btn_close = ctk.CTkButton(self, text="Close", command=self.on_close)
         self.btn_close.pack(pady=20)
 
@@ -68,6 +92,9 @@ class SettingsWindow(ctk.CTkToplevel):
         except ValueError:
             pass
             
+        self.config.detection_profile = self.var_profile.get()
+        self.config.review_policy = self.var_review.get()
+            
         # TODO: Persist config to disk
         print(f"Settings saved: {self.config}")
 
@@ -1,64 +1,271 @@
+import re
 import time
 import logging
-from typing import Dict, Optional
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+PLACEHOLDER_PATTERN = re.compile(r"\[([A-Z_]+)_\d+\]")
+
+def placeholder_key(placeholder: str) -> str:
+    """
+    Index key of a placeholder: its "[TYPE_" prefix for the standard
+    [TYPE_N] form, or the whole placeholder for anything else.
+    """
+    if PLACEHOLDER_PATTERN.fullmatch(placeholder):
+        return placeholder[:placeholder.rindex("_") + 1]
+    return placeholder
+
+# Approximate per-entry overhead (bytes) on top of the two strings, for max_bytes.
+_ENTRY_OVERHEAD = 120
+
+class _VaultEntry:
+    """One placeholder's original value, creation time and accounted size."""
+    __slots__ = ("original", "created", "size", "referenced")
+
+    def __init__(self, original: str, created: float, size: int):
+        self.original = original
+        self.created = created
+        self.size = size
+        # Set on every read; eviction gives referenced entries a second chance
+        # (CLOCK), so reads never have to reorder the dict under the lock.
+        self.referenced = False
+
 class Vault:
     """
     In-memory vault to store mappings between original PII and placeholders.
     Entries expire after a configured duration.
+
+    Safe for concurrent use: writers serialize on a lock, while get() reads
+    without taking it.
     """
-    def __init__(self, ttl_seconds: int = 1800):
+    def __init__(self, ttl_seconds: int = 1800, max_entries: int = 0, max_bytes: int = 0):
         """
         Initialize the Vault.
 
         Args:
             ttl_seconds (int): Time-to-live for vault entries in seconds (default: 30 mins).
+            max_entries (int): Evict least recently used entries beyond this count (0: no limit).
+            max_bytes (int): Evict least recently used entries beyond this size (0: no limit).
         """
         self.ttl_seconds = ttl_seconds
-        self._mapping: Dict[str, str] = {}  # placeholder -> original
-        self._timestamps: Dict[str, float] = {} # placeholder -> creation_time
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, _VaultEntry]" = OrderedDict()  # placeholder -> entry, insertion order
+        # Expiry index: (created, placeholder) in creation order. Entries that were
+        # re-added or evicted leave stale items behind; those are skipped when swept.
+        self._expiry: Deque[Tuple[float, str]] = deque()
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # Prefix index for rehydration: placeholder_key -> number of live placeholders.
+        # index_version changes whenever the set of keys changes.
+        self._index: Dict[str, int] = {}
+        self.index_version = 0
+        # Highest placeholder number in use per entity type (see next_number)
+        self._numbers: Dict[str, int] = {}
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_stop = threading.Event()
 
     def add(self, placeholder: str, original: str) -> None:
         """
         Add a mapping to the vault.
         """
-        self._mapping[placeholder] = original
-        self._timestamps[placeholder] = time.time()
+        self._insert(placeholder, original, time.time())
         logger.debug(f"Added to vault: {placeholder}")
 
+    def next_number(self, entity_type: str, floor: int = 0) -> int:
+        """
+        Reserve the next placeholder number for an entity type.
+
+        Numbers only go up for the vault's lifetime, so everyone sharing it
+        (the app, the scrub daemon, a queued review) gets distinct
+        placeholders and never overwrites another caller's live entry.
+
+        Args:
+            entity_type (str): Entity type of the placeholder, e.g. "PERSON".
+            floor (int): Highest number the caller already uses (e.g. a resumed session).
+        """
+        with self._lock:
+            number = max(self._numbers.get(entity_type, 0), floor) + 1
+            self._numbers[entity_type] = number
+            return number
+
+    def _note_number(self, placeholder: str) -> None:
+        """Keep next_number() above placeholders added from outside, e.g. a loaded mapping."""
+        match = PLACEHOLDER_PATTERN.fullmatch(placeholder)
+        if match:
+            number = int(placeholder[placeholder.rindex("_") + 1:-1])
+            if number > self._numbers.get(match.group(1), 0):
+                self._numbers[match.group(1)] = number
+
+    def _insert(self, placeholder: str, original: str, created: float) -> None:
+        """Store an entry with a given creation time."""
+        entry = _VaultEntry(original, created, _ENTRY_OVERHEAD + len(placeholder) + len(original))
+        with self._lock:
+            self._note_number(placeholder)
+            old = self._entries.pop(placeholder, None)
+            if old is None:
+                self._index_add(placeholder)
+            else:
+                self._bytes -= old.size
+            self._entries[placeholder] = entry
+            self._bytes += entry.size
+            self._expiry.append((created, placeholder))
+            self._enforce_limits()
+
     def get(self, placeholder: str) -> Optional[str]:
         """
         Retrieve original value for a placeholder if it hasn't expired.
         """
-        if placeholder not in self._mapping:
+        # Lock-free read: a single dict lookup is atomic, and entries are never mutated in place.
+        entry = self._entries.get(placeholder)
+        if entry is None:
             return None
 
         # Check expiration
-        if time.time() - self._timestamps[placeholder] > self.ttl_seconds:
-            self._remove(placeholder)
+        if time.time() - entry.created > self.ttl_seconds:
+            # Remove now if no writer is busy; otherwise the sweeper will.
+            if self._lock.acquire(blocking=False):
+                try:
+                    if self._entries.get(placeholder) is entry:
+                        self._remove(placeholder)
+                finally:
+                    self._lock.release()
             return None
 
-        return self._mapping[placeholder]
+        entry.referenced = True
+        return entry.original
+
+    def remove(self, placeholder: str) -> None:
+        """
+        Remove a mapping from the vault, e.g. an entity the user chose not to scrub.
+        """
+        self._remove(placeholder)
 
     def _remove(self, placeholder: str) -> None:
         """Remove an item from the vault."""
-        if placeholder in self._mapping:
-            del self._mapping[placeholder]
-        if placeholder in self._timestamps:
-            del self._timestamps[placeholder]
+        with self._lock:
+            entry = self._entries.pop(placeholder, None)
+            if entry is not None:
+                self._bytes -= entry.size
+                self._index_remove(placeholder)
         logger.debug(f"Removed from vault: {placeholder}")
 
+    def _enforce_limits(self) -> None:
+        """Evict least recently used entries (CLOCK approximation) until the size caps hold."""
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        ):
+            placeholder, entry = self._entries.popitem(last=False)
+            if entry.referenced:
+                entry.referenced = False
+                self._entries[placeholder] = entry
+                continue
+            self._bytes -= entry.size
+            self._index_remove(placeholder)
+            logger.debug(f"Evicted from vault: {placeholder}")
+        # Re-adds and evictions leave stale expiry items; compact once they dominate.
+        if len(self._expiry) > 2 * len(self._entries) + 1024:
+            self._expiry = deque(sorted((e.created, p) for p, e in self._entries.items()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Approximate memory held by the vault's entries."""
+        return self._bytes
+
+    def _index_add(self, placeholder: str) -> None:
+        key = placeholder_key(placeholder)
+        count = self._index.get(key, 0)
+        self._index[key] = count + 1
+        if count == 0:
+            self.index_version += 1
+
+    def _index_remove(self, placeholder: str) -> None:
+        key = placeholder_key(placeholder)
+        count = self._index.get(key, 0) - 1
+        if count > 0:
+            self._index[key] = count
+        else:
+            self._index.pop(key, None)
+            self.index_version += 1
+
+    def placeholder_keys(self) -> List[str]:
+        """Index keys (see placeholder_key) of every placeholder currently held."""
+        with self._lock:
+            return list(self._index)
+
+    def items(self) -> List[Tuple[str, str]]:
+        """(placeholder, original) pairs of every unexpired entry held in memory."""
+        deadline = time.time() - self.ttl_seconds
+        with self._lock:
+            return [(p, e.original) for p, e in self._entries.items() if e.created >= deadline]
+
     def clear(self) -> None:
         """Clear all entries from the vault."""
-        self._mapping.clear()
-        self._timestamps.clear()
+        with self._lock:
+            self._entries.clear()
+            self._expiry.clear()
+            self._bytes = 0
+            self._index.clear()
+            self.index_version += 1
         logger.info("Vault cleared.")
 
-    def cleanup(self) -> None:
-        """Remove all expired entries."""
-        now = time.time()
-        expired = [p for p, t in self._timestamps.items() if now - t > self.ttl_seconds]
-        for p in expired:
-            self._remove(p)
+    def cleanup(self) -> int:
+        """
+        Remove all expired entries.
+        Walks the expiry index from the oldest item, so the cost is O(expired), not O(n).
+
+        Returns:
+            int: Number of entries removed.
+        """
+        removed = 0
+        with self._lock:
+            deadline = time.time() - self.ttl_seconds
+            while self._expiry and self._expiry[0][0] < deadline:
+                created, placeholder = self._expiry.popleft()
+                entry = self._entries.get(placeholder)
+                if entry is not None and entry.created == created:
+                    self._remove(placeholder)
+                    removed += 1
+        if removed:
+            logger.debug(f"Vault cleanup removed {removed} expired entries.")
+        return removed
+
+    def start_sweeper(self, interval: Optional[float] = None) -> None:
+        """
+        Start a background thread that calls cleanup() periodically.
+
+        Args:
+            interval (float): Seconds between sweeps. Defaults to a quarter of
+                              the current TTL, between 1 and 60 seconds.
+        """
+        if self._sweeper and self._sweeper.is_alive():
+            return
+        self._sweeper_stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), name="vault-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        """Stop the background sweeper thread."""
+        self._sweeper_stop.set()
+        if self._sweeper:
+            self._sweeper.join()
+            self._sweeper = None
+
+    def close(self) -> None:
+        """Release background resources (the sweeper thread)."""
+        self.stop_sweeper()
+
+    def _sweep_loop(self, interval: Optional[float]) -> None:
+        # TTL may change at runtime (Settings), so the default interval is recomputed each round.
+        while not self._sweeper_stop.wait(interval or min(60.0, max(1.0, self.ttl_seconds / 4))):
+            try:
+                self.cleanup()
+            except Exception as e:
+                logger.error(f"Vault sweep failed: {e}")
@@ -0,0 +1,219 @@
+import os
+import sys
+import time
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from safepaste.vault import Vault, placeholder_key
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    placeholder TEXT PRIMARY KEY,
+    prefix TEXT NOT NULL,
+    created REAL NOT NULL,
+    nonce BLOB NOT NULL,
+    value BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_created ON entries (created);
+CREATE INDEX IF NOT EXISTS entries_prefix ON entries (prefix);
+"""
+
+# A queued write: a row to upsert, or None to delete the placeholder.
+Row = Tuple[str, str, float, bytes, bytes]
+
+
+def default_vault_path() -> str:
+    """Per-user location of the vault database."""
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA") or os.path.expanduser("~")
+        return os.path.join(base, "SafePaste", "vault.db")
+    base = os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+    return os.path.join(base, "safepaste", "vault.db")
+
+
+def load_or_create_key(key_path: str) -> bytes:
+    """Read the 256-bit vault key, creating it (owner-only permissions) on first use."""
+    if os.path.exists(key_path):
+        with open(key_path, "rb") as f:
+            return f.read()
+    key = AESGCM.generate_key(bit_length=256)
+    fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(key)
+    logger.info(f"Created vault key at {key_path}")
+    return key
+
+
+class PersistentVault(Vault):
+    """
+    Vault that survives restarts, backed by SQLite in WAL mode.
+
+    The in-memory Vault stays the hot tier with the same add/get/cleanup API.
+    Original values are encrypted at rest with AES-GCM (the placeholder is
+    bound as associated data), and writes are batched by a background
+    writer thread instead of hitting the disk on the hot path.
+
+    Reopening does not load the entries: it purges expired rows through the
+    `created` index and reads the distinct placeholder prefixes. Values are
+    fetched and decrypted on first use.
+    """
+    def __init__(self, path: Optional[str] = None, ttl_seconds: int = 1800, max_entries: int = 0,
+                 max_bytes: int = 0, key: Optional[bytes] = None, flush_interval: float = 0.2):
+        """
+        Initialize the PersistentVault.
+
+        Args:
+            path (str): Database file (default: default_vault_path()).
+            ttl_seconds (int): Time-to-live for vault entries in seconds.
+            max_entries (int): LRU cap of the in-memory tier (0: no limit).
+            max_bytes (int): LRU cap of the in-memory tier in bytes (0: no limit).
+            key (bytes): AES-256 key; read from or created next to the database if omitted.
+            flush_interval (float): Seconds between batched writes.
+        """
+        super().__init__(ttl_seconds=ttl_seconds, max_entries=max_entries, max_bytes=max_bytes)
+        self.path = path or default_vault_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._cipher = AESGCM(key or load_or_create_key(self.path + ".key"))
+
+        self._db_lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+        self._pending: Dict[str, Optional[Row]] = {}
+        self._pending_lock = threading.Lock()
+        self._stored_keys: Set[str] = set()
+        self._purge_expired()
+        self._load_numbers()
+
+        self.flush_interval = flush_interval
+        self._writer_stop = threading.Event()
+        self._writer = threading.Thread(target=self._writer_loop, name="vault-writer", daemon=True)
+        self._writer.start()
+
+    def add(self, placeholder: str, original: str) -> None:
+        """Add a mapping to the vault; it is written to disk on the next flush."""
+        created = time.time()
+        self._insert(placeholder, original, created)
+        nonce = os.urandom(12)
+        value = self._cipher.encrypt(nonce, original.encode("utf-8"), placeholder.encode("utf-8"))
+        with self._pending_lock:
+            self._pending[placeholder] = (placeholder, placeholder_key(placeholder), created, nonce, value)
+
+    def get(self, placeholder: str) -> Optional[str]:
+        """Retrieve original value, falling back to disk for entries not in memory."""
+        original = super().get(placeholder)
+        if original is not None:
+            return original
+
+        with self._pending_lock:
+            row = self._pending.get(placeholder, ...)
+        if row is None:
+            return None  # deleted, not yet flushed
+        if row is ...:
+            with self._db_lock:
+                row = self._conn.execute(
+                    "SELECT placeholder, prefix, created, nonce, value FROM entries WHERE placeholder = ?",
+                    (placeholder,),
+                ).fetchone()
+            if row is None:
+                return None
+
+        _, _, created, nonce, value = row
+        if time.time() - created > self.ttl_seconds:
+            return None
+        try:
+            original = self._cipher.decrypt(nonce, value, placeholder.encode("utf-8")).decode("utf-8")
+        except Exception as e:
+            logger.error(f"Failed to decrypt vault entry {placeholder}: {e}")
+            return None
+        # Promote to the memory tier. Its expiry item may land out of order;
+        # get() still checks the TTL, so that only delays the in-memory sweep.
+        self._insert(placeholder, original, created)
+        return original
+
+    def _remove(self, placeholder: str) -> None:
+        super()._remove(placeholder)
+        with self._pending_lock:
+            self._pending[placeholder] = None
+
+    def placeholder_keys(self) -> List[str]:
+        """Index keys of placeholders held in memory or on disk."""
+        return list(set(super().placeholder_keys()) | self._stored_keys)
+
+    def cleanup(self) -> int:
+        """Remove expired entries from memory, and purge them from disk in one indexed DELETE."""
+        removed = super().cleanup()
+        self.flush()
+        self._purge_expired()
+        return removed
+
+    def clear(self) -> None:
+        """Clear all entries from memory and disk."""
+        super().clear()
+        with self._pending_lock:
+            self._pending.clear()
+        with self._db_lock:
+            self._conn.execute("DELETE FROM entries")
+        self._stored_keys = set()
+
+    def _purge_expired(self) -> None:
+        with self._db_lock:
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_seconds,))
+            keys = {prefix for (prefix,) in self._conn.execute("SELECT DISTINCT prefix FROM entries")}
+        if keys != self._stored_keys:
+            self._stored_keys = keys
+            self.index_version += 1
+
+    def _load_numbers(self) -> None:
+        """Continue placeholder numbering after the entries on disk, so new ones never overwrite them."""
+        with self._db_lock:
+            rows = self._conn.execute(
+                "SELECT prefix, MAX(CAST(substr(placeholder, length(prefix) + 1) AS INTEGER)) FROM entries "
+                "WHERE prefix LIKE '[%\\_' ESCAPE '\\' GROUP BY prefix"
+            ).fetchall()
+        with self._lock:
+            for prefix, number in rows:
+                self._note_number(f"{prefix}{number}]")
+
+    def flush(self) -> None:
+        """Write all queued changes to disk in a single transaction."""
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        upserts = [row for row in pending.values() if row is not None]
+        deletes = [(placeholder,) for placeholder, row in pending.items() if row is None]
+        with self._db_lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", upserts)
+                self._conn.executemany("DELETE FROM entries WHERE placeholder = ?", deletes)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Vault flush failed: {e}")
+                return
+        self._stored_keys |= {row[1] for row in upserts}
+        logger.debug(f"Vault flushed {len(upserts)} writes, {len(deletes)} deletes.")
+
+    def _writer_loop(self) -> None:
+        while not self._writer_stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Vault writer failed: {e}")
+
+    def close(self) -> None:
+        """Flush queued writes and close the database."""
+        super().close()
+        self._writer_stop.set()
+        self._writer.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
@@ -0,0 +1,35 @@
+import pytest
+from benchmarks.corpus import KINDS, generate
+from benchmarks.run import compare, make_detector, measure
+
+@pytest.mark.parametrize("kind", KINDS)
+def test_corpus_is_seeded_and_sized(kind):
+    text = generate(kind, 5000, density=0.1, seed=3)
+    assert len(text) == 5000
+    assert text == generate(kind, 5000, density=0.1, seed=3)
+    assert text != generate(kind, 5000, density=0.1, seed=4)
+
+def test_corpus_density_controls_pii():
+    assert "@example.com" not in generate("logs", 20000, density=0.0)
+    assert generate("logs", 20000, density=0.5).count("@example.com") > 50
+
+def test_stub_detector_finds_corpus_pii():
+    detector = make_detector(stub=True, profile="fast")
+    text = generate("csv", 2000, density=1.0)
+    found = {r.entity_type for r in detector.detect(text)}
+    assert {"PERSON", "EMAIL_ADDRESS", "PHONE_NUMBER"} <= found
+
+def test_measure_reports_percentiles_and_throughput():
+    stats = measure(lambda: sum(range(1000)), repeats=5, size=1024)
+    assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert stats["throughput_mb_s"] > 0
+
+def test_compare_flags_only_real_regressions():
+    baseline = {"results": {"detect/a": {"p50_ms": 10.0, "p95_ms": 12.0, "peak_mb": 1.0},
+                            "detect/tiny": {"p50_ms": 0.01, "p95_ms": 0.01, "peak_mb": 0.0}}}
+    current = {"results": {"detect/a": {"p50_ms": 15.0, "p95_ms": 12.5, "peak_mb": 1.0},
+                           "detect/tiny": {"p50_ms": 0.02, "p95_ms": 0.02, "peak_mb": 0.0},
+                           "detect/new": {"p50_ms": 1.0, "p95_ms": 1.0, "peak_mb": 1.0}}}
+    regressions = compare(baseline, current, threshold=0.2)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("detect/a p50_ms")
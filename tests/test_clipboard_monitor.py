@@ -1,7 +1,12 @@
 import pytest
 import time
+import ctypes
+import shutil
+import threading
+import subprocess
 from unittest.mock import MagicMock, patch
 from safepaste.clipboard_monitor import ClipboardMonitor
+from safepaste.clipboard_backends import ChangeSignal, FakeBackend, PollingBackend, X11Display, XFixesBackend
 
 @patch("pyperclip.paste")
 def test_monitor_callback(mock_paste):
@@ -41,3 +46,106 @@ def test_update_last_content(mock_paste):
     
     # Should NOT trigger callback because we updated last_content manually
     mock_callback.assert_not_called()
+
+def test_monitor_with_fake_backend():
+    backend = FakeBackend("initial")
+    received = []
+    monitor = ClipboardMonitor(callback=received.append, backend=backend)
+    monitor.start()
+    time.sleep(0.05)
+
+    backend.set_text("first copy")
+    time.sleep(0.05)
+    backend.set_text("first copy")  # same content again: no callback
+    time.sleep(0.05)
+    backend.set_text("second copy")
+    time.sleep(0.05)
+
+    start = time.time()
+    monitor.stop()
+    assert time.time() - start < 0.5  # wake() unblocks the waiting thread
+    assert received == ["first copy", "second copy"]
+
+def test_polling_backend_wake():
+    backend = PollingBackend(interval=5)
+    threading.Timer(0.05, backend.wake).start()
+    start = time.time()
+    assert backend.wait_for_change() is False
+    assert time.time() - start < 1
+
+def test_polling_backend_honours_timeout():
+    signal = CounterSignal()
+    backend = PollingBackend(interval=5, signal=signal)
+    signal.value += 1
+    start = time.time()
+    assert backend.wait_for_change(timeout=0.05) is False
+    assert time.time() - start < 1
+    # The check still happens on the backend's own schedule.
+    backend._next_poll = time.monotonic()
+    assert backend.wait_for_change(timeout=0.05) is True
+
+@pytest.fixture
+def xvfb_display():
+    if not shutil.which("Xvfb"):
+        pytest.skip("Xvfb not installed")
+    display = ":87"
+    proc = subprocess.Popen(["Xvfb", display, "-nolisten", "tcp"], stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    yield display
+    proc.terminate()
+    proc.wait()
+
+def test_xfixes_backend_notifies_on_copy(xvfb_display):
+    backend = XFixesBackend(xvfb_display)
+    assert backend.wait_for_change(timeout=0.1) is False
+
+    # A second client takes ownership of CLIPBOARD, like an app handling Ctrl+C
+    owner = X11Display(xvfb_display)
+    x11 = owner.x11
+    x11.XCreateSimpleWindow.restype = ctypes.c_ulong
+    x11.XCreateSimpleWindow.argtypes = [ctypes.c_void_p, ctypes.c_ulong] + [ctypes.c_int] * 2 + [ctypes.c_uint] * 3 + [ctypes.c_ulong] * 2
+    x11.XSetSelectionOwner.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.c_ulong, ctypes.c_ulong]
+    window = x11.XCreateSimpleWindow(owner.display, owner.root, 0, 0, 1, 1, 0, 0, 0)
+    x11.XSetSelectionOwner(owner.display, owner.clipboard, window, 0)
+    x11.XFlush(owner.display)
+
+    assert backend.wait_for_change(timeout=2) is True
+    owner.close()
+    backend.close()
+
+class CounterSignal(ChangeSignal):
+    def __init__(self):
+        self.value = 0
+
+    def token(self):
+        return self.value
+
+def test_polling_backend_signal_gates_reads():
+    signal = CounterSignal()
+    backend = PollingBackend(interval=0.01, max_interval=0.05, signal=signal)
+    assert backend.wait_for_change() is False
+    assert backend.wait_for_change() is False
+    assert backend.current_interval > 0.01  # backed off while idle
+    signal.value += 1
+    assert backend.wait_for_change() is True
+    assert backend.current_interval == 0.01  # tightened after activity
+    for _ in range(20):
+        backend.wait_for_change()
+    assert backend.current_interval == 0.05
+
+@patch("pyperclip.paste")
+def test_monitor_reads_only_on_signal(mock_paste):
+    signal = CounterSignal()
+    mock_paste.return_value = "A"
+    received = []
+    monitor = ClipboardMonitor(callback=received.append, backend=PollingBackend(0.01, signal=signal))
+    monitor.start()
+    time.sleep(0.1)
+    assert mock_paste.call_count == 1  # initial read only
+
+    mock_paste.return_value = "B"
+    signal.value += 1
+    time.sleep(0.1)
+    monitor.stop()
+    assert mock_paste.call_count == 2
+    assert received == ["B"]
@@ -0,0 +1,63 @@
+import re
+import threading
+from presidio_analyzer import RecognizerResult
+from safepaste.vault import Vault
+from safepaste.pseudonymizer import Pseudonymizer
+
+THREADS = 16
+ROUNDS = 300
+
+def _run_threads(target):
+    errors = []
+    def wrapper(n):
+        try:
+            target(n)
+        except Exception as e:  # surface failures from worker threads
+            errors.append(e)
+    threads = [threading.Thread(target=wrapper, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+
+def test_vault_concurrent_add_get_cleanup():
+    vault = Vault(ttl_seconds=60, max_entries=500)
+
+    def hammer(n):
+        for i in range(ROUNDS):
+            placeholder = f"[T{n}_{i}]"
+            vault.add(placeholder, f"value-{n}-{i}")
+            value = vault.get(placeholder)
+            # May already be evicted by other threads, but never another value
+            assert value in (None, f"value-{n}-{i}")
+            vault.get(f"[T{(n + 1) % THREADS}_{i}]")
+            if i % 50 == 0:
+                vault.cleanup()
+                vault.placeholder_keys()
+
+    _run_threads(hammer)
+    assert len(vault) <= 500
+    assert vault.size_bytes == sum(e.size for e in vault._entries.values())
+    assert sum(vault._index.values()) == len(vault)
+
+def test_pseudonymizer_concurrent_calls():
+    vault = Vault()
+    pseudonymizer = Pseudonymizer(vault)
+
+    def hammer(n):
+        for i in range(ROUNDS):
+            text = f"Alice_{n} met Bob_{n}; Alice_{n} left"
+            first = len(f"Alice_{n}")
+            second = text.index("Bob")
+            results = [
+                RecognizerResult("PERSON", 0, first, 1.0),
+                RecognizerResult(f"P{chr(65 + n)}", second, second + len(f"Bob_{n}"), 1.0),
+                RecognizerResult("PERSON", text.rindex("Alice"), text.rindex("Alice") + first, 1.0),
+            ]
+            scrubbed = pseudonymizer.pseudonymize(text, results)
+            # Consistent within a call, and numbers never shared with another thread's values
+            assert re.fullmatch(rf"(\[PERSON_\d+\]) met \[P{chr(65 + n)}_\d+\]; \1 left", scrubbed)
+            assert pseudonymizer.rehydrate(scrubbed) == text
+
+    _run_threads(hammer)
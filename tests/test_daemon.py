@@ -0,0 +1,179 @@
+import json
+import logging
+import socket
+import threading
+import time
+import pytest
+from safepaste import prefilter
+from safepaste.daemon import DaemonClient, ScrubDaemon, parse_address
+from safepaste.pseudonymizer import Pseudonymizer
+from safepaste.vault import Vault
+
+class PatternDetector:
+    """Pattern-tier stand-in for PiiDetector that records batch sizes."""
+    is_ready = True
+    profile = "fast"
+
+    def __init__(self):
+        self.batches = []
+
+    def detect_many(self, texts):
+        self.batches.append(len(texts))
+        return [prefilter.scan_patterns(text) for text in texts]
+
+@pytest.fixture
+def daemon(tmp_path):
+    d = ScrubDaemon(PatternDetector(), Vault(), max_request_bytes=4096, max_delay=0.02)
+    d.start_in_background(str(tmp_path / "scrub.sock"))
+    yield d
+    d.stop()
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/s.sock") == ("unix", "/tmp/s.sock")
+    assert parse_address("/run/user/1/safepaste.sock") == ("unix", "/run/user/1/safepaste.sock")
+    assert parse_address("127.0.0.1:8787") == ("tcp", ("127.0.0.1", 8787))
+    assert parse_address(":0") == ("tcp", ("127.0.0.1", 0))
+
+def test_scrub_and_restore_round_trip(daemon):
+    client = DaemonClient(daemon.address)
+    response = client.scrub("Mail bob@example.com or 555-123-4567")
+    assert response["text"] == "Mail [EMAIL_ADDRESS_1] or [PHONE_NUMBER_1]"
+    assert [e["entity_type"] for e in response["entities"]] == ["EMAIL_ADDRESS", "PHONE_NUMBER"]
+    assert client.restore(response["text"]) == "Mail bob@example.com or 555-123-4567"
+    assert client.health()["vault_entries"] == 2
+    client.close()
+
+def test_placeholders_never_collide_across_requests(daemon):
+    client = DaemonClient(daemon.address)
+    first = client.scrub("bob@example.com")["text"]
+    second = client.scrub("eve@example.com")["text"]
+    assert first != second
+    assert client.restore(f"{first} {second}") == "bob@example.com eve@example.com"
+
+def test_app_and_daemon_share_placeholder_numbering(daemon):
+    # The tray app pseudonymizes into the same vault as its embedded daemon.
+    app = Pseudonymizer(daemon.vault)
+    client = DaemonClient(daemon.address)
+    from_daemon = client.scrub("alice@example.com")["text"]
+    from_app = app.pseudonymize("bobby@example.com", prefilter.scan_patterns("bobby@example.com"))
+    assert from_daemon != from_app
+    assert client.restore(from_daemon) == "alice@example.com"
+    assert app.rehydrate(from_app) == "bobby@example.com"
+    client.close()
+
+def test_concurrent_requests_are_batched(daemon):
+    results = {}
+
+    def worker(i):
+        client = DaemonClient(daemon.address)
+        results[i] = client.scrub(f"user{i}@example.com")["text"]
+        client.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(set(results.values())) == 16
+    assert len(daemon.detector.batches) < 16
+    assert sum(daemon.detector.batches) == 16
+
+def test_size_limit_and_bad_requests(daemon):
+    client = DaemonClient(daemon.address)
+    with pytest.raises(RuntimeError, match="413"):
+        client.scrub("x" * 5000)
+    with pytest.raises(RuntimeError, match="404"):
+        client._request("GET", "/nope")
+    with pytest.raises(RuntimeError, match="400"):
+        client._request("POST", "/scrub", {"txt": "hi"})
+    # The daemon keeps serving afterwards.
+    assert DaemonClient(daemon.address).scrub("hi")["text"] == "hi"
+
+def test_start_replaces_only_stale_sockets(daemon, tmp_path):
+    # A live daemon's socket is left alone.
+    with pytest.raises(OSError, match="another daemon"):
+        ScrubDaemon(PatternDetector(), Vault()).start_in_background(daemon.address)
+    assert DaemonClient(daemon.address).health()["ready"] is True
+
+    # So is anything that is not a socket.
+    regular = tmp_path / "notes.txt"
+    regular.write_text("keep me")
+    with pytest.raises(OSError, match="not a socket"):
+        ScrubDaemon(PatternDetector(), Vault()).start_in_background(str(regular))
+    assert regular.read_text() == "keep me"
+
+    # A socket nobody listens on is replaced.
+    stale = str(tmp_path / "stale.sock")
+    with socket.socket(socket.AF_UNIX) as s:
+        s.bind(stale)
+    d = ScrubDaemon(PatternDetector(), Vault())
+    d.start_in_background(stale)
+    try:
+        assert DaemonClient(stale).health()["ready"] is True
+    finally:
+        d.stop()
+
+def test_unix_socket_is_owner_only(daemon):
+    import os
+    assert oct(os.stat(daemon.address).st_mode & 0o777) == "0o600"
+
+def _raw_request(s, request: bytes):
+    s.sendall(request)
+    data = b""
+    while chunk := s.recv(4096):
+        data += chunk
+    head, _, payload = data.partition(b"\r\n\r\n")
+    return head, payload
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1e3"])
+def test_invalid_content_length(daemon, length):
+    with socket.socket(socket.AF_UNIX) as s:
+        s.connect(daemon.address)
+        head, _ = _raw_request(s, b"POST /scrub HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 400")
+
+@pytest.fixture
+def tcp_daemon():
+    d = ScrubDaemon(PatternDetector(), Vault())
+    host, port = d.start_in_background("127.0.0.1:0").rsplit(":", 1)
+    yield d, (host, int(port))
+    d.stop()
+
+def test_tcp_listener_and_raw_http(tcp_daemon):
+    _, (host, port) = tcp_daemon
+    body = json.dumps({"text": "a@b.co"}).encode()
+    with socket.create_connection((host, port)) as s:
+        head, payload = _raw_request(s, f"POST /scrub HTTP/1.1\r\nHost: localhost:{port}\r\nConnection: close\r\n"
+                                        f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    assert head.startswith(b"HTTP/1.1 200")
+    assert json.loads(payload)["text"] == "[EMAIL_ADDRESS_1]"
+    assert DaemonClient(f"{host}:{port}").health()["ready"] is True
+
+@pytest.mark.parametrize("headers", [
+    "",  # no Host at all
+    "Host: attacker.example:8787\r\n",  # DNS rebinding: the page's own name resolves to 127.0.0.1
+    "Host: 127.0.0.1\r\nOrigin: http://attacker.example\r\n",
+])
+def test_tcp_refuses_foreign_hosts(tcp_daemon, headers):
+    d, address = tcp_daemon
+    d.vault.add("[PERSON_1]", "Alice")
+    with socket.create_connection(address) as s:
+        body = json.dumps({"text": "[PERSON_1]"})
+        head, payload = _raw_request(s, f"POST /restore HTTP/1.1\r\n{headers}Connection: close\r\n"
+                                        f"Content-Length: {len(body)}\r\n\r\n{body}".encode())
+    assert head.startswith(b"HTTP/1.1 403")
+    assert b"Alice" not in payload
+
+def test_stop_closes_idle_connections(caplog):
+    d = ScrubDaemon(PatternDetector(), Vault())
+    host, port = d.start_in_background("127.0.0.1:0").rsplit(":", 1)
+    with caplog.at_level(logging.ERROR, logger="asyncio"):
+        with socket.create_connection((host, int(port))) as s:
+            s.sendall(b"GET /health HTTP/1.1\r\n")  # a request that never finishes
+            deadline = time.monotonic() + 5
+            while not d._handlers and time.monotonic() < deadline:
+                time.sleep(0.01)
+            d.stop()
+            assert s.recv(4096) == b""
+    assert d._handlers == set()
+    assert not caplog.records
@@ -0,0 +1,47 @@
+import pytest
+import time
+from presidio_analyzer import RecognizerResult
+from safepaste.detection_cache import DetectionCache
+
+def _key(text):
+    return DetectionCache.key(text, "en", ["PERSON", "EMAIL_ADDRESS"])
+
+def test_cache_hit_returns_copies():
+    cache = DetectionCache()
+    cache.put(_key("John Doe"), [RecognizerResult("PERSON", 0, 8, 0.85)])
+    first = cache.get(_key("John Doe"))
+    first[0].start = 5
+    second = cache.get(_key("John Doe"))
+    assert second[0].start == 0
+    assert cache.get(_key("Jane Doe")) is None
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+def test_key_depends_on_language_and_entities():
+    assert DetectionCache.key("x", "en", ["A", "B"]) == DetectionCache.key("x", "en", ["B", "A"])
+    assert DetectionCache.key("x", "en", ["A"]) != DetectionCache.key("x", "de", ["A"])
+    assert DetectionCache.key("x", "en", ["A"]) != DetectionCache.key("x", "en", ["A", "B"])
+
+def test_cache_expiration():
+    cache = DetectionCache(ttl_seconds=1)
+    cache.put(_key("a"), [])
+    assert cache.get(_key("a")) == []
+    time.sleep(1.1)
+    assert cache.get(_key("a")) is None
+    assert cache.stats()["expirations"] == 1
+
+def test_cache_lru_eviction_by_size():
+    cache = DetectionCache(max_bytes=1000)
+    for i in range(10):
+        cache.put(_key(str(i)), [RecognizerResult("PERSON", 0, 1, 1.0)])
+        cache.get(_key("0"))  # keep "0" recently used
+    stats = cache.stats()
+    assert stats["bytes"] <= 1000
+    assert stats["evictions"] > 0
+    assert cache.get(_key("0")) is not None
+    assert cache.get(_key("1")) is None
+
+def test_cache_disabled():
+    cache = DetectionCache(max_bytes=0)
+    cache.put(_key("a"), [])
+    assert cache.get(_key("a")) is None
@@ -0,0 +1,71 @@
+import time
+import threading
+from safepaste.detection_queue import DetectionQueue
+
+def test_latest_wins_coalescing():
+    release = threading.Event()
+    processed = []
+
+    def process(job):
+        processed.append(job.content)
+        if job.content == "first":
+            release.wait(2)
+
+    queue = DetectionQueue(process)
+    queue.start()
+    queue.submit("first")
+    time.sleep(0.05)  # "first" is now running
+    for i in range(10):
+        queue.submit(f"copy {i}")
+    release.set()
+    time.sleep(0.1)
+    queue.stop()
+
+    assert processed == ["first", "copy 9"]
+    stats = queue.stats()
+    assert stats["submitted"] == 11
+    assert stats["coalesced"] == 9
+    assert stats["cancelled"] == 1  # "first" finished after being superseded
+    assert stats["completed"] == 1
+
+def test_stale_results_dropped():
+    delivered = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def process(job):
+        started.set()
+        release.wait(2)
+        assert job.cancelled
+        queue.deliver_if_current(job, delivered.append, job.content)
+
+    queue = DetectionQueue(process)
+    queue.start()
+    job = queue.submit("old")
+    started.wait(1)
+    queue.submit("new")
+    release.set()
+    time.sleep(0.1)
+    queue.stop()
+
+    assert job.cancelled
+    assert "old" not in delivered
+    assert queue.stats()["dropped_results"] == 1
+
+def test_worker_survives_failures():
+    processed = []
+
+    def process(job):
+        if job.content == "bad":
+            raise ValueError("boom")
+        processed.append(job.content)
+
+    queue = DetectionQueue(process)
+    queue.start()
+    queue.submit("bad")
+    time.sleep(0.05)
+    queue.submit("good")
+    time.sleep(0.05)
+    queue.stop()
+    assert processed == ["good"]
+    assert queue.stats()["failed"] == 1
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import functools
+import multiprocessing
+import pytest
+from unittest.mock import patch
+from presidio_analyzer import RecognizerResult
+from safepaste.detector_pool import ProcessPoolAnalyzer
+from safepaste.pii_detector import PiiDetector
+
+# Stub factories are handed to the workers via fork, so they need no model.
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="stub factories rely on fork")
+
+class NameAnalyzer:
+    """Marks every 'Alice' as a PERSON."""
+    def analyze(self, text, entities, language):
+        results = []
+        start = text.find("Alice")
+        while start != -1:
+            results.append(RecognizerResult("PERSON", start, start + 5, 0.85))
+            start = text.find("Alice", start + 1)
+        return results
+
+def name_factory(profile, language):
+    return NameAnalyzer()
+
+def failing_factory(profile, language):
+    raise OSError("model missing")
+
+def switchable_factory(flag_path, profile, language):
+    """Fails while `flag_path` exists, so a replacement worker can be made to fail."""
+    if os.path.exists(flag_path):
+        raise OSError("model missing")
+    return NameAnalyzer()
+
+class HangingAnalyzer(NameAnalyzer):
+    """Never returns for texts containing 'hang'."""
+    def analyze(self, text, entities, language):
+        if "hang" in text:
+            time.sleep(3600)
+        return super().analyze(text, entities, language)
+
+def hanging_factory(profile, language):
+    return HangingAnalyzer()
+
+def slow_factory(profile, language):
+    time.sleep(3600)
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+def test_analyze_many_preserves_order_across_workers():
+    pool = ProcessPoolAnalyzer("fast", workers=2, factory=name_factory)
+    try:
+        texts = ["Alice", "nobody", "x Alice and Alice", "", "Alice!"]
+        results = pool.analyze_many(texts, ["PERSON"])
+        assert [[(r.entity_type, r.start, r.end) for r in rs] for rs in results] == [
+            [("PERSON", 0, 5)], [], [("PERSON", 2, 7), ("PERSON", 12, 17)], [], [("PERSON", 0, 5)],
+        ]
+        assert [r.start for r in pool.analyze("hi Alice", ["PERSON"])] == [3]
+        assert len({w["pid"] for w in pool.worker_stats()}) == 2
+    finally:
+        pool.close()
+
+def test_worker_recycled_after_max_jobs():
+    pool = ProcessPoolAnalyzer("fast", workers=1, max_jobs=2, factory=name_factory)
+    try:
+        first_pid = pool.worker_stats()[0]["pid"]
+        pool.analyze("Alice", ["PERSON"])
+        pool.analyze("Alice", ["PERSON"])
+        # The replacement loads in the background; the next call waits for it.
+        assert [r.start for r in pool.analyze("Alice", ["PERSON"])] == [0]
+        assert pool.recycled == 1
+        assert pool.worker_stats()[0]["pid"] != first_pid
+    finally:
+        pool.close()
+
+def test_worker_recycled_over_memory_limit():
+    pool = ProcessPoolAnalyzer("fast", workers=1, max_rss_mb=0, factory=name_factory)
+    try:
+        pool.analyze("Alice", ["PERSON"])
+        assert wait_for(lambda: len(pool.worker_stats()) == 1 and pool.worker_stats()[0]["jobs"] == 0)
+        assert pool.recycled == 1
+    finally:
+        pool.close()
+
+def test_worker_load_failure_raises():
+    with pytest.raises(RuntimeError, match="model missing"):
+        ProcessPoolAnalyzer("fast", factory=failing_factory)
+
+def test_failed_start_leaves_no_process_behind():
+    with pytest.raises(RuntimeError, match="model missing"):
+        ProcessPoolAnalyzer("fast", factory=failing_factory)
+    with pytest.raises(TimeoutError):
+        ProcessPoolAnalyzer("fast", factory=slow_factory, start_timeout=0.5)
+    assert multiprocessing.active_children() == []
+
+def test_hung_worker_is_killed_and_replaced():
+    pool = ProcessPoolAnalyzer("fast", workers=1, factory=hanging_factory, request_timeout=1)
+    try:
+        hung_pid = pool.worker_stats()[0]["pid"]
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="did not reply"):
+            pool.analyze("please hang", ["PERSON"])
+        assert time.monotonic() - start < 5
+        assert [r.start for r in pool.analyze("Alice", ["PERSON"])] == [0]
+        assert hung_pid not in {w["pid"] for w in pool.worker_stats()}
+    finally:
+        pool.close()
+
+def test_crashed_worker_is_replaced():
+    pool = ProcessPoolAnalyzer("fast", workers=1, factory=name_factory)
+    try:
+        os.kill(pool.worker_stats()[0]["pid"], 9)
+        with pytest.raises(RuntimeError):
+            pool.analyze("Alice", ["PERSON"])
+        assert [r.start for r in pool.analyze("Alice", ["PERSON"])] == [0]
+    finally:
+        pool.close()
+
+def test_failed_replacement_raises_instead_of_hanging(tmp_path):
+    flag = tmp_path / "broken"
+    pool = ProcessPoolAnalyzer("fast", workers=1, max_jobs=1, acquire_timeout=30,
+                               factory=functools.partial(switchable_factory, str(flag)))
+    try:
+        flag.touch()
+        pool.analyze("Alice", ["PERSON"])  # recycled; its replacement fails to load
+        start = time.monotonic()
+        with pytest.raises(RuntimeError, match="model missing"):
+            pool.analyze("Alice", ["PERSON"])
+        assert time.monotonic() - start < 10
+        flag.unlink()
+        # The next call starts a worker again.
+        assert [r.start for r in pool.analyze("Alice", ["PERSON"])] == [0]
+        assert wait_for(lambda: len(pool.worker_stats()) == 1)
+    finally:
+        pool.close()
+
+def test_detector_keeps_patterns_when_workers_fail(tmp_path):
+    flag = tmp_path / "broken"
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: NameAnalyzer()):
+        detector = PiiDetector(profile="fast", backend="process")
+    try:
+        pool = detector.analyzer
+        pool.factory = functools.partial(switchable_factory, str(flag))
+        pool.max_jobs = 1
+        flag.touch()
+        detector.detect("Alice Smith warms up.")  # recycles the worker; its replacement fails
+        text = "Mail test@example.com. Alice Smith is here."
+        assert [r.entity_type for r in detector.detect(text)] == ["EMAIL_ADDRESS"]
+        assert [[r.entity_type for r in rs] for rs in detector.detect_many([text + " "])] == [["EMAIL_ADDRESS"]]
+    finally:
+        detector.close()
+
+def test_detector_process_backend_keeps_pattern_tier_local():
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: NameAnalyzer()):
+        detector = PiiDetector(profile="fast", backend="process", processes=2)
+    try:
+        results = detector.detect("Mail test@example.com. Alice Smith is here.")
+        assert sorted(r.entity_type for r in results) == ["EMAIL_ADDRESS", "PERSON"]
+        batch = detector.detect_many(["Alice is one.", "Alice and Bob.", "no names here"])
+        assert [[r.entity_type for r in rs] for rs in batch] == [["PERSON"], ["PERSON"], []]
+    finally:
+        detector.close()
+    assert detector.analyzer.worker_stats() == []
+
+def test_unknown_backend_rejected():
+    with pytest.raises(ValueError):
+        PiiDetector(backend="gpu")
@@ -0,0 +1,128 @@
+import time
+import pytest
+from unittest.mock import patch
+from presidio_analyzer import RecognizerResult
+from safepaste import cli
+from safepaste.dictionary import DICTIONARY_SCORE, TermDictionary, read_terms
+from safepaste.pii_detector import PiiDetector
+
+class ProductAnalyzer:
+    """NER stand-in that tags every 'Jira' as a PERSON, like a model might."""
+    def analyze(self, text, entities, language):
+        start = text.find("Jira")
+        return [RecognizerResult("PERSON", start, start + 4, 0.85)] if start != -1 else []
+
+    def analyze_many(self, texts, entities):
+        return [self.analyze(text, entities, "en") for text in texts]
+
+@pytest.fixture
+def dictionary():
+    return TermDictionary.build([
+        ("Falcon", "PROJECT"),
+        ("Falcon Nine", "PROJECT"),
+        ("ACME-00417", "CUSTOMER"),
+        ("he", "CUSTOM_TERM"),
+        ("she", "CUSTOM_TERM"),
+        ("hers", "CUSTOM_TERM"),
+    ])
+
+def test_finds_terms_case_insensitively(dictionary):
+    text = "Ticket for acme-00417 about project falcon."
+    assert dictionary.find(text) == [(11, 21, "CUSTOMER"), (36, 42, "PROJECT")]
+    assert len(dictionary) == 6
+
+def test_longest_term_and_overlapping_suffixes(dictionary):
+    assert dictionary.find("Falcon Nine launch") == [(0, 6, "PROJECT"), (0, 11, "PROJECT")]
+    # "she" and "he" end at the same character: only the longest is reported.
+    assert dictionary.find("she said hers") == [(0, 3, "CUSTOM_TERM"), (9, 13, "CUSTOM_TERM")]
+
+def test_word_boundaries(dictionary):
+    assert dictionary.find("Falconry, the heist, ushers") == []
+    assert dictionary.find("(falcon)") == [(1, 7, "PROJECT")]
+
+def test_case_sensitive():
+    dictionary = TermDictionary.build([("Rex", "CODENAME")], case_sensitive=True)
+    assert dictionary.find("rex Rex REX") == [(4, 7, "CODENAME")]
+
+def test_length_changing_case_folding_keeps_offsets(dictionary):
+    # "İ" lowercases to two characters; offsets must still point into the original text.
+    text = "İİ falcon"
+    assert dictionary.find(text) == [(3, 9, "PROJECT")]
+
+def test_invalid_entity_type():
+    with pytest.raises(ValueError):
+        TermDictionary.build([("x", "customer id")])
+
+def test_save_and_load_round_trip(dictionary, tmp_path):
+    path = str(tmp_path / "deny.spd")
+    dictionary.save(path)
+    loaded = TermDictionary.load(path)
+    text = "acme-00417 and Falcon Nine, she said"
+    assert loaded.find(text) == dictionary.find(text)
+    assert loaded.entity_types == dictionary.entity_types
+    assert len(loaded) == len(dictionary)
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "terms.txt"
+    path.write_text("not a dictionary")
+    with pytest.raises(ValueError):
+        TermDictionary.load(str(path))
+
+def test_recognize_results(dictionary):
+    results = dictionary.recognize("Ask Falcon")
+    assert [(r.entity_type, r.start, r.end, r.score) for r in results] == [("PROJECT", 4, 10, DICTIONARY_SCORE)]
+
+def test_filter_allowed():
+    allow = TermDictionary.build([("Jira Cloud", "ALLOW"), ("Ada", "ALLOW")])
+    text = "Ada Lovelace asked Jira Cloud and Ada"
+    results = [
+        RecognizerResult("PERSON", 0, 12, 0.85),   # wider than the allowed "Ada": kept
+        RecognizerResult("PERSON", 19, 23, 0.85),  # "Jira" inside "Jira Cloud": dropped
+        RecognizerResult("PERSON", 34, 37, 0.85),  # exactly "Ada": dropped
+    ]
+    assert [r.start for r in allow.filter_allowed(text, results)] == [0]
+
+def test_matching_time_does_not_grow_with_dictionary_size():
+    text = "Contact customer C0000123 about order 4411. " * 500
+    small = TermDictionary.build([(f"C{i:07d}", "CUSTOMER") for i in range(100)])
+    large = TermDictionary.build([(f"C{i:07d}", "CUSTOMER") for i in range(100_000)])
+
+    def best_of(dictionary):
+        timings = []
+        for _ in range(3):
+            start = time.perf_counter()
+            dictionary.find(text)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    assert len(large.find(text)) == 500
+    assert best_of(large) < best_of(small) * 3
+
+def test_read_terms(tmp_path):
+    path = tmp_path / "terms.txt"
+    path.write_text("# codenames\nFalcon\tPROJECT\n\nACME-00417\n", encoding="utf-8")
+    assert list(read_terms(str(path), "CUSTOMER")) == [("Falcon", "PROJECT"), ("ACME-00417", "CUSTOMER")]
+
+def test_detector_applies_deny_and_allow_lists():
+    deny = TermDictionary.build([("Falcon", "PROJECT")])
+    allow = TermDictionary.build([("Jira", "ALLOW")])
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: ProductAnalyzer()):
+        detector = PiiDetector(cache_max_bytes=0, deny_list=deny, allow_list=allow)
+    text = "Falcon is tracked in Jira by Mark."
+    assert [(r.entity_type, r.start, r.end) for r in detector.detect(text)] == [("PROJECT", 0, 6)]
+    assert [len(results) for results in detector.detect_many([text, "Nothing here."])] == [1, 0]
+    assert "PROJECT" in detector.entities
+
+def test_cli_compile_and_scrub(tmp_path):
+    (tmp_path / "deny.txt").write_text("Falcon\tPROJECT\n", encoding="utf-8")
+    (tmp_path / "allow.txt").write_text("support@example.com\n", encoding="utf-8")
+    deny, allow = str(tmp_path / "deny.spd"), str(tmp_path / "allow.spd")
+    assert cli.main(["compile-dict", str(tmp_path / "deny.txt"), "-o", deny]) == 0
+    assert cli.main(["compile-dict", str(tmp_path / "allow.txt"), "-o", allow]) == 0
+
+    source = tmp_path / "in.txt"
+    source.write_text("Falcon: mail bob@example.com, cc support@example.com\n", encoding="utf-8")
+    out = tmp_path / "out.txt"
+    assert cli.main(["scrub", "--patterns-only", "--deny", deny, "--allow", allow,
+                     str(source), "-o", str(out)]) == 0
+    assert out.read_text(encoding="utf-8") == "[PROJECT_1]: mail [EMAIL_ADDRESS_1], cc support@example.com\n"
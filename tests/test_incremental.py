@@ -0,0 +1,93 @@
+import random
+import pytest
+from unittest.mock import patch
+from presidio_analyzer import RecognizerResult
+from safepaste import incremental
+from safepaste.pii_detector import PiiDetector
+
+class NameAnalyzer:
+    """Marks every 'Alice Smith' as a PERSON and records the analyzed lengths."""
+    def __init__(self):
+        self.analyzed = 0
+
+    def analyze(self, text, entities, language):
+        self.analyzed += len(text)
+        results = []
+        start = text.find("Alice Smith")
+        while start != -1:
+            results.append(RecognizerResult("PERSON", start, start + 11, 0.85))
+            start = text.find("Alice Smith", start + 1)
+        return results
+
+class LoopBatchAnalyzer:
+    def __init__(self, analyzer_engine):
+        self.analyzer = analyzer_engine
+
+    def analyze_iterator(self, texts, language, entities=None, **kwargs):
+        return [self.analyzer.analyze(text, entities, language) for text in texts]
+
+@pytest.fixture
+def detector():
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: NameAnalyzer()), \
+            patch("safepaste.pii_detector.BatchAnalyzerEngine", LoopBatchAnalyzer):
+        yield PiiDetector(cache_max_bytes=0)
+
+def spans(results):
+    return sorted((r.entity_type, r.start, r.end) for r in results)
+
+def document(rng, lines=400):
+    words = ["the", "report", "was", "sent", "today", "and", "reviewed", "Alice Smith",
+             "mail", "ops@example.com", "call", "555-123-4567", "Monday"]
+    return "\n".join(" ".join(rng.choice(words) for _ in range(10)) + "." for _ in range(lines))
+
+def test_common_affixes():
+    a = "x" * 10000 + "middle" + "y" * 9000
+    b = "x" * 10000 + "MIDDLE!" + "y" * 9000
+    assert incremental.common_prefix(a, b) == 10000
+    assert incremental.common_suffix(a, b, len(a) - 10000) == 9000
+    assert incremental.common_prefix("abc", "abc") == 3
+    assert incremental.common_suffix("abc", "abc", 0) == 0
+
+def test_region_covers_edit_and_straddling_span():
+    old = "First line.\n" * 100 + "Alice Smith here.\n" + "Last line.\n" * 100
+    new = old.replace("Alice Smith here", "Alice Smith was here", 1)
+    name = old.index("Alice")
+    start, end, delta = incremental.affected_region(old, new, [("PERSON", name, name + 11, 0.85)])
+    assert delta == 4
+    assert start <= name and end >= name + 20
+    assert end - start < 1000
+
+def test_appended_text_matches_full_detection(detector):
+    text = document(random.Random(1))
+    detector.detect(text)
+    appended = text + "\nNew paragraph by Alice Smith, mail ops@example.com."
+    analyzed_before = detector.analyzer.analyzed
+    results = detector.detect(appended)
+    assert detector.analyzer.analyzed - analyzed_before < 2000
+    assert spans(results) == spans(detector._detect_uncached(appended)[0])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_edits_match_full_detection(detector, seed):
+    rng = random.Random(seed)
+    text = document(rng)
+    detector.detect(text)
+    for _ in range(10):
+        pos = rng.randrange(len(text))
+        cut = rng.randrange(0, 40)
+        insert = rng.choice(["", "Alice Smith", " ops@example.com ", "555-123-4567", ". Then "])
+        text = text[:pos] + insert + text[pos + cut:]
+        assert spans(detector.detect(text)) == spans(detector._detect_uncached(text)[0])
+
+def test_large_rewrite_falls_back_to_full_detection(detector):
+    rng = random.Random(7)
+    detector.detect(document(rng))
+    with patch.object(detector, "_detect_uncached", wraps=detector._detect_uncached) as full:
+        other = document(rng)
+        detector.detect(other)
+    assert full.call_args.args[0] == other
+
+def test_incremental_can_be_disabled():
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: NameAnalyzer()):
+        detector = PiiDetector(incremental=False)
+    detector.detect(document(random.Random(3)))
+    assert detector._previous is None
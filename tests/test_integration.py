@@ -20,6 +20,11 @@ def test_app_initialization(mock_pseudo, mock_detector, mock_monitor):
     assert app.vault is not None
     assert app.monitor is not None
 
+def _run_after_inline(app):
+    """Results reach the UI through root.after (see SafePasteApp._deliver); run them at once."""
+    app.root = MagicMock()
+    app.root.after.side_effect = lambda delay, callback, *args: callback(*args)
+
 @patch('main.ClipboardMonitor')
 @patch('main.PiiDetector')
 @patch('main.Pseudonymizer')
@@ -30,9 +35,7 @@ def test_process_clipboard_rehydration(mock_pseudo, mock_detector, mock_monitor)
     mock_pseudo_instance = mock_pseudo.return_value
     mock_pseudo_instance.rehydrate.return_value = "John Doe"
     
-    # Process content with potential placeholder
-    # We must patch root.after since checking checks self.root
-    app.root = MagicMock()
+    _run_after_inline(app)
     
     # Call _process_clipboard_content directly to test logic
     with patch('pyperclip.copy') as mock_copy:
@@ -40,6 +43,7 @@ def test_process_clipboard_rehydration(mock_pseudo, mock_detector, mock_monitor)
         
         mock_pseudo_instance.rehydrate.assert_called_with("Hello [PERSON_1]")
         mock_copy.assert_called_with("John Doe")
+    mock_monitor.return_value.update_last_content.assert_called_with("John Doe")
 
 @patch('main.ClipboardMonitor')
 @patch('main.PiiDetector')
@@ -51,12 +55,33 @@ def test_process_clipboard_pii_detected(mock_pseudo, mock_detector, mock_monitor
     mock_detector_instance.detect.return_value = ["fake_result"]
     
     mock_pseudo_instance = mock_pseudo.return_value
-    mock_pseudo_instance.pseudonymize.return_value = "Scrubbed"
+    mock_pseudo_instance.pseudonymize_with_map.return_value = MagicMock(text="Scrubbed", spans=["span"])
     
-    app.root = MagicMock()
+    _run_after_inline(app)
     app.show_review_window = MagicMock()
     
     app._process_clipboard_content("Sensitive Info")
     
-    mock_detector_instance.detect.assert_called()
-    app.show_review_window.assert_called_with("Sensitive Info", "Scrubbed")
+    mock_detector_instance.detect.assert_called_with("Sensitive Info")
+    mock_pseudo_instance.pseudonymize_with_map.assert_called_with("Sensitive Info", ["fake_result"])
+    app.show_review_window.assert_called_with("Sensitive Info", "Scrubbed", True, ["span"])
+
+@patch('main.ClipboardMonitor')
+@patch('main.PiiDetector')
+@patch('main.Pseudonymizer')
+def test_superseded_result_is_not_delivered(mock_pseudo, mock_detector, mock_monitor):
+    app = SafePasteApp()
+    
+    mock_detector.return_value.detect.return_value = ["fake_result"]
+    mock_pseudo.return_value.pseudonymize_with_map.return_value = MagicMock(text="Scrubbed", spans=[])
+    
+    _run_after_inline(app)
+    app.show_review_window = MagicMock()
+    
+    # Newer clipboard content arrives while the first copy is being scanned.
+    job = app.detection_queue.submit("Sensitive Info")
+    app.detection_queue.submit("Newer content")
+    app._process_clipboard_content(job.content, job)
+    
+    app.show_review_window.assert_not_called()
+    app.root.after.assert_not_called()
@@ -0,0 +1,72 @@
+import json
+import time
+import urllib.request
+from safepaste.metrics import Histogram, Metrics, format_snapshot, rss_mb
+
+def test_disabled_metrics_record_nothing():
+    m = Metrics()
+    first = m.timer("stage")
+    assert first is m.timer("other")  # shared no-op, no allocation per call
+    with first:
+        pass
+    m.observe("stage", 1.0)
+    m.incr("events")
+    snapshot = m.snapshot()
+    assert snapshot["timers"] == {} and snapshot["counters"] == {}
+
+def test_timers_and_counters():
+    m = Metrics(enabled=True)
+    for _ in range(3):
+        with m.timer("stage.detect"):
+            time.sleep(0.002)
+    m.incr("clipboard.scrubbed")
+    m.incr("clipboard.scrubbed", 2)
+    snapshot = m.snapshot()
+    assert snapshot["timers"]["stage.detect"]["count"] == 3
+    assert snapshot["timers"]["stage.detect"]["p50_ms"] >= 1.9
+    assert snapshot["counters"] == {"clipboard.scrubbed": 3}
+    m.reset()
+    assert m.snapshot()["timers"] == {}
+
+def test_histogram_percentiles_are_close():
+    h = Histogram()
+    for ms in range(1, 1001):
+        h.record(ms / 1000)
+    summary = h.summary()
+    assert summary["count"] == 1000
+    assert abs(summary["p50_ms"] - 500) / 500 < 0.05
+    assert abs(summary["p99_ms"] - 990) / 990 < 0.05
+    assert summary["max_ms"] == 1000
+
+def test_gauges_sampled_at_snapshot():
+    m = Metrics()
+    values = iter([1, 2])
+    m.register_gauge("queue", lambda: next(values))
+    m.register_gauge("broken", lambda: 1 / 0)
+    assert m.snapshot()["gauges"]["queue"] == 1
+    gauges = m.snapshot()["gauges"]
+    assert gauges["queue"] == 2
+    assert gauges["broken"].startswith("error")
+
+def test_format_snapshot_mentions_disabled_timers():
+    text = format_snapshot({"enabled": False, "timers": {}, "counters": {}, "gauges": {"vault": {"entries": 3}}})
+    assert "timers are off" in text
+    assert "entries" in text
+
+def test_file_export_and_http_endpoint(tmp_path):
+    m = Metrics(enabled=True)
+    m.register_gauge("process_rss_mb", rss_mb)
+    m.incr("events")
+    path = str(tmp_path / "metrics.json")
+    m.write(path)
+    with open(path) as f:
+        assert json.load(f)["counters"] == {"events": 1}
+
+    port = m.serve(0)
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+            data = json.load(response)
+        assert data["counters"] == {"events": 1}
+        assert data["gauges"]["process_rss_mb"] > 0
+    finally:
+        m.close()
@@ -1,4 +1,7 @@
 import pytest
+import time
+from unittest.mock import patch
+from presidio_analyzer import RecognizerResult
 from safepaste.pii_detector import PiiDetector
 
 @pytest.fixture(scope="module")
@@ -31,3 +34,152 @@ def test_no_pii(detector):
 def test_empty_string(detector):
     results = detector.detect("")
     assert len(results) == 0
+
+class StubAnalyzer:
+    """Records analyzer calls instead of running spaCy."""
+    def __init__(self):
+        self.calls = []
+
+    def analyze(self, text, entities, language):
+        self.calls.append(text)
+        return [RecognizerResult("PERSON", 0, len(text.split(" is")[0]), 0.85)] if " is " in text else []
+
+@pytest.fixture
+def stub_detector():
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: StubAnalyzer()):
+        detector = PiiDetector()
+        detector.analyzer.calls.clear()  # drop the warm-up call
+        yield detector
+
+def test_prefilter_skips_ner_without_names(stub_detector):
+    results = stub_detector.detect("this has no names, only test@example.com")
+    assert [r.entity_type for r in results] == ["EMAIL_ADDRESS"]
+    assert stub_detector.analyzer.calls == []
+
+def test_ner_runs_only_on_name_windows(stub_detector):
+    text = "this is plain. John Doe is the CEO."
+    results = stub_detector.detect(text)
+    assert stub_detector.analyzer.calls == ["John Doe is the CEO."]
+    assert [text[r.start:r.end] for r in results] == ["John Doe"]
+
+def test_repeat_copy_hits_cache(stub_detector):
+    text = "John Doe is the CEO."
+    first = stub_detector.detect(text)
+    second = stub_detector.detect(text)
+    assert len(stub_detector.analyzer.calls) == 1
+    assert [(r.start, r.end) for r in first] == [(r.start, r.end) for r in second]
+    assert stub_detector.cache.stats()["hits"] == 1
+
+class StubBatchAnalyzer:
+    def __init__(self, analyzer_engine):
+        self.analyzer_engine = analyzer_engine
+
+    def analyze_iterator(self, texts, language, batch_size=1, n_process=1, **kwargs):
+        self.analyzer_engine.batches.append(len(texts))
+        return [self.analyzer_engine.analyze(t, kwargs["entities"], language) for t in texts]
+
+def test_detect_many_preserves_order(stub_detector):
+    stub_detector.analyzer.batches = []
+    texts = ["nothing here", "John Doe is the CEO.", "", "mail test@example.com", "Jane Roe is here. Max Mustermann is there."]
+    with patch("safepaste.pii_detector.BatchAnalyzerEngine", StubBatchAnalyzer):
+        results = stub_detector.detect_many(texts, batch_size=8)
+    assert len(results) == len(texts)
+    assert results[0] == [] and results[2] == []
+    assert [texts[1][r.start:r.end] for r in results[1]] == ["John Doe"]
+    assert [r.entity_type for r in results[3]] == ["EMAIL_ADDRESS"]
+    # All NER windows from every text go through a single batch
+    assert stub_detector.analyzer.batches == [2]
+    # Results were cached: a single detect afterwards does not hit the analyzer
+    calls = len(stub_detector.analyzer.calls)
+    stub_detector.detect(texts[1])
+    assert len(stub_detector.analyzer.calls) == calls
+
+def test_detect_stream_matches_full_detection(stub_detector):
+    line = "user{0}@example.com called 555-123-{0:04d} about the order\n"
+    text = "".join(line.format(i) for i in range(200))
+    chunks = list(stub_detector.detect_stream(text, chunk_size=1000, overlap=64))
+    assert len(chunks) > 1
+    streamed = sorted((r.entity_type, r.start, r.end) for chunk in chunks for r in chunk)
+    stub_detector.cache.clear()
+    full = sorted((r.entity_type, r.start, r.end) for r in stub_detector.detect(text))
+    assert streamed == full
+    assert len(full) == 400
+
+def test_detect_stream_seam_without_newlines(stub_detector):
+    text = ("x" * 95 + " test@example.com ") * 20
+    chunks = list(stub_detector.detect_stream(text, chunk_size=100, overlap=32))
+    found = [text[r.start:r.end] for chunk in chunks for r in chunk]
+    assert found == ["test@example.com"] * 20
+
+def test_detect_stream_caches_and_remembers_the_whole_text_once(stub_detector):
+    text = "".join(f"Ann{i} Lee is here, mail user{i}@example.com\n" for i in range(100))
+    streamed = [r for chunk in stub_detector.detect_stream(text, chunk_size=500, overlap=32) for r in chunk]
+    # One cache entry for the payload, not one per window; incremental detection diffs against all of it.
+    assert stub_detector.cache.stats()["entries"] == 1
+    assert stub_detector._previous[0] == text
+    calls = len(stub_detector.analyzer.calls)
+    assert [(r.start, r.end) for r in stub_detector.detect(text)] == [(r.start, r.end) for r in streamed]
+    assert len(stub_detector.analyzer.calls) == calls
+
+def test_detect_stream_does_not_cache_pattern_fallback(stub_detector, monkeypatch):
+    def broken(text, entities, language):
+        raise RuntimeError("worker died")
+    monkeypatch.setattr(stub_detector.analyzer, "analyze", broken)
+    text = "".join(f"Ann{i} Lee is here, mail user{i}@example.com\n" for i in range(100))
+    streamed = [r for chunk in stub_detector.detect_stream(text, chunk_size=500, overlap=32) for r in chunk]
+    assert {r.entity_type for r in streamed} == {"EMAIL_ADDRESS"}
+    assert stub_detector.cache.stats()["entries"] == 0
+    assert stub_detector._previous is None
+
+class SlowStubAnalyzer(StubAnalyzer):
+    loaded = None
+
+    def __init__(self):
+        SlowStubAnalyzer.loaded.wait(5)
+        super().__init__()
+
+def test_async_load_uses_pattern_only_until_ready():
+    import threading
+    SlowStubAnalyzer.loaded = threading.Event()
+    ready_calls = []
+    with patch("safepaste.pii_detector.build_analyzer", lambda *args: SlowStubAnalyzer()):
+        detector = PiiDetector(load_async=True, on_ready=ready_calls.append)
+        text = "John Doe is the CEO, mail test@example.com"
+        assert not detector.is_ready
+        assert [r.entity_type for r in detector.detect(text)] == ["EMAIL_ADDRESS"]
+
+        SlowStubAnalyzer.loaded.set()
+        assert detector.wait_until_ready(5)
+        # The degraded result was not cached, so the full pass runs now
+        assert sorted(r.entity_type for r in detector.detect(text)) == ["EMAIL_ADDRESS", "PERSON"]
+    assert ready_calls == [True]
+
+def test_async_load_failure_keeps_pattern_mode():
+    ready_calls = []
+    with patch("safepaste.pii_detector.build_analyzer", side_effect=OSError("no model")):
+        detector = PiiDetector(load_async=True, on_ready=ready_calls.append)
+        detector.wait_until_ready(0.5)
+    assert ready_calls == [False]
+    assert isinstance(detector.load_error, OSError)
+    assert [r.entity_type for r in detector.detect("Jane Roe: test@example.com")] == ["EMAIL_ADDRESS"]
+
+def test_unknown_profile_rejected():
+    with pytest.raises(ValueError):
+        PiiDetector(profile="huge")
+
+def test_set_profile_swaps_analyzer_in_background():
+    built = []
+    def fake_build(profile, language):
+        built.append(profile.model_name)
+        return StubAnalyzer()
+    with patch("safepaste.pii_detector.build_analyzer", fake_build):
+        detector = PiiDetector(profile="accurate")
+        old_analyzer = detector.analyzer
+        detector.set_profile("fast")
+        for _ in range(100):
+            if detector.profile == "fast":
+                break
+            time.sleep(0.01)
+    assert built == ["en_core_web_lg", "en_core_web_sm"]
+    assert detector.profile == "fast"
+    assert detector.analyzer is not old_analyzer
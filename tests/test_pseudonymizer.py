@@ -1,7 +1,7 @@
 import pytest
 from presidio_analyzer import RecognizerResult
 from safepaste.vault import Vault
-from safepaste.pseudonymizer import Pseudonymizer
+from safepaste.pseudonymizer import PseudonymSession, Pseudonymizer
 
 @pytest.fixture
 def pseudonymizer():
@@ -44,3 +44,79 @@ def test_rehydrate(pseudonymizer):
     text = "Hello [PERSON_1]"
     restored = pseudonymizer.rehydrate(text)
     assert restored == "Hello John Doe"
+
+def test_pseudonymize_overlapping_spans(pseudonymizer):
+    text = "Mail john.doe@example.com now"
+    results = [
+        RecognizerResult("PERSON", 5, 13, 0.85),
+        RecognizerResult("EMAIL_ADDRESS", 5, 25, 1.0),
+    ]
+    assert pseudonymizer.pseudonymize(text, results) == "Mail [EMAIL_ADDRESS_1] now"
+    assert pseudonymizer.vault.get("[PERSON_1]") is None
+
+def test_pseudonymize_overlap_prefers_longer_on_equal_score(pseudonymizer):
+    text = "Dr John Doe"
+    results = [
+        RecognizerResult("PERSON", 3, 7, 0.85),
+        RecognizerResult("PERSON", 3, 11, 0.85),
+        RecognizerResult("PERSON", 8, 11, 0.85),
+    ]
+    assert pseudonymizer.pseudonymize(text, results) == "Dr [PERSON_1]"
+    assert pseudonymizer.vault.get("[PERSON_1]") == "John Doe"
+
+def test_pseudonymize_span_map(pseudonymizer):
+    text = "John Doe called Jane Smith"
+    results = [
+        RecognizerResult("PERSON", 16, 26, 1.0),
+        RecognizerResult("PERSON", 0, 8, 1.0),
+    ]
+    scrubbed = pseudonymizer.pseudonymize_with_map(text, results)
+    assert scrubbed.text == "[PERSON_1] called [PERSON_2]"
+    for span in scrubbed.spans:
+        assert scrubbed.text[span.scrubbed_start:span.scrubbed_end] == span.placeholder
+        assert pseudonymizer.vault.get(span.placeholder) == text[span.start:span.end]
+
+def test_pseudonymize_many_entities(pseudonymizer):
+    text = " ".join(f"user{i}@example.com" for i in range(2000))
+    results = []
+    pos = 0
+    for i in range(2000):
+        end = pos + len(f"user{i}@example.com")
+        results.append(RecognizerResult("EMAIL_ADDRESS", pos, end, 1.0))
+        pos = end + 1
+    scrubbed = pseudonymizer.pseudonymize(text, results)
+    assert scrubbed.startswith("[EMAIL_ADDRESS_1] [EMAIL_ADDRESS_2]")
+    assert scrubbed.endswith("[EMAIL_ADDRESS_2000]")
+
+def test_rehydrate_ignores_other_brackets(pseudonymizer):
+    pseudonymizer.vault.add("[PERSON_1]", "John Doe")
+    text = "See [docs](http://x) and [EMAIL_ADDRESS_1], [PERSON_2] or [PERSON_1]"
+    assert pseudonymizer.rehydrate(text) == "See [docs](http://x) and [EMAIL_ADDRESS_1], [PERSON_2] or John Doe"
+
+def test_rehydrate_tracks_vault_changes(pseudonymizer):
+    assert pseudonymizer.rehydrate("[PERSON_1]") == "[PERSON_1]"
+    pseudonymizer.vault.add("[PERSON_1]", "John Doe")
+    assert pseudonymizer.rehydrate("[PERSON_1]") == "John Doe"
+    pseudonymizer.vault.add("[EMAIL_ADDRESS_3]", "a@b.com")
+    assert pseudonymizer.rehydrate("[PERSON_1] [EMAIL_ADDRESS_3]") == "John Doe a@b.com"
+    pseudonymizer.vault.clear()
+    assert pseudonymizer.rehydrate("[PERSON_1]") == "[PERSON_1]"
+
+def test_rehydrate_stream_split_placeholder(pseudonymizer):
+    pseudonymizer.vault.add("[PERSON_1]", "John Doe")
+    pseudonymizer.vault.add("[EMAIL_ADDRESS_1]", "a@b.com")
+    chunks = ["Hello [PER", "SON_1], mail [EMAIL_", "ADDRESS_1", "] or [link] [", "PERSON_1]"]
+    assert "".join(pseudonymizer.rehydrate_stream(chunks)) == "Hello John Doe, mail a@b.com or [link] John Doe"
+
+def test_session_numbers_across_calls(pseudonymizer):
+    session = PseudonymSession()
+    first = pseudonymizer.pseudonymize("a@x.io", [RecognizerResult("EMAIL_ADDRESS", 0, 6, 1.0)], session)
+    second = pseudonymizer.pseudonymize("b@x.io a@x.io", [RecognizerResult("EMAIL_ADDRESS", 0, 6, 1.0),
+                                                          RecognizerResult("EMAIL_ADDRESS", 7, 13, 1.0)], session)
+    assert first == "[EMAIL_ADDRESS_1]"
+    assert second == "[EMAIL_ADDRESS_2] [EMAIL_ADDRESS_1]"
+
+def test_session_resume_continues_numbering():
+    session = PseudonymSession.resume([("[PERSON_4]", "Ann"), ("[PERSON_2]", "Bo"), ("custom", "x")])
+    assert session.counters == {"PERSON": 4}
+    assert session.placeholders["Ann"] == "[PERSON_4]"
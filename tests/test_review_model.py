@@ -0,0 +1,179 @@
+import random
+import time
+import pytest
+from safepaste.pseudonymizer import PseudonymSession, Pseudonymizer
+from safepaste.review_model import ReviewModel, ReviewQueue, ReviewRequest, _FenwickTree, iter_chunks
+from safepaste.vault import Vault
+from presidio_analyzer import RecognizerResult
+
+def tk_index(text, offset):
+    """Reference conversion of an offset to a Tk "line.column" index."""
+    before = text[:offset]
+    return f"{before.count(chr(10)) + 1}.{len(before) - before.rfind(chr(10)) - 1}"
+
+def test_chunks_rebuild_the_text():
+    text = "first line\nsecond line\n\nfourth\n" * 50
+    chunks = list(iter_chunks(text, [], first_size=7, size=13))
+    assert "".join(c.text for c in chunks) == text
+    assert len(chunks[0].text) == 7
+    assert all(len(c.text) <= 13 for c in chunks[1:])
+
+@pytest.mark.parametrize("seed", range(5))
+def test_tag_indices_match_offsets(seed):
+    rng = random.Random(seed)
+    text = "".join(rng.choice("ab \n") for _ in range(3000))
+    spans, pos = [], 0
+    while True:
+        pos += rng.randint(0, 60)
+        end = pos + rng.randint(1, 40)
+        if end > len(text):
+            break
+        spans.append((pos, end))
+        pos = end
+    tags = [tag for chunk in iter_chunks(text, spans, first_size=100, size=37) for tag in chunk.tags]
+    assert tags == [(tk_index(text, start), tk_index(text, end)) for start, end in spans]
+
+def test_span_is_tagged_by_the_chunk_holding_its_end():
+    text = "0123456789abcdef"
+    chunks = list(iter_chunks(text, [(3, 12)], first_size=5, size=5))
+    assert [c.tags for c in chunks] == [[], [], [("1.3", "1.12")], []]
+
+def test_first_chunk_cost_does_not_depend_on_text_size():
+    small = "line of text\n" * 1000
+    large = "line of text\n" * 1_000_000
+
+    def first_chunk_time(text):
+        start = time.perf_counter()
+        next(iter_chunks(text, [(0, 4)]))
+        return time.perf_counter() - start
+
+    first_chunk_time(small)
+    assert first_chunk_time(large) < 0.05
+
+def test_fenwick_prefix_sums():
+    rng = random.Random(1)
+    values = [rng.randint(-5, 5) for _ in range(100)]
+    tree = _FenwickTree(values)
+    for _ in range(200):
+        i, delta = rng.randrange(100), rng.randint(-3, 3)
+        values[i] += delta
+        tree.add(i, delta)
+    assert [tree.prefix(i) for i in range(101)] == [sum(values[:i]) for i in range(101)]
+
+def _model(text, entities, on_toggle=None):
+    results = []
+    for value, entity_type in entities:
+        start = -1
+        while (start := text.find(value, start + 1)) != -1:
+            results.append(RecognizerResult(entity_type, start, start + len(value), 0.9))
+    scrubbed = Pseudonymizer(Vault()).pseudonymize_with_map(text, results)
+    return scrubbed, ReviewModel(text, scrubbed.spans, on_toggle)
+
+def _apply(text, edits):
+    for edit in edits:
+        text = text[:edit.start] + edit.text + text[edit.end:]
+    return text
+
+def test_model_starts_as_the_scrubbed_text():
+    scrubbed, model = _model("Mail john@x.org or call Anna; Anna knows.", [("john@x.org", "EMAIL_ADDRESS"), ("Anna", "PERSON")])
+    assert model.scrubbed_text() == scrubbed.text
+    assert model.scrubbed_spans() == [(s.scrubbed_start, s.scrubbed_end) for s in scrubbed.spans]
+    assert [len(e.occurrences) for e in model.entities.values()] == [1, 2]
+
+def test_toggle_edits_match_a_full_rebuild():
+    text = "Anna met Bob. Bob emailed anna@x.org and Anna.\nBob again."
+    scrubbed, model = _model(text, [("Anna", "PERSON"), ("Bob", "PERSON"), ("anna@x.org", "EMAIL_ADDRESS")])
+    rng = random.Random(5)
+    current = scrubbed.text
+    placeholders = list(model.entities)
+    for _ in range(30):
+        placeholder = rng.choice(placeholders)
+        edits = model.set_enabled(placeholder, not model.entities[placeholder].enabled)
+        assert len(edits) == len(model.entities[placeholder].occurrences)
+        current = _apply(current, edits)
+        assert current == model.scrubbed_text()
+    for placeholder in placeholders:
+        current = _apply(current, model.set_enabled(placeholder, False))
+    assert current == text
+
+def test_toggle_reports_changes_only():
+    calls = []
+    _, model = _model("Call Anna.", [("Anna", "PERSON")], on_toggle=lambda *args: calls.append(args))
+    placeholder = next(iter(model.entities))
+    assert model.set_enabled(placeholder, True) == []
+    edit, = model.set_enabled(placeholder, False)
+    assert (edit.text, edit.highlight) == ("Anna", False)
+    assert model.set_enabled(placeholder, False) == []
+    model.set_enabled(placeholder, True)
+    assert calls == [(placeholder, "Anna", False), (placeholder, "Anna", True)]
+    assert model.scrubbed_spans() == [(5, 5 + len(placeholder))]
+
+def test_refresh_carries_the_selection_over():
+    # A progressive scan refreshes the review with more spans; unchecked entities stay unchecked.
+    text = "Anna met Bob. Mail bob@x.org"
+    pseudonymizer = Pseudonymizer(Vault())
+    session = PseudonymSession()
+    partial = pseudonymizer.pseudonymize_with_map(text, [RecognizerResult("PERSON", 0, 4, 0.9), RecognizerResult("PERSON", 9, 12, 0.9)],
+                                                  session)
+    before = ReviewModel(text, partial.spans)
+    anna, bob = before.entities
+    before.set_enabled(bob, False)
+
+    calls = []
+    full = pseudonymizer.pseudonymize_with_map(text, [RecognizerResult("PERSON", 0, 4, 0.9), RecognizerResult("PERSON", 9, 12, 0.9),
+                                                      RecognizerResult("EMAIL_ADDRESS", 19, 28, 1.0)], session)
+    assert [s.placeholder for s in full.spans[:2]] == [anna, bob]
+    after = ReviewModel(text, full.spans, on_toggle=lambda *args: calls.append(args))
+    assert after.carry_selection(before) == [bob]
+    assert [e.enabled for e in after.entities.values()] == [True, False, True]
+    assert after.scrubbed_text() == f"{anna} met Bob. Mail [EMAIL_ADDRESS_1]"
+    assert calls == [(bob, "Bob", False)]
+
+def test_queue_policy_keeps_every_result_in_order():
+    queue = ReviewQueue(policy="queue")
+    assert queue.offer(ReviewRequest("a", "A")).original == "a"
+    assert queue.offer(ReviewRequest("b", "B")) is None
+    assert queue.offer(ReviewRequest("c", "C")) is None
+    assert queue.pending == 2
+    assert [queue.advance().original, queue.advance().original, queue.advance()] == ["b", "c", None]
+    assert queue.current is None
+
+def test_replace_policy_shows_the_newest_result():
+    queue = ReviewQueue(policy="replace")
+    queue.offer(ReviewRequest("a", "A"))
+    assert queue.offer(ReviewRequest("b", "B")).original == "b"
+    assert queue.pending == 0
+    assert queue.advance() is None
+
+def test_same_text_refreshes_instead_of_queueing():
+    queue = ReviewQueue(policy="queue")
+    queue.offer(ReviewRequest("a", "partial", complete=False))
+    final = queue.offer(ReviewRequest("a", "final"))
+    assert final.scrubbed == "final" and queue.current is final
+    queue.offer(ReviewRequest("b", "partial", complete=False))
+    assert queue.offer(ReviewRequest("b", "final")) is None
+    assert queue.pending == 1
+    assert queue.advance().scrubbed == "final"
+
+def test_queue_drops_the_oldest_beyond_its_limit():
+    queue = ReviewQueue(policy="queue", max_pending=2)
+    for text in "abcd":
+        queue.offer(ReviewRequest(text, text.upper()))
+    assert [queue.advance().original, queue.advance().original] == ["c", "d"]
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ReviewQueue(policy="drop")
+
+def test_request_mappings_restore_a_queued_review():
+    vault = Vault(max_entries=1)
+    pseudonymizer = Pseudonymizer(vault)
+    first = "Anna met Bob"
+    scrubbed = pseudonymizer.pseudonymize_with_map(first, [RecognizerResult("PERSON", 0, 4, 0.9), RecognizerResult("PERSON", 9, 12, 0.9)])
+    request = ReviewRequest(first, scrubbed.text, spans=scrubbed.spans)
+    pseudonymizer.pseudonymize("Carl", [RecognizerResult("PERSON", 0, 4, 0.9)])  # evicts the first text's entries
+    assert pseudonymizer.rehydrate(scrubbed.text) != first
+    vault.max_entries = 0
+    for placeholder, original in request.mappings().items():
+        vault.add(placeholder, original)
+    assert pseudonymizer.rehydrate(scrubbed.text) == first
@@ -19,3 +19,76 @@ def test_vault_clear():
     vault.add("[PERSON_1]", "John Doe")
     vault.clear()
     assert vault.get("[PERSON_1]") is None
+
+def test_vault_remove():
+    vault = Vault()
+    vault.add("[PERSON_1]", "John Doe")
+    vault.remove("[PERSON_1]")
+    vault.remove("[PERSON_2]")  # unknown placeholders are ignored
+    assert vault.get("[PERSON_1]") is None
+    assert len(vault) == 0 and vault.size_bytes == 0
+
+def test_vault_numbers_stay_above_live_placeholders():
+    vault = Vault()
+    assert vault.next_number("PERSON") == 1
+    vault.add("[PERSON_7]", "John Doe")
+    assert vault.next_number("PERSON") == 8
+    assert vault.next_number("PERSON", floor=20) == 21
+    assert vault.next_number("EMAIL_ADDRESS") == 1
+
+def test_vault_placeholder_index():
+    vault = Vault()
+    version = vault.index_version
+    vault.add("[PERSON_1]", "John Doe")
+    vault.add("[PERSON_2]", "Jane Doe")
+    vault.add("{custom}", "x")
+    assert sorted(vault.placeholder_keys()) == ["[PERSON_", "{custom}"]
+    assert vault.index_version != version
+    vault._remove("[PERSON_1]")
+    assert sorted(vault.placeholder_keys()) == ["[PERSON_", "{custom}"]
+    vault._remove("[PERSON_2]")
+    assert vault.placeholder_keys() == ["{custom}"]
+
+def test_vault_cleanup_removes_only_expired():
+    vault = Vault(ttl_seconds=1)
+    vault.add("[PERSON_1]", "John Doe")
+    time.sleep(0.6)
+    vault.add("[PERSON_2]", "Jane Doe")
+    time.sleep(0.6)
+    assert vault.cleanup() == 1
+    assert vault.get("[PERSON_1]") is None
+    assert vault.get("[PERSON_2]") == "Jane Doe"
+
+def test_vault_readd_refreshes_expiry():
+    vault = Vault(ttl_seconds=1)
+    vault.add("[PERSON_1]", "John Doe")
+    time.sleep(0.6)
+    vault.add("[PERSON_1]", "John Doe")
+    time.sleep(0.6)
+    assert vault.cleanup() == 0
+    assert vault.get("[PERSON_1]") == "John Doe"
+
+def test_vault_lru_max_entries():
+    vault = Vault(max_entries=2)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.add("[PERSON_2]", "Jane Doe")
+    vault.get("[PERSON_1]")
+    vault.add("[PERSON_3]", "Max Mustermann")
+    assert len(vault) == 2
+    assert vault.get("[PERSON_2]") is None
+    assert vault.get("[PERSON_1]") == "John Doe"
+
+def test_vault_lru_max_bytes():
+    vault = Vault(max_bytes=1000)
+    for i in range(100):
+        vault.add(f"[PERSON_{i}]", "x" * 50)
+    assert vault.size_bytes <= 1000
+    assert vault.get("[PERSON_99]") == "x" * 50
+
+def test_vault_sweeper():
+    vault = Vault(ttl_seconds=0.2)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.start_sweeper(interval=0.05)
+    time.sleep(0.5)
+    vault.stop_sweeper()
+    assert len(vault) == 0
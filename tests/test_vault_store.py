@@ -0,0 +1,91 @@
+import pytest
+import time
+import sqlite3
+from safepaste.vault_store import PersistentVault
+from safepaste.pseudonymizer import Pseudonymizer
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "vault.db")
+
+def test_survives_reopen(db_path):
+    vault = PersistentVault(db_path)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.close()
+
+    reopened = PersistentVault(db_path)
+    assert reopened.get("[PERSON_1]") == "John Doe"
+    assert Pseudonymizer(reopened).rehydrate("Hi [PERSON_1]") == "Hi John Doe"
+    reopened.close()
+
+def test_values_encrypted_at_rest(db_path):
+    vault = PersistentVault(db_path)
+    vault.add("[EMAIL_ADDRESS_1]", "secret@example.com")
+    vault.close()
+    with open(db_path, "rb") as f:
+        assert b"secret@example.com" not in f.read()
+
+def test_wrong_key_cannot_read(db_path):
+    vault = PersistentVault(db_path, key=b"k" * 32)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.close()
+    other = PersistentVault(db_path, key=b"x" * 32)
+    assert other.get("[PERSON_1]") is None
+    other.close()
+
+def test_expired_rows_purged_on_reopen(db_path):
+    vault = PersistentVault(db_path, ttl_seconds=1)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.close()
+    time.sleep(1.1)
+    reopened = PersistentVault(db_path, ttl_seconds=1)
+    assert reopened.get("[PERSON_1]") is None
+    assert reopened.placeholder_keys() == []
+    reopened.close()
+    assert sqlite3.connect(db_path).execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 0
+
+def test_remove_and_clear_persist(db_path):
+    vault = PersistentVault(db_path)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.add("[PERSON_2]", "Jane Doe")
+    vault.flush()
+    vault._remove("[PERSON_1]")
+    assert vault.get("[PERSON_1]") is None
+    vault.close()
+    reopened = PersistentVault(db_path)
+    assert reopened.get("[PERSON_1]") is None
+    assert reopened.get("[PERSON_2]") == "Jane Doe"
+    reopened.clear()
+    reopened.close()
+    assert PersistentVault(db_path).get("[PERSON_2]") is None
+
+def test_reopen_continues_numbering(db_path):
+    vault = PersistentVault(db_path, max_entries=1)
+    vault.add("[PERSON_3]", "John Doe")
+    vault.add("[PERSON_12]", "Jane Doe")
+    vault.add("custom", "x")
+    vault.close()
+    reopened = PersistentVault(db_path)
+    assert reopened.next_number("PERSON") == 13
+    assert reopened.next_number("EMAIL_ADDRESS") == 1
+    reopened.close()
+
+def test_memory_tier_eviction_keeps_disk_copy(db_path):
+    vault = PersistentVault(db_path, max_entries=1)
+    vault.add("[PERSON_1]", "John Doe")
+    vault.add("[PERSON_2]", "Jane Doe")
+    assert len(vault) == 1
+    assert vault.get("[PERSON_1]") == "John Doe"
+    vault.close()
+
+def test_reopen_large_vault_is_fast(db_path):
+    vault = PersistentVault(db_path, max_entries=1000)
+    for i in range(100_000):
+        vault.add(f"[PERSON_{i}]", f"Person {i}")
+    vault.close()
+    start = time.perf_counter()
+    reopened = PersistentVault(db_path)
+    elapsed = time.perf_counter() - start
+    assert reopened.get("[PERSON_99999]") == "Person 99999"
+    reopened.close()
+    assert elapsed < 0.5